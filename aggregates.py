@@ -0,0 +1,189 @@
+'''
+Precomputed name x year counts for the charts and per-period tables, persisted in the record store next to the records
+
+Every chart used to start again from the raw people: group them by year, merge the years into decades, count, sort every decade's
+names and then pick the top ones. NameAggregates holds the counts once (name x birth year, including the people without a known
+year so the overall totals come from it too) and derives everything else on first use, keeping the answer:
+- counts(period): period ==> {name: count}, i.e. period=10 for name x decade
+- ranking(period): period ==> [(name, count), ...] most common first, which top_n and ranks are slices and lookups of
+- totals() / overall_ranking(): name ==> number of people, and the same sorted most common first
+RecordStore keeps the name x year counts in its name_year_counts table. They are worked out once after a scrape (see
+build_record_store) and thrown away whenever records are added, so from_store only recounts the people after a change. Only the
+base counts are persisted: the rankings, ranks and top n are sorts of at most a few thousand names per period, so they are worked
+out again in memory the first time they are asked for after loading.
+Names with the same count keep the order they were first scraped in, as with YearNameTable and top_n_by_value.
+EXAMPLE:
+    aggregates = NameAggregates.from_store(RecordStore("records.sqlite"))
+    aggregates.top_n(period=10, n=3)            ==> {1830: [('Mary', 120), ('John', 98), ('William', 71)], ...}
+    aggregates.ranks(period=10)[1830]['John']   ==> 2
+    aggregates.top_names(20)                    ==> {'Mary': 692, 'Harriet': 389, ...}
+'''
+from typing import List
+
+class NameAggregates:
+    '''
+    = year_counts: dictionary of year ==> {name: count}, the same shape as recomp_dict; the year None holds people without a known year
+    '''
+    def __init__(self, year_counts: dict = None):
+        self.year_counts = {}
+        self.order = {}         # name ==> position it was first seen in, for breaking ties
+        self.derived = {}       # (table, arguments) ==> table worked out from year_counts, emptied whenever a count changes
+        for year, name_counts in (year_counts or {}).items():
+            for name, count in name_counts.items():
+                self.add(year, name, count)
+
+    def add(self, year: int, name: str, count: int = 1):
+        if name not in self.order:
+            self.order[name] = len(self.order)
+        names = self.year_counts.setdefault(year, {})
+        names[name] = names.get(name, 0) + count
+        if self.derived:
+            self.derived = {}
+
+    @classmethod
+    def from_records(cls, records, exclude_middle_names: bool = True):
+        '''
+        Counts PersonRecords (see records.py) or anything with birth_year, first_name and given_names
+        '''
+        aggregates = cls()
+        for record in records:
+            aggregates.add(record.birth_year, record.first_name if exclude_middle_names else record.given_names)
+        return aggregates
+
+    @classmethod
+    def from_store(cls, store: 'RecordStore', exclude_middle_names: bool = True):
+        '''
+        Loads the counts persisted in a RecordStore, counting the stored records (and persisting the counts) if there aren't any yet
+        '''
+        full_names = int(not exclude_middle_names)
+        rows = store.connection.execute("SELECT birth_year, name, count FROM name_year_counts WHERE full_names = ? ORDER BY rowid", (full_names,)).fetchall()
+        if rows:
+            aggregates = cls()
+            for year, name, count in rows:
+                aggregates.add(year, name, count)
+            return aggregates
+        aggregates = cls.from_records(store.iter_records(), exclude_middle_names)
+        aggregates.save(store, exclude_middle_names)
+        return aggregates
+
+    def save(self, store: 'RecordStore', exclude_middle_names: bool = True):
+        '''
+        Persists the counts in the store, replacing any already there for the same exclude_middle_names
+        - rows go in by the order the names were first seen, so loading them back keeps the same tie order
+        '''
+        full_names = int(not exclude_middle_names)
+        rows = sorted(((year, name, count) for year, names in self.year_counts.items() for name, count in names.items()),
+                      key=lambda row: self.order[row[1]])
+        with store.connection:
+            store.connection.execute("DELETE FROM name_year_counts WHERE full_names = ?", (full_names,))
+            store.connection.executemany("INSERT INTO name_year_counts VALUES (?, ?, ?, ?)", ((full_names,) + row for row in rows))
+
+    def cached(self, table: str, arguments: tuple, build):
+        key = (table, arguments)
+        if key not in self.derived:
+            self.derived[key] = build()
+        return self.derived[key]
+
+    def counts(self, period: int = 1):
+        '''
+        Returns a dictionary of period ==> {name: count}, people without a known year left out
+        = period: 1 groups by year, 10 by decade, 100 by century and so on; a period's key is its first year, i.e. 1830 for 1830-1839
+        - the dictionaries are copies, so changing them doesn't change the aggregates
+        '''
+        return {p: dict(names) for p, names in self.period_counts(period).items()}
+
+    def period_counts(self, period: int):
+        '''
+        counts without copying, for the tables derived from it; the year dictionaries for period=1 are year_counts' own
+        '''
+        def build():
+            if period == 1:
+                return {year: names for year, names in self.year_counts.items() if year is not None}
+            result = {}
+            for year, names in self.year_counts.items():
+                if year is not None:
+                    period_names = result.setdefault((year // period) * period, {})
+                    for name, count in names.items():
+                        period_names[name] = period_names.get(name, 0) + count
+            return result
+        return self.cached('counts', (period,), build)
+
+    def ranked(self, name_counts: dict):
+        return sorted(name_counts.items(), key=lambda item: (-item[1], self.order[item[0]]))
+
+    def ranking(self, period: int = 10):
+        '''
+        Returns a dictionary of period ==> list of every (name, count) in that period, most common first
+        '''
+        return self.cached('ranking', (period,), lambda: {p: self.ranked(names) for p, names in self.period_counts(period).items()})
+
+    def top_n(self, period: int = 10, n: int = 1, include_ties: bool = True):
+        '''
+        Returns a dictionary of period ==> list of (name, count) for the n most common names in that period, most common first,
+        the same as YearNameTable.top_n
+        - include_ties: also include names tied on the count of the nth name, as the decade plot does for the top name
+        - n of 0 or less gives an empty dictionary
+        '''
+        if n <= 0:
+            return {}
+        def build():
+            result = {}
+            for p, ranking in self.ranking(period).items():
+                stop = min(n, len(ranking))
+                if include_ties:
+                    while stop < len(ranking) and ranking[stop][1] == ranking[stop - 1][1]:
+                        stop += 1
+                result[p] = ranking[:stop]
+            return result
+        return self.cached('top_n', (period, n, include_ties), build)
+
+    def ranks(self, period: int = 10):
+        '''
+        Returns a dictionary of period ==> {name: rank}, 1 being the most common name; tied names share a rank, i.e. 1, 2, 2, 4
+        '''
+        def build():
+            result = {}
+            for p, ranking in self.ranking(period).items():
+                ranks = result[p] = {}
+                for position, (name, count) in enumerate(ranking):
+                    ranks[name] = ranks[ranking[position - 1][0]] if position and ranking[position - 1][1] == count else position + 1
+            return result
+        return self.cached('ranks', (period,), build)
+
+    def totals(self):
+        '''
+        Returns a dictionary of name ==> number of people, with or without a known year, the same as RecordStore.firstname_counts
+        '''
+        def build():
+            result = {}
+            for names in self.year_counts.values():
+                for name, count in names.items():
+                    result[name] = result.get(name, 0) + count
+            return dict(sorted(result.items(), key=lambda item: self.order[item[0]]))
+        return self.cached('totals', (), build)
+
+    def overall_ranking(self):
+        '''
+        Returns a list of every (name, total), most common first
+        '''
+        return self.cached('overall_ranking', (), lambda: self.ranked(self.totals()))
+
+    def top_names(self, n: int, *conditions):
+        '''
+        Returns a dictionary of the n most common names overall ==> their totals, keeping only names which pass all the conditions,
+        the same as top_n_by_value(self.totals(), n, *conditions)
+        '''
+        result = {}
+        for name, total in self.overall_ranking():
+            if len(result) == n:
+                break
+            if all(condition(name, total) for condition in conditions):
+                result[name] = total
+        return result
+
+    def name_history(self, names: List[str], period: int = 10):
+        '''
+        Returns a dictionary of name ==> {period: count} for each of names, i.e. to follow a name across the decades
+        '''
+        counts = self.period_counts(period)
+        return {name: {p: counts[p][name] for p in sorted(counts) if name in counts[p]} for name in names}
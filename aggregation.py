@@ -0,0 +1,51 @@
+'''
+In-place aggregation of the per-page dictionaries produced by the target functions
+
+combine_dicts builds a brand new dictionary on every call, so merging each page into a running total copies the whole total
+every time (quadratic in the number of pages). Here the running total is updated in place instead, and works for every shape
+of dictionary the scraper produces:
+- name ==> count (get_firstnames): counts are summed
+- year ==> list of names (get_firstnames_with_birthyear): lists are extended
+- year ==> {name: count} (recomp_dict): the inner dictionaries are merged recursively
+EXAMPLE:
+    total = Accumulator()
+    total += {'Mary': 2, 'John': 1}
+    total += {'Mary': 1}            ==> {'Mary': 3, 'John': 1}
+'''
+
+def merge_into(target: dict, source: dict, copy: bool = True):
+    '''
+    Merges source into target in place and returns target
+    = copy: if False, lists and dictionaries from source are moved into target rather than copied, for when source is about to be
+        thrown away anyway (i.e. the output of a target function for one page); source must not be used afterwards
+    '''
+    for key, value in source.items():
+        if key not in target:
+            if copy and isinstance(value, dict):
+                value = merge_into({}, value)
+            elif copy and isinstance(value, list):
+                value = list(value)
+            target[key] = value
+        else:
+            existing = target[key]
+            if isinstance(existing, dict):
+                merge_into(existing, value, copy)
+            elif isinstance(existing, list):
+                existing.extend(value)
+            else:
+                target[key] = existing + value
+    return target
+
+class Accumulator(dict):
+    '''
+    A dictionary which other dictionaries can be merged into in place with += or merge, following merge_into
+    '''
+    def merge(self, other: dict, copy: bool = True):
+        merge_into(self, other, copy)
+        return self
+
+    def __iadd__(self, other: dict):
+        return self.merge(other)
+
+    def add(self, key, amount: int = 1):
+        self[key] = self.get(key, 0) + amount
@@ -0,0 +1,310 @@
+'''
+Asyncio crawl engine for the surname index pages (i1.htm - i79.htm)
+
+Handing each thread a fixed, contiguous chunk of pages means a single slow page holds up the rest of its chunk.
+Here every page is an item on a shared asyncio work queue which a configurable number of workers pull from, meaning a slow
+page only ever holds up one worker. On top of that:
+- a per-host rate limiter spaces out request starts so the site isn't hammered
+- failed fetches are put back on the queue with exponential backoff (or after the Retry-After the site asks for), up to a
+  maximum number of attempts, without a worker waiting on them; responses are validated and an optional circuit breaker
+  pauses fetching while the site is failing, and pages which fail every attempt can be kept in a dead-letter list to retry
+  later (see resilient_fetch.py)
+- an exception from the target function only fails its own page, the worker carries on with the rest
+- results are combined in page order, so the dictionaries are the same as the ones produced with the threads
+
+requests is a blocking library, so each fetch is handed to a worker thread with asyncio.to_thread while the queue, rate limiting
+and retry scheduling all happen on the event loop.
+'''
+from aggregation import merge_into
+from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from page_cache import PageCache, PageNotCachedException
+from resilient_fetch import CircuitBreaker, CircuitOpenException, DeadLetters, retry_delay, validate_content
+from urllib.parse import urlsplit
+import asyncio
+import inspect
+import requests
+import threading
+import time
+
+BASE_URL = "https://www.wiltshirefamilyhistory.org"
+
+class HostRateLimiter:
+    '''
+    Makes sure that requests to the same host start at least 1 / requests_per_second seconds apart
+    - requests_per_second of None or 0 switches rate limiting off
+    '''
+    def __init__(self, requests_per_second: float = 10.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = {}
+        self.locks = {}
+
+    async def wait(self, url: str):
+        if self.interval == 0.0:
+            return
+        host = urlsplit(url).netloc
+        if host not in self.locks:
+            self.locks[host] = asyncio.Lock()
+        async with self.locks[host]:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class AsyncIndexCrawler:
+    '''
+    Fetches the index pages concurrently and applies a target function (i.e. get_firstnames) to each parsed page
+    = concurrency: how many pages can be in flight at once
+    = requests_per_second: per-host rate limit, None to disable
+    = max_attempts: how many times a page is tried before it is recorded in failed_pages
+    = backoff: delay before the first retry in seconds, doubled for every further attempt up to max_backoff
+    = timeout: (connect, read) timeouts in seconds passed on to session.get, or one number for both
+    = base_url: the site to crawl, can be pointed at a local copy of the pages (see fixture_server.py)
+    = session: an existing requests.Session to use, otherwise one is created with a connection pool the size of concurrency
+    = cache: optional PageCache, pages are then served from disk and only revalidated against the site
+    = html_parser: the parser BeautifulSoup builds each page with ("html.parser" or the faster "lxml"), None passes the target
+        function the raw page bytes instead, i.e. for the backends in parser_backends.py
+    = metrics: optional RunMetrics recording fetch latencies, bytes, retries and the time spent building soups (see metrics.py)
+    = breaker: optional CircuitBreaker, which stops fetches for a while once too many in a row have failed
+    = dead_letters: optional DeadLetters which pages failing every attempt are added to, and removed from once fetched
+    '''
+    def __init__(self, concurrency: int = 8, requests_per_second: float = 10.0, max_attempts: int = 3, backoff: float = 0.5,
+                 timeout=(5.0, 30.0), base_url: str = BASE_URL, session: requests.Session = None, cache: PageCache = None,
+                 html_parser: str = "html.parser", metrics: 'RunMetrics' = None, max_backoff: float = 30.0,
+                 breaker: CircuitBreaker = None, dead_letters: DeadLetters = None):
+        self.concurrency = concurrency
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.cache = cache
+        self.html_parser = html_parser
+        self.metrics = metrics
+        self.breaker = breaker
+        self.dead_letters = dead_letters
+        self.failed_pages = []
+        self.missing_pages = []     # pages the site answered with a 404 or 410, i.e. which no longer exist
+        self.retries = 0
+
+    def page_url(self, index: int):
+        return f"{self.base_url}/i{index}.htm"
+
+    async def fetch(self, index: int):
+        '''
+        Returns the raw bytes of an index page, raising for any connection error or non-2xx response
+        '''
+        return await self.fetch_url(self.page_url(index))
+
+    async def fetch_url(self, url: str):
+        '''
+        Returns the raw bytes of any page, rate limited and through the cache if there is one
+        '''
+        return await self.fetch_content(url)
+
+    def record_fetch(self, content: bytes, elapsed: float = None, downloaded: bool = True):
+        '''
+        Records a page in self.metrics if there is one
+        = elapsed: seconds the request took once the rate limiter let it through, None if it never went to the site
+        = downloaded: False if the body came from the cache (a hit or a 304), so it isn't counted in bytes_fetched
+        '''
+        if self.metrics is None:
+            return
+        if elapsed is not None:
+            self.metrics.add_time('fetch', elapsed)
+            self.metrics.observe('fetch_latency', elapsed)
+        self.metrics.count('pages_fetched')
+        if downloaded:
+            self.metrics.count('bytes_fetched', len(content))
+
+    async def wait_for_slot(self, url: str):
+        if self.metrics is None:
+            return await self.rate_limiter.wait(url)
+        with self.metrics.timer('rate_limit'):
+            await self.rate_limiter.wait(url)
+
+    async def fetch_content(self, url: str):
+        if self.cache is not None and self.cache.offline:
+            content = self.cache.get(self.session, url)
+            self.record_fetch(content, downloaded=False)
+            return content
+        if self.breaker is not None:
+            self.breaker.before_request()
+        await self.wait_for_slot(url)
+        start = time.perf_counter()     # after the rate limiter, whose wait is its own 'rate_limit' stage
+        try:
+            if self.cache is not None:
+                content, source = await asyncio.to_thread(self.cache.fetch, self.session, url, self.timeout)
+            else:
+                page = await asyncio.to_thread(self.session.get, url, timeout=self.timeout)
+                page.raise_for_status()
+                content, source = page.content, 'miss'
+            validate_content(url, content)
+            self.record_fetch(content, None if source == 'hit' else time.perf_counter() - start, source == 'miss')
+        except Exception as e:
+            if self.breaker is not None:
+                self.breaker.record_outcome(e)
+            raise
+        if self.breaker is not None:
+            self.breaker.record_outcome()
+        return content
+
+    def delay_before_retry(self, error: Exception, attempt: int):
+        '''
+        Returns the seconds to wait before trying a page again after error, None once it has had max_attempts or isn't worth retrying
+        - a page turned away by an open circuit was never requested, so it is always retried (see next_attempt)
+        '''
+        if isinstance(error, CircuitOpenException):
+            return retry_delay(error, attempt, self.backoff, self.max_backoff)
+        if attempt >= self.max_attempts:
+            return None
+        if isinstance(error, IndexError):   # the target function choked on the page
+            return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return retry_delay(error, attempt, self.backoff, self.max_backoff)
+
+    def next_attempt(self, error: Exception, attempt: int):
+        return attempt if isinstance(error, CircuitOpenException) else attempt + 1
+
+    def record_retry(self):
+        self.retries += 1
+        if self.metrics is not None:
+            self.metrics.count('retries')
+
+    def record_failure(self, page, error: Exception):
+        self.failed_pages.append((page, repr(error)))
+        if isinstance(error, requests.HTTPError) and error.response is not None and error.response.status_code in (404, 410):
+            self.missing_pages.append(page)
+        if self.dead_letters is not None:
+            self.dead_letters.add(page, error)
+        if self.metrics is not None:
+            self.metrics.count('failed_pages')
+
+    def record_success(self, page):
+        if self.dead_letters is not None:
+            self.dead_letters.remove(page)
+
+    def retry_later(self, queue: asyncio.Queue, item: tuple, page, error: Exception, attempt: int):
+        '''
+        Puts item (the next attempt at page) back on the queue once the retry delay for error is up, or records page as failed if it
+        shouldn't be retried; returns True if it will be retried
+        - the wait is a timer on the event loop rather than a sleep in the worker, so the worker carries on with other pages meanwhile;
+          the queue item being retried is only marked done once item is back on the queue, so queue.join keeps waiting for it
+        '''
+        delay = self.delay_before_retry(error, attempt)
+        if delay is None:
+            self.record_failure(page, error)
+            return False
+        self.record_retry()
+        def requeue():
+            queue.put_nowait(item)
+            queue.task_done()
+        asyncio.get_running_loop().call_later(delay, requeue)
+        return True
+
+    async def worker(self, queue: asyncio.Queue, results: dict, target_function, args_for_target: tuple, pass_index: bool = False,
+                     stop: threading.Event = None):
+        while True:
+            index, attempt = await queue.get()
+            if stop is not None and stop.is_set():
+                queue.task_done()   # the crawl has been stopped, drop the pages left
+                continue
+            retrying = False
+            try:
+                content = await self.fetch(index)
+                if self.html_parser and self.metrics is not None:
+                    with self.metrics.timer('soup'):
+                        page = BeautifulSoup(content, self.html_parser)
+                else:
+                    page = BeautifulSoup(content, self.html_parser) if self.html_parser else content
+                result = target_function(page, index, *args_for_target) if pass_index else target_function(page, *args_for_target)
+                results[index] = (await result) if inspect.isawaitable(result) else result
+                self.record_success(index)
+            except PageNotCachedException as e:
+                self.record_failure(index, e)    # retrying won't put it in the cache
+            except Exception as e:  # whatever the fetch, the parser or the target function raised, the worker carries on
+                retrying = self.retry_later(queue, (index, self.next_attempt(e, attempt)), index, e, attempt)
+            finally:
+                if not retrying:
+                    queue.task_done()
+
+    async def crawl_per_page(self, target_function, *args_for_target, pages=range(1, 80), pass_index: bool = False, stop: threading.Event = None):
+        '''
+        Coroutine which returns a dictionary of page index ==> output of target_function for that page
+        = pass_index: call target_function(page, index, *args_for_target), i.e. for ParserBackend.parse(content, source_page)
+        = stop: optional threading.Event which ends the crawl early once set (from any thread), returning the pages done so far
+        - target_function can be a coroutine function, i.e. to hand the page on without blocking the event loop
+        '''
+        self.failed_pages = []
+        self.missing_pages = []
+        self.retries = 0
+        queue = asyncio.Queue()
+        for index in pages:
+            queue.put_nowait((index, 1))
+        results = {}
+        workers = [asyncio.create_task(self.worker(queue, results, target_function, args_for_target, pass_index, stop)) for i in range(0, self.concurrency)]
+        if stop is None:
+            await queue.join()
+        else:
+            joined = asyncio.ensure_future(queue.join())
+            while not (joined.done() or stop.is_set()):
+                await asyncio.wait({joined}, timeout=0.05)  # stop is set from another thread, so look at it every so often
+            joined.cancel()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return results
+
+    async def crawl(self, target_function, *args_for_target, pages=range(1, 80)):
+        '''
+        Coroutine version of run, for use inside an already running event loop
+        '''
+        results = await self.crawl_per_page(target_function, *args_for_target, pages=pages)
+        data = {}
+        for index in sorted(results):
+            merge_into(data, results[index], copy=False)
+        return data
+
+    def run_in_loop(self, coroutine_function, *args, **kwargs):
+        async def main():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+            try:
+                return await coroutine_function(*args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    self.cache.flush()
+        return asyncio.run(main())
+
+    def run(self, target_function, *args_for_target, pages=range(1, 80)):
+        '''
+        Crawls the pages and returns the combined output of target_function, i.e. the same dictionary that merging the
+        PageWorkerThread dictionaries would give. Pages that still failed after max_attempts are listed in self.failed_pages
+        - pages=crawler.dead_letters.pages() retries just the pages which failed last time
+        '''
+        return self.run_in_loop(self.crawl, target_function, *args_for_target, pages=pages)
+
+    def run_per_page(self, target_function, *args_for_target, pages=range(1, 80), pass_index: bool = False, stop: threading.Event = None):
+        '''
+        Crawls the pages and returns the output of target_function for each page separately, keyed by page index
+        - setting stop from another thread ends the crawl early, see crawl_per_page
+        '''
+        return self.run_in_loop(self.crawl_per_page, target_function, *args_for_target, pages=pages, pass_index=pass_index, stop=stop)
+
+def scrape_index_pages(target_function, *args_for_target, total_pages: int = 79, **crawler_options):
+    '''
+    Convenience wrapper which drops in for instantiate_threads + start/join + combine_dicts
+    EXAMPLE:
+        scrape_index_pages(get_firstnames, True, True, concurrency=8) ==> {'Mary': 1234, 'John': 1100, ...}
+    '''
+    crawler = AsyncIndexCrawler(**crawler_options)
+    data = crawler.run(target_function, *args_for_target, pages=range(1, total_pages + 1))
+    for index, error in crawler.failed_pages:
+        print(f"Page i{index}.htm failed after {crawler.max_attempts} attempts: {error}")
+    return data
@@ -0,0 +1,607 @@
+'''
+Benchmarks for the scraper, run against saved copies of the index pages served locally by fixture_server.py
+(record them once with: python fixture_server.py record <directory>)
+Usage:
+    python benchmarks.py suite <directory containing i1.htm ... i79.htm> [baseline json] [latency in seconds] [jitter in seconds]
+    python benchmarks.py crawl <directory containing i1.htm ... i79.htm> [latency in seconds]
+    python benchmarks.py parsers <directory containing i1.htm ... i79.htm> [golden records json]
+    python benchmarks.py similarity <directory containing i1.htm ... i79.htm> [query names...]
+    python benchmarks.py clustering <directory containing i1.htm ... i79.htm>
+    python benchmarks.py merging <directory containing i1.htm ... i79.htm>
+    python benchmarks.py years <directory containing i1.htm ... i79.htm>
+    python benchmarks.py dates <directory containing i1.htm ... i79.htm>
+    python benchmarks.py aggregates <directory containing i1.htm ... i79.htm>
+    python benchmarks.py search <directory containing i1.htm ... i79.htm> [surname] [name]
+    python benchmarks.py pipeline <directory containing i1.htm ... i79.htm> [backend]
+    python benchmarks.py faults <directory containing i1.htm ... i79.htm> [error rate] [hang rate] [garbage rate]
+    python benchmarks.py streaming <directory containing i1.htm ... i79.htm>
+    python benchmarks.py startup [runs]
+'''
+from aggregates import NameAggregates
+from aggregation import merge_into
+from birth_dates import BirthDateNormaliser, parse_birth_date
+from dictionary_funcs import combine_dicts, condition_filter_out_specific_names, filter_dict, merge_years_into_decade, recomp_dict, sort_dict_by_values_desc
+from fixture_server import FixtureServer
+from parser_backends import available_backends, get_backend
+from record_index import RecordIndex
+from records import RecordStore, refresh_aggregates
+from scraper import find_variations_in_name
+import heapq
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+def count_anchor_names(page: 'BeautifulSoup', dict_to_insert_into: dict = None):
+    '''
+    Stand-in target function doing the same work as get_firstnames (count the <a> names of the first <dl>)
+    '''
+    if dict_to_insert_into == None:
+        dict_to_insert_into = {}
+    for name in page.find_all('dl')[0].find_all('a'):
+        name = name.get_text()
+        dict_to_insert_into[name] = dict_to_insert_into.get(name, 0) + 1
+    return dict_to_insert_into
+
+def static_partition_crawl(base_url: str, target_function, thread_count: int = 4, total_pages: int = 79):
+    '''
+    Reproduces the old static partitioning of instantiate_threads: contiguous chunks of pages, each chunk fetched sequentially by one thread
+    '''
+    from bs4 import BeautifulSoup
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount('http://', adapter)
+    pages_per_thread = round(float(total_pages) / thread_count)
+    chunks = [range(i*pages_per_thread+1, (i+1)*pages_per_thread+1) for i in range(0, thread_count-1)]
+    chunks.append(range((thread_count-1)*pages_per_thread+1, total_pages+1))
+    results = [{} for chunk in chunks]
+
+    def run(position, chunk):
+        for i in chunk:
+            page = BeautifulSoup(session.get(f"{base_url}/i{i}.htm").content, "html.parser")
+            results[position] = combine_dicts(target_function(page), results[position])
+
+    threads = [threading.Thread(target=run, args=(position, chunk)) for position, chunk in enumerate(chunks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    data = {}
+    for dic in results:
+        data = combine_dicts(data, dic)
+    return data
+
+def scheduled_crawl(base_url: str, target_function, thread_count: int = 4, total_pages: int = 79, sizes_path: str = None):
+    '''
+    Runs instantiate_threads (pages pulled from a shared queue, largest first) against base_url, returning the data and the scheduler
+    '''
+    import scraper
+    site, scraper.BASE_URL = scraper.BASE_URL, base_url
+    try:
+        threads = scraper.instantiate_threads(thread_count, total_pages, target_function, sizes_path=sizes_path)
+        for thread in threads:
+            thread.use_cache = False
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        scraper.BASE_URL = site
+    data = {}
+    for thread in threads:
+        merge_into(data, thread.dic, copy=False)
+    return data, threads[0].scheduler
+
+def benchmark_crawl(fixtures_dir: str, latency: float = 0.05, concurrencies=(4, 8, 16)):
+    '''
+    Times the static thread partitioning against the shared page queue and the asyncio engine at a few concurrency levels and checks
+    they agree; the page queue is run twice, the second time ordered by the page sizes from the first
+    '''
+    from async_scraper import AsyncIndexCrawler
+    with FixtureServer(fixtures_dir, latency=latency) as server:
+        start = time.perf_counter()
+        expected = static_partition_crawl(server.base_url, count_anchor_names)
+        print(f"static partition, 4 threads: {time.perf_counter() - start:.2f}s")
+        sizes_path = os.path.join(tempfile.gettempdir(), "benchmark_page_sizes.json")
+        if os.path.exists(sizes_path):
+            os.remove(sizes_path)
+        for label in ("page order", "largest first"):
+            start = time.perf_counter()
+            data, scheduler = scheduled_crawl(server.base_url, count_anchor_names, 4, sizes_path=sizes_path)
+            elapsed = time.perf_counter() - start
+            busy = ", ".join(f"{stats['pages']} pages {stats['utilisation']:.0%}" for stats in scheduler.utilisation().values())
+            print(f"page queue ({label}), 4 threads: {elapsed:.2f}s, matches: {data == expected}, workers: {busy}")
+        os.remove(sizes_path)
+        for concurrency in concurrencies:
+            crawler = AsyncIndexCrawler(concurrency=concurrency, requests_per_second=None, base_url=server.base_url)
+            start = time.perf_counter()
+            data = crawler.run(count_anchor_names)
+            elapsed = time.perf_counter() - start
+            print(f"asyncio, concurrency {concurrency}: {elapsed:.2f}s, matches threads: {data == expected}, failed pages: {len(crawler.failed_pages)}")
+
+def load_fixture_pages(fixtures_dir: str, total_pages: int = 79):
+    '''
+    Returns a dictionary of page index ==> raw bytes of the saved i{n}.htm pages
+    '''
+    pages = {}
+    for i in range(1, total_pages + 1):
+        with open(os.path.join(fixtures_dir, f"i{i}.htm"), "rb") as f:
+            pages[i] = f.read()
+    return pages
+
+def benchmark_parsers(fixtures_dir: str, golden_path: str = None, repeats: int = 3):
+    '''
+    Times every installed parser backend over the saved pages and checks they all extract identical records
+    = golden_path: JSON file of the expected records; written from the html.parser output if it doesn't exist yet,
+        otherwise every backend is checked against it so a change in extraction shows up
+    '''
+    pages = load_fixture_pages(fixtures_dir)
+    outputs = {}
+    for name in available_backends():
+        backend = get_backend(name)
+        best = None
+        for repeat in range(0, repeats):
+            start = time.perf_counter()
+            outputs[name] = {index: backend.parse(content, index) for index, content in pages.items()}
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name}: {best / len(pages) * 1000:.2f}ms per page, {len(pages) / best:.0f} pages/sec")
+
+    reference = outputs["html.parser"]
+    if golden_path is not None:
+        if os.path.exists(golden_path):
+            with open(golden_path, "r", encoding="utf-8") as f:
+                reference = {int(index): [tuple(record) for record in records] for index, records in json.load(f).items()}
+        else:
+            with open(golden_path, "w", encoding="utf-8") as f:
+                json.dump(reference, f)
+            print(f"golden records written to {golden_path}")
+    agreed = True
+    for name, output in outputs.items():
+        mismatched = [index for index in pages if [tuple(record) for record in output[index]] != [tuple(record) for record in reference[index]]]
+        if mismatched:
+            agreed = False
+            print(f"{name} differs from the reference records on pages {mismatched}")
+    return agreed
+
+def fixture_vocabulary(fixtures_dir: str, exclude_middle_names: bool = True):
+    '''
+    Returns the distinct first names across the saved pages, i.e. the vocabulary find_variations_in_name searches
+    '''
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    names = set()
+    for index, content in load_fixture_pages(fixtures_dir).items():
+        for record in backend.parse(content, index):
+            names.add(record.first_name if exclude_middle_names else record.given_names)
+    return sorted(names)
+
+def benchmark_similarity(fixtures_dir: str, queries=("Mary", "Jacob", "Elizabeth", "William"), thresholds=(0.7, 0.75, 0.8, 0.85, 0.9)):
+    '''
+    Times scoring each query against the whole vocabulary one jaro_winkler_distance call at a time against jaro_winkler_batch,
+    then repeats each query at several thresholds with and without a SimilarityCache, and times NameSearchIndex top-k searches
+    '''
+    from name_search import NameSearchIndex
+    from namesnlp import EncodedNames, jaro_winkler_batch, jaro_winkler_distance
+    from similarity_cache import SimilarityCache
+    vocabulary = fixture_vocabulary(fixtures_dir)
+    encoded = EncodedNames(vocabulary)
+    print(f"vocabulary of {len(vocabulary)} names")
+    for query in queries:
+        start = time.perf_counter()
+        expected = [jaro_winkler_distance(query, name) for name in vocabulary]
+        looped = time.perf_counter() - start
+        start = time.perf_counter()
+        distances = jaro_winkler_batch(query, encoded)
+        batched = time.perf_counter() - start
+        start = time.perf_counter()
+        features = SimilarityCache().scores_of(query, vocabulary)
+        featured = time.perf_counter() - start
+        print(f"{query}: loop {looped * 1000:.1f}ms, batch {batched * 1000:.1f}ms, features {featured * 1000:.1f}ms, "
+              f"identical: {distances == expected and features == expected}")
+
+    start = time.perf_counter()
+    expected = [find_variations_in_name(query, vocabulary, threshold, True) for query in queries for threshold in thresholds]
+    uncached = time.perf_counter() - start
+    similarity = SimilarityCache()
+    start = time.perf_counter()
+    cached = [find_variations_in_name(query, vocabulary, threshold, True, similarity) for query in queries for threshold in thresholds]
+    elapsed = time.perf_counter() - start
+    print(f"{len(queries)} queries x {len(thresholds)} thresholds: uncached {uncached * 1000:.1f}ms, cached {elapsed * 1000:.1f}ms, "
+          f"{similarity.stats()}, identical: {cached == expected}")
+
+    index = NameSearchIndex(vocabulary)
+    for query in queries:
+        for k in (1, 10):
+            start = time.perf_counter()
+            nearest = index.top_k_variants(query, k)
+            elapsed = time.perf_counter() - start
+            expected = heapq.nlargest(k, ((name, jaro_winkler_distance(query, name)) for name in vocabulary), key=lambda item: item[1])
+            print(f"{query} top {k}: {elapsed * 1000:.2f}ms, scored {index.scored} of {len(vocabulary)}, identical: {nearest == expected}")
+
+def benchmark_clustering(fixtures_dir: str):
+    '''
+    Times clustering the whole vocabulary and reports how many pairs blocking left to score out of every possible pair
+    '''
+    from name_clustering import NameClusterer
+    counts = dict.fromkeys(fixture_vocabulary(fixtures_dir), 1)
+    clusterer = NameClusterer()
+    start = time.perf_counter()
+    clusters = clusterer.cluster(counts)
+    elapsed = time.perf_counter() - start
+    all_pairs = len(counts) * (len(counts) - 1) // 2
+    print(f"{len(counts)} names into {len(clusters)} clusters in {elapsed:.2f}s, scored {clusterer.comparisons} of {all_pairs} pairs")
+
+def benchmark_merging(fixtures_dir: str, repeats: int = 20):
+    '''
+    Times folding the per-page dictionaries into a total with combine_dicts (a new dictionary per page) and merge_into (in place),
+    for both the name ==> count and year ==> names shapes, and checks they agree
+    '''
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    pages = [backend.parse(content, index) for index, content in load_fixture_pages(fixtures_dir).items()]
+
+    def name_counts(records):
+        counts = {}
+        for record in records:
+            counts[record.first_name] = counts.get(record.first_name, 0) + 1
+        return counts
+
+    def year_names(records):
+        years = {}
+        for record in records:
+            if record.birth_year is not None:
+                years.setdefault(record.birth_year, []).append(record.first_name)
+        return years
+
+    for shape, extract in (("name counts", name_counts), ("year names", year_names)):
+        timings = {}
+        outputs = {}
+        for method in ("combine_dicts", "merge_into"):
+            elapsed = 0.0
+            for repeat in range(0, repeats):
+                partials = [extract(records) for records in pages]
+                start = time.perf_counter()
+                if method == "combine_dicts":
+                    total = {}
+                    for partial in partials:
+                        total = combine_dicts(total, partial)
+                else:
+                    total = {}
+                    for partial in partials:
+                        merge_into(total, partial, copy=False)
+                elapsed += time.perf_counter() - start
+            timings[method] = elapsed / repeats
+            outputs[method] = total
+        agreed = outputs["combine_dicts"] == outputs["merge_into"]
+        print(f"{shape}: " + ", ".join(f"{method} {seconds * 1000:.2f}ms" for method, seconds in timings.items()) + f", identical: {agreed}")
+
+def benchmark_year_names(fixtures_dir: str):
+    '''
+    Compares memory and decade query time of the year ==> list of names dictionary against YearNameTable
+    '''
+    from compact_years import YearNameTable
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    records = [record for index, content in load_fixture_pages(fixtures_dir).items() for record in backend.parse(content, index)]
+
+    tracemalloc.start()
+    year_names = {}
+    for record in records:
+        if record.birth_year is not None:
+            year_names.setdefault(record.birth_year, []).append((record.first_name + " ")[:-1])   # a separate string per person, as when parsed
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    table = YearNameTable.from_records(records)
+    table.arrays()
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(table)} people: dictionary of lists {dict_bytes / 1024:.0f}KiB, YearNameTable {table_bytes / 1024:.0f}KiB")
+
+    start = time.perf_counter()
+    expected = recomp_dict(merge_years_into_decade(year_names))
+    dict_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    counts = table.counts(period=10)
+    table_seconds = time.perf_counter() - start
+    print(f"decade counts: dictionaries {dict_seconds * 1000:.2f}ms, YearNameTable {table_seconds * 1000:.2f}ms, identical: {counts == expected}")
+
+def benchmark_birth_dates(fixtures_dir: str, repeats: int = 5):
+    '''
+    Times normalising every raw birth string on the saved pages one regex search at a time against BirthDateNormaliser's cache
+    '''
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    births = [record.birth_raw for index, content in load_fixture_pages(fixtures_dir).items()
+              for record in backend.parse(content, index) if record.birth_raw is not None]
+    uncached = cached = None
+    for repeat in range(0, repeats):
+        start = time.perf_counter()
+        expected = [parse_birth_date(birth_raw) for birth_raw in births]
+        uncached = min(uncached or float('inf'), time.perf_counter() - start)
+        normaliser = BirthDateNormaliser()
+        start = time.perf_counter()
+        dates = normaliser.normalise_all(births)
+        cached = min(cached or float('inf'), time.perf_counter() - start)
+    print(f"{len(births)} births, {len(normaliser.cache)} distinct: uncached {uncached * 1000:.2f}ms, cached {cached * 1000:.2f}ms, "
+          f"{normaliser.stats()}, identical: {dates == expected}")
+
+def benchmark_aggregates(fixtures_dir: str, top_per_decade=(1, 2, 3, 4, 5)):
+    '''
+    Times the data behind a set of per-decade charts recomputed from the stored records for every chart, as the plot functions did,
+    against loading the persisted NameAggregates once and looking every chart up
+    '''
+    from compact_years import YearNameTable
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    store = RecordStore()
+    for index, content in load_fixture_pages(fixtures_dir).items():
+        store.add_records(backend.parse(content, index))
+    refresh_aggregates(store)
+
+    start = time.perf_counter()
+    expected = {}
+    for n in top_per_decade:
+        table = YearNameTable.from_records(store.records())
+        expected[n] = table.top_n(period=10, n=n, include_ties=True)
+    recomputed = time.perf_counter() - start
+    start = time.perf_counter()
+    aggregates = NameAggregates.from_store(store)
+    tops = {n: aggregates.top_n(period=10, n=n, include_ties=True) for n in top_per_decade}
+    looked_up = time.perf_counter() - start
+    start = time.perf_counter()
+    for n in top_per_decade:
+        aggregates.top_n(period=10, n=n, include_ties=True)
+    repeated = time.perf_counter() - start
+    unordered = lambda tops: {period: sorted(names) for period, names in tops.items()}    # names tied on a count may come in another order
+    print(f"{len(store)} people, {len(top_per_decade)} charts: recomputed {recomputed * 1000:.2f}ms, persisted aggregates {looked_up * 1000:.2f}ms "
+          f"(again {repeated * 1000:.3f}ms), identical: {all(unordered(tops[n]) == unordered(expected[n]) for n in top_per_decade)}")
+
+def benchmark_search(fixtures_dir: str, surname: str = "Smith", name: str = "Mary", born=(1820, 1840), repeats: int = 20):
+    '''
+    Times a surname + name variants + birth years query as a scan over every record against RecordIndex
+    '''
+    backend = get_backend("lxml") if "lxml" in available_backends() else get_backend()
+    records = [record for index, content in load_fixture_pages(fixtures_dir).items() for record in backend.parse(content, index)]
+    start = time.perf_counter()
+    index = RecordIndex.from_records(records)
+    built = time.perf_counter() - start
+    spellings = {variant.upper() for variant in index.variants(name)}
+    scanned = indexed = None
+    for repeat in range(0, repeats):
+        start = time.perf_counter()
+        expected = [record for record in records if (record.surname or "").upper() == surname.upper() and record.first_name.upper() in spellings
+                    and record.birth_year is not None and born[0] <= record.birth_year <= born[1]]
+        scanned = min(scanned or float('inf'), time.perf_counter() - start)
+        start = time.perf_counter()
+        found = index.query(surname=surname, name=name, born=born, variants=True)
+        indexed = min(indexed or float('inf'), time.perf_counter() - start)
+    print(f"{len(records)} people, index built in {built * 1000:.1f}ms; {surname} born {born[0]}-{born[1]} named {name} or {len(spellings) - 1} other spellings: "
+          f"{len(found)} found, scan {scanned * 1000:.2f}ms, index {indexed * 1000:.2f}ms, identical: {found == expected}")
+
+def benchmark_faults(fixtures_dir: str, error_rate: float = 0.2, hang_rate: float = 0.02, garbage_rate: float = 0.05, seed: int = 1):
+    '''
+    Crawls the pages from a fixture server which fails a share of requests (503s, stalls and error pages served with a 200),
+    then retries the dead letters, checking the output matches a crawl without faults
+    '''
+    from async_scraper import AsyncIndexCrawler
+    from resilient_fetch import CircuitBreaker, DeadLetters
+    with FixtureServer(fixtures_dir) as server:
+        expected = AsyncIndexCrawler(base_url=server.base_url, requests_per_second=None).run(count_anchor_names)
+    faults = {'error_rate': error_rate, 'retry_after': 0, 'hang_rate': hang_rate, 'hang_seconds': 5.0, 'garbage_rate': garbage_rate, 'seed': seed}
+    with FixtureServer(fixtures_dir, faults=faults) as server:
+        crawler = AsyncIndexCrawler(base_url=server.base_url, requests_per_second=None, max_attempts=4, backoff=0.05, timeout=(1.0, 1.0),
+                                    breaker=CircuitBreaker(failure_threshold=10, reset_timeout=0.5), dead_letters=DeadLetters())
+        start = time.perf_counter()
+        pages = crawler.run_per_page(count_anchor_names)
+        elapsed = time.perf_counter() - start
+        print(f"faults {faults}: {len(pages)} pages in {elapsed:.3f}s ({len(pages) / elapsed:.1f} pages/s), {crawler.retries} retries, "
+              f"circuit opened {crawler.breaker.times_opened} times, dead letters {crawler.dead_letters.pages()}")
+        for attempt in range(0, 3):
+            if not len(crawler.dead_letters):
+                break
+            pages.update(crawler.run_per_page(count_anchor_names, pages=crawler.dead_letters.pages()))
+    data = {}
+    for index in sorted(pages):
+        merge_into(data, pages[index], copy=False)
+    print(f"after retrying the dead letters: {len(pages)} pages, {len(crawler.dead_letters)} still failing, identical: {data == expected}")
+
+def benchmark_pipeline(fixtures_dir: str, backend: str = "html.parser", repeats: int = 3):
+    '''
+    Times the fetch + parse pipeline in each mode, with the process pool at 1, 2, 4, ... workers up to the number of cores
+    '''
+    from pipeline import ParsingPipeline
+    cores = os.cpu_count() or 1
+    configurations = [("serial", 1), ("thread", cores)]
+    workers = 1
+    while workers < cores:
+        configurations.append(("process", workers))
+        workers *= 2
+    configurations.append(("process", cores))
+    print(f"{cores} cores, {backend} backend")
+    with FixtureServer(fixtures_dir) as server:
+        expected = None
+        for mode, workers in configurations:
+            best = None
+            for i in range(0, repeats):
+                pipeline = ParsingPipeline(mode=mode, workers=workers, backend=backend, base_url=server.base_url, requests_per_second=None)
+                start = time.perf_counter()
+                result = pipeline.run()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if expected is None:
+                expected = result
+            pages_per_second = len(result.records) / best
+            print(f"{mode} x{workers}: {best:.3f}s, {pages_per_second:.1f} pages/s, failed {len(pipeline.failed_pages)}, identical: {result == expected}")
+
+def benchmark_streaming(fixtures_dir: str, n: int = 10):
+    '''
+    Compares peak memory and time of the top n names from every record held at once, filtered and sorted as dictionaries,
+    against a RecordStream consuming the records page by page
+    '''
+    from pipeline import ParsingPipeline
+    from streaming import RecordStream, name_not_in
+    with FixtureServer(fixtures_dir) as server:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = ParsingPipeline(mode="serial", base_url=server.base_url, requests_per_second=None).run()
+        names = [record.first_name for records in result.records.values() for record in records]
+        counts = {}
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+        expected = dict(list(filter_dict(sort_dict_by_values_desc(counts), condition_filter_out_specific_names).items())[:n])
+        materialised = (time.perf_counter() - start, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del result, names, counts
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        top = RecordStream.scrape(base_url=server.base_url, requests_per_second=None).filter(name_not_in()).first_names().most_common(n)
+        streamed = (time.perf_counter() - start, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    for label, (seconds, peak) in (("materialised", materialised), ("streamed", streamed)):
+        print(f"{label}: {seconds:.3f}s, peak {peak / 1024:.0f}KiB")
+    print(f"identical: {top == expected}")
+
+def run_mode(run, repeats: int):
+    '''
+    Returns (best wall time in seconds, peak traced memory in bytes, output) of run(); memory is measured on a separate run
+    so tracing doesn't slow down the timed ones, and only covers this process (not the workers of a process pool)
+    '''
+    best = None
+    for i in range(0, repeats):
+        start = time.perf_counter()
+        output = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, output
+
+def parse_time_per_page(pages: dict, parse, repeats: int = 3):
+    '''
+    Returns the best average time in seconds parse takes on one of the saved pages, without any network
+    '''
+    best = None
+    for i in range(0, repeats):
+        start = time.perf_counter()
+        for index, content in pages.items():
+            parse(content, index)
+        elapsed = (time.perf_counter() - start) / len(pages)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark_suite(fixtures_dir: str, baseline_path: str = None, latency: float = 0.05, jitter: float = 0.02, tolerance: float = 0.2, repeats: int = 3):
+    '''
+    End-to-end run of every execution mode against the fixture server, reporting pages/sec, parse time per page, peak memory and
+    wall time for each, and checking they all agree
+    = baseline_path: JSON file of an earlier run; written if it doesn't exist yet, otherwise any mode more than tolerance slower
+        (pages/sec) or bigger (peak memory) than it is flagged as a regression
+    - returns True when there are no regressions
+    '''
+    from async_scraper import AsyncIndexCrawler
+    from bs4 import BeautifulSoup
+    from pipeline import ParsingPipeline
+    pages = load_fixture_pages(fixtures_dir)
+    soup_parse = lambda content, index: count_anchor_names(BeautifulSoup(content, "html.parser"))
+    backend = get_backend()
+    parse_times = {"bs4": parse_time_per_page(pages, soup_parse), "html.parser": parse_time_per_page(pages, backend.parse)}
+
+    modes = {}  # name ==> (parser, function running the whole scrape against base_url)
+    for threads in (4, 8):
+        modes[f"threads x{threads} (pool 10)"] = ("bs4", lambda base_url, threads=threads: static_partition_crawl(base_url, count_anchor_names, threads))
+    for concurrency in (4, 8, 16):
+        modes[f"asyncio x{concurrency}"] = ("bs4", lambda base_url, concurrency=concurrency:
+            AsyncIndexCrawler(concurrency=concurrency, requests_per_second=None, base_url=base_url).run(count_anchor_names))
+    for mode in ("serial", "thread", "process"):
+        modes[f"pipeline {mode}"] = ("html.parser", lambda base_url, mode=mode:
+            ParsingPipeline(mode=mode, base_url=base_url, requests_per_second=None).run().names)
+
+    results = {}
+    outputs = {}
+    print(f"{len(pages)} pages, latency {latency * 1000:.0f}ms + up to {jitter * 1000:.0f}ms jitter, {os.cpu_count()} cores")
+    with FixtureServer(fixtures_dir, latency=latency, jitter=jitter) as server:
+        for name, (parser, run) in modes.items():
+            wall, peak, outputs[name] = run_mode(lambda: run(server.base_url), repeats)
+            results[name] = {'wall_seconds': wall, 'pages_per_second': len(pages) / wall, 'parse_ms_per_page': parse_times[parser] * 1000,
+                             'peak_kib': peak / 1024}
+            print(f"{name}: {wall:.2f}s, {len(pages) / wall:.1f} pages/s, parse {parse_times[parser] * 1000:.2f}ms/page, peak {peak / 1024:.0f}KiB")
+    for name, output in outputs.items():   # the bs4 modes count whole link texts and the pipeline first names, so check each against its own kind
+        reference = next(other for other in modes if modes[other][0] == modes[name][0])
+        if output != outputs[reference]:
+            print(f"{name} doesn't agree with {reference}")
+
+    if baseline_path is None:
+        return True
+    if not os.path.exists(baseline_path):
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"baseline written to {baseline_path}")
+        return True
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if result['pages_per_second'] < baseline[name]['pages_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['pages_per_second']:.1f} pages/s, baseline {baseline[name]['pages_per_second']:.1f}")
+        if result['peak_kib'] > baseline[name]['peak_kib'] * (1 + tolerance):
+            regressions.append(f"{name}: peak {result['peak_kib']:.0f}KiB, baseline {baseline[name]['peak_kib']:.0f}KiB")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return not regressions
+
+def benchmark_startup(runs: int = 5, modules=("scraper", "records", "cli"), heavy=("bs4", "requests", "matplotlib", "numpy")):
+    '''
+    Times importing each library module in a fresh interpreter, checking that none of the heavy dependencies are pulled in on import
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        code = ("import sys, time; start = time.perf_counter(); import " + module + "; elapsed = time.perf_counter() - start; "
+                f"print(elapsed, *(name for name in {heavy!r} if name in sys.modules))")
+        timings, loaded = [], set()
+        for i in range(0, runs):
+            output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(output[0]))
+            loaded.update(output[1:])
+        print(f"import {module}: best {min(timings) * 1000:.1f}ms of {runs}, heavy modules loaded: {', '.join(sorted(loaded)) or 'none'}")
+    timings = []
+    for i in range(0, runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(here, "cli.py"), "--help"], capture_output=True, check=True)
+        timings.append(time.perf_counter() - start)
+    print(f"cli.py --help: best {min(timings) * 1000:.1f}ms of {runs} including interpreter start")
+
+if __name__ == "__main__":
+    if sys.argv[1] == "suite":
+        sys.exit(0 if benchmark_suite(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None,
+                                      *(float(value) for value in sys.argv[4:6])) else 1)
+    elif sys.argv[1] == "crawl":
+        benchmark_crawl(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 0.05)
+    elif sys.argv[1] == "parsers":
+        sys.exit(0 if benchmark_parsers(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None) else 1)
+    elif sys.argv[1] == "similarity":
+        benchmark_similarity(sys.argv[2], *([sys.argv[3:]] if len(sys.argv) > 3 else []))
+    elif sys.argv[1] == "clustering":
+        benchmark_clustering(sys.argv[2])
+    elif sys.argv[1] == "merging":
+        benchmark_merging(sys.argv[2])
+    elif sys.argv[1] == "years":
+        benchmark_year_names(sys.argv[2])
+    elif sys.argv[1] == "dates":
+        benchmark_birth_dates(sys.argv[2])
+    elif sys.argv[1] == "aggregates":
+        benchmark_aggregates(sys.argv[2])
+    elif sys.argv[1] == "search":
+        benchmark_search(sys.argv[2], *sys.argv[3:5])
+    elif sys.argv[1] == "faults":
+        benchmark_faults(sys.argv[2], *(float(value) for value in sys.argv[3:6]))
+    elif sys.argv[1] == "pipeline":
+        benchmark_pipeline(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "html.parser")
+    elif sys.argv[1] == "streaming":
+        benchmark_streaming(sys.argv[2])
+    elif sys.argv[1] == "startup":
+        benchmark_startup(int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,274 @@
+'''
+Command line entry point: scrape the index pages once into a record store, then run analyses over the stored records
+
+    python cli.py scrape [--backend lxml] [--mode process]   fetch (through the page cache) and parse every page into records.sqlite
+    python cli.py scrape --retry-failed                      only the pages which failed every attempt last time (see resilient_fetch.py)
+    python cli.py scrape --incremental                       only parse and store again the pages which changed (see incremental.py)
+    python cli.py crawl [--max-depth 2] [--checkpoint f]      crawl the site from master_index.htm, storing every index page found
+    python cli.py count [--top 20] [--full-names]            first names and their occurrences
+    python cli.py by-year [--decade] [--top 3]               most common names per year or decade
+    python cli.py variants Marie [--threshold 0.75]          spellings of a name by Jaro-Winkler distance
+    python cli.py variants Jacob --phonetic double_metaphone names sharing a phonetic code with a name
+    python cli.py variants Mary --top 10                     the closest spellings of a name, best first
+    python cli.py surnames [--top 20] [--decade]             most common surnames, overall or per decade
+    python cli.py search --surname Smith --born 1820 1840 --name Mary --variants    people matching all of the conditions
+    python cli.py plot names|decades [--output chart.png]    bar charts, saved to a file without a window when --output is given
+    python cli.py plot decades --per-decade 3                the three most common names of each decade side by side
+    python cli.py charts --output-dir Plots                  every chart saved to files, for batch runs without a display
+
+Everything apart from argparse is imported inside the command that needs it, so commands working on the stored records never
+import requests, bs4 or matplotlib, and --timing shows how long a command took from the moment cli.py was loaded, so every import
+but the interpreter's own start-up is included (benchmarks.py startup times that too).
+For a closer look, --report run_report.json writes the per-stage timings, fetch latencies and cache hit rates of the command
+(see metrics.py) and --profile cprofile|pyinstrument profiles it.
+'''
+import argparse
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()   # as cli.py is loaded, before any command's imports
+
+def open_store(args):
+    from records import RecordStore
+    if not os.path.exists(args.store) or len(RecordStore(args.store)) == 0:
+        print(f"No records in {args.store}, run the scrape command first")
+        sys.exit(1)
+    return RecordStore(args.store)
+
+def name_counts(args):
+    return open_store(args).firstname_counts(exclude_middle_names=not args.full_names)
+
+def name_aggregates(args):
+    from aggregates import NameAggregates
+    if args.metrics is None:
+        return NameAggregates.from_store(open_store(args), exclude_middle_names=not args.full_names)
+    with args.metrics.timer('aggregates'):
+        return NameAggregates.from_store(open_store(args), exclude_middle_names=not args.full_names)
+
+def command_scrape(args):
+    from page_cache import PageCache
+    from records import build_record_store
+    from resilient_fetch import CircuitBreaker, DeadLetters
+    cache = PageCache(args.cache_dir, offline=args.offline)
+    args.caches['pages'] = cache
+    dead_letters = DeadLetters(args.dead_letters)
+    pages = dead_letters.pages() if args.retry_failed else range(1, 80)
+    crawler_options = dict(concurrency=args.concurrency, base_url=args.base_url, cache=cache, metrics=args.metrics, max_attempts=args.max_attempts,
+                           timeout=tuple(args.timeout), breaker=CircuitBreaker(), dead_letters=dead_letters)
+    if args.incremental:
+        from incremental import IncrementalScraper
+        from records import RecordStore, refresh_aggregates
+        store = RecordStore(args.store)
+        scraper = IncrementalScraper(args.incremental_state, backend=args.backend)
+        changed = scraper.refresh(pages, store=store, **crawler_options)
+        refresh_aggregates(store)
+        for index, error in scraper.failed_pages:
+            print(f"Page i{index}.htm failed: {error}")
+        print(f"{len(changed)} of {len(pages)} pages changed" + (f": {', '.join(f'i{index}.htm' for index in changed)}" if 0 < len(changed) <= 10 else ""))
+    else:
+        store = build_record_store(args.store, backend=args.backend, mode=args.mode, workers=args.workers, pages=pages, **crawler_options)
+    print(f"{len(store)} records from {len(store.pages())} pages stored in {args.store}")
+    if len(dead_letters):
+        print(f"{len(dead_letters)} pages failed every attempt, listed in {args.dead_letters}; run scrape --retry-failed to try them again")
+
+def command_crawl(args):
+    from page_cache import PageCache
+    from parser_backends import get_backend
+    from records import RecordStore, refresh_aggregates
+    from resilient_fetch import CircuitBreaker
+    from site_crawler import INDEX_PAGE_PATTERN, SiteCrawler
+    store = RecordStore(args.store)
+    backend = get_backend(args.backend)
+
+    def store_index_page(content, url):
+        match = INDEX_PAGE_PATTERN.search(url)
+        if match:
+            start = time.perf_counter()
+            records = backend.parse(content, int(match.group(1)))
+            if args.metrics is not None:
+                args.metrics.add_time('parse', time.perf_counter() - start)
+                args.metrics.count('records', len(records))
+            store.replace_page(int(match.group(1)), records)
+
+    cache = PageCache(args.cache_dir, offline=args.offline)
+    args.caches['pages'] = cache
+    crawler = SiteCrawler(max_depth=args.max_depth, max_pages=args.max_pages, checkpoint_path=args.checkpoint, concurrency=args.concurrency,
+                          requests_per_second=args.requests_per_second, base_url=args.base_url, cache=cache, metrics=args.metrics,
+                          max_attempts=args.max_attempts, timeout=tuple(args.timeout), breaker=CircuitBreaker(), retry_failed=args.retry_failed)
+    crawler.run(store_index_page)
+    refresh_aggregates(store)
+    for url, error in crawler.failed_pages:
+        print(f"{url} failed: {error}")
+    print(f"{len(crawler.visited)} pages crawled, {len(crawler.failed)} given up on, {len(crawler.frontier())} left in the frontier, {len(store)} records from {len(store.pages())} index pages stored in {args.store}")
+
+def command_count(args):
+    from dictionary_funcs import sort_dict_by_values_desc, top_n_by_value
+    counts = top_n_by_value(name_counts(args), args.top) if args.top else sort_dict_by_values_desc(name_counts(args))
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+
+def command_by_year(args):
+    for period, tops in sorted(name_aggregates(args).top_n(period=10 if args.decade else 1, n=args.top).items()):
+        print(f"{period}: " + ", ".join(f"{name} ({count})" for name, count in tops))
+
+def command_variants(args):
+    if args.phonetic:
+        from phonetic_index import PhoneticIndex
+        index = PhoneticIndex.from_store(open_store(args), exclude_middle_names=not args.full_names)   # built by the scrape
+        variations = index.lookup(args.name, args.phonetic)
+    elif args.top:
+        from name_search import top_k_variants
+        variations = dict(top_k_variants(args.name, list(name_counts(args).keys()), args.top))
+    else:
+        from scraper import find_variations_in_name
+        variations = find_variations_in_name(args.name, list(name_counts(args).keys()), args.threshold, True)
+    print(f"Target name: {args.name}")
+    for name, value in variations.items():
+        print(f"Name: {name}; {'Count' if args.phonetic else 'Distance'}: {value}")
+
+def command_surnames(args):
+    from record_index import RecordIndex
+    index = RecordIndex.from_store(open_store(args))
+    if args.decade:
+        for period, tops in sorted(index.surname_aggregates().top_n(period=10, n=args.top).items()):
+            print(f"{period}: " + ", ".join(f"{surname} ({count})" for surname, count in tops))
+    else:
+        for surname, count in list(index.surname_counts().items())[:args.top]:
+            print(f"{surname}: {count}")
+
+def command_search(args):
+    from record_index import query_store
+    records = query_store(open_store(args), surname=args.surname, name=args.name, born=args.born, variants=args.variants,
+                          threshold=args.threshold, phonetic=args.phonetic, full_names=args.full_names)
+    for record in records:
+        print(f"{record.given_names} {record.surname}, b. {record.birth_raw or '?'} (i{record.source_page}.htm)")
+    print(f"{len(records)} people")
+
+def command_plot(args):
+    import plotting
+    from dictionary_funcs import condition_filter_out_specific_names
+    aggregates = name_aggregates(args)
+    if args.chart == "names":
+        draw = lambda path: plotting.format_plot_for_getFirstNames(aggregates.top_names(args.top, condition_filter_out_specific_names), output_path=path)
+    else:
+        draw = lambda path: plotting.format_plot_for_getFirstNamesWithBirthYearAsInt(aggregates, args.per_decade, output_path=path)
+    plotting.render(draw, args.output, args.metrics)
+
+def command_charts(args):
+    import plotting
+    for path in plotting.render_charts(name_aggregates(args), args.output_dir, args.per_decade, args.top, args.format, args.metrics):
+        print(path)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape and analyse the Wiltshire family history surname index")
+    parser.add_argument("--store", default="records.sqlite", help="SQLite file holding the parsed records")
+    parser.add_argument("--timing", action="store_true", help="print how long the command took, its imports included, from when cli.py was loaded")
+    parser.add_argument("--report", help="write a JSON run report of stage timings, fetch latencies and cache hit rates to this file")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="profile the command")
+    parser.add_argument("--profile-output", help="file for the profile (.prof for cprofile, .html or text for pyinstrument), stderr otherwise")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scrape = subparsers.add_parser("scrape", help="fetch and parse every index page into the record store")
+    scrape.add_argument("--backend", default="html.parser", help="parser backend: html.parser, lxml or selectolax")
+    scrape.add_argument("--mode", choices=["serial", "thread", "process"], default="process", help="how pages are parsed while others download")
+    scrape.add_argument("--workers", type=int, default=None, help="parser threads or processes, defaults to the number of cores")
+    scrape.add_argument("--concurrency", type=int, default=8, help="pages downloading at once")
+    scrape.add_argument("--cache-dir", default="page_cache")
+    scrape.add_argument("--offline", action="store_true", help="only use pages already in the page cache")
+    scrape.add_argument("--base-url", default="https://www.wiltshirefamilyhistory.org", help="site (or local mirror) the index pages are under")
+    scrape.add_argument("--max-attempts", type=int, default=4, help="tries per page before it is given up on")
+    scrape.add_argument("--timeout", type=float, nargs=2, default=[5.0, 30.0], metavar=("CONNECT", "READ"), help="seconds")
+    scrape.add_argument("--dead-letters", default="dead_letters.json", help="file listing the pages which failed every attempt")
+    scrape.add_argument("--retry-failed", action="store_true", help="only scrape the pages in --dead-letters")
+    scrape.add_argument("--incremental", action="store_true", help="only parse and store the pages whose content changed since the last incremental scrape")
+    scrape.add_argument("--incremental-state", default="incremental_state.json", help="file of page hashes kept between incremental scrapes")
+    scrape.set_defaults(run=command_scrape)
+
+    crawl = subparsers.add_parser("crawl", help="crawl every page reachable from master_index.htm, storing the records of the index pages found")
+    crawl.add_argument("--max-depth", type=int, default=None, help="links to follow away from master_index.htm, no limit by default")
+    crawl.add_argument("--max-pages", type=int, default=None)
+    crawl.add_argument("--checkpoint", default="crawl_checkpoint.json", help="file the crawl is saved to and resumed from")
+    crawl.add_argument("--backend", default="html.parser", help="parser backend: html.parser, lxml or selectolax")
+    crawl.add_argument("--concurrency", type=int, default=4, help="pages downloading at once")
+    crawl.add_argument("--requests-per-second", type=float, default=2.0, help="politeness limit on requests to the site")
+    crawl.add_argument("--cache-dir", default="page_cache")
+    crawl.add_argument("--offline", action="store_true", help="only use pages already in the page cache")
+    crawl.add_argument("--base-url", default="https://www.wiltshirefamilyhistory.org", help="site (or local mirror) to crawl")
+    crawl.add_argument("--max-attempts", type=int, default=4, help="tries per page before it is given up on")
+    crawl.add_argument("--timeout", type=float, nargs=2, default=[5.0, 30.0], metavar=("CONNECT", "READ"), help="seconds")
+    crawl.add_argument("--retry-failed", action="store_true", help="fetch the pages a resumed checkpoint gave up on again")
+    crawl.set_defaults(run=command_crawl)
+
+    count = subparsers.add_parser("count", help="first names and their occurrences")
+    count.add_argument("--top", type=int, default=None)
+    count.set_defaults(run=command_count)
+
+    by_year = subparsers.add_parser("by-year", help="most common names per birth year or decade")
+    by_year.add_argument("--decade", action="store_true")
+    by_year.add_argument("--top", type=int, default=1)
+    by_year.set_defaults(run=command_by_year)
+
+    variants = subparsers.add_parser("variants", help="variations of a name")
+    variants.add_argument("name")
+    variants.add_argument("--threshold", type=float, default=0.75)
+    variants.add_argument("--phonetic", choices=["soundex", "nysiis", "double_metaphone"], help="look up by phonetic code instead of distance")
+    variants.add_argument("--top", type=int, default=None, help="the closest names, best first, instead of every name above the threshold")
+    variants.set_defaults(run=command_variants)
+
+    surnames = subparsers.add_parser("surnames", help="most common surnames, overall or per birth decade")
+    surnames.add_argument("--top", type=int, default=20)
+    surnames.add_argument("--decade", action="store_true", help="the most common surnames of each decade instead of overall")
+    surnames.set_defaults(run=command_surnames)
+
+    search = subparsers.add_parser("search", help="people by surname, first name and birth year, answered from an inverted index")
+    search.add_argument("--surname", nargs="+")
+    search.add_argument("--name", nargs="+", help="first names, or given names with --full-names")
+    search.add_argument("--born", type=int, nargs=2, metavar=("FROM", "TO"), help="birth years, inclusive")
+    search.add_argument("--variants", action="store_true", help="also match spellings of --name scoring above --threshold")
+    search.add_argument("--threshold", type=float, default=0.85)
+    search.add_argument("--phonetic", choices=["soundex", "nysiis", "double_metaphone"], help="also match names sharing a phonetic code with --name")
+    search.set_defaults(run=command_search)
+
+    plot = subparsers.add_parser("plot", help="bar chart of name counts or of the top name per decade")
+    plot.add_argument("chart", choices=["names", "decades"])
+    plot.add_argument("--top", type=int, default=50)
+    plot.add_argument("--per-decade", type=int, default=1, help="most common names plotted for each decade")
+    plot.add_argument("--output", help="save the chart to this file instead of showing it")
+    plot.set_defaults(run=command_plot)
+
+    charts = subparsers.add_parser("charts", help="save the names chart and the per-decade charts to files")
+    charts.add_argument("--output-dir", default="Plots")
+    charts.add_argument("--per-decade", type=int, nargs="+", default=[1, 3, 5], help="a per-decade chart for each of these numbers of names")
+    charts.add_argument("--top", type=int, default=50, help="names in the overall chart")
+    charts.add_argument("--format", default="png", help="file type: png, svg, pdf...")
+    charts.set_defaults(run=command_charts)
+
+    for subparser in (count, by_year, variants, search, plot, charts):
+        subparser.add_argument("--full-names", action="store_true", help="count all given names, i.e. Mary Lucy, rather than only the first")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.metrics = None
+    args.caches = {}    # caches a command used, for the run report
+    if args.report is None and args.profile is None:
+        args.run(args)
+    else:
+        from metrics import RunMetrics, profiled
+        if args.report is not None:
+            args.metrics = RunMetrics()
+        with profiled(args.profile, args.profile_output):
+            if args.metrics is not None:
+                with args.metrics.timer(args.command):
+                    args.run(args)
+            else:
+                args.run(args)
+        if args.metrics is not None:
+            args.metrics.save(args.report, caches=args.caches)
+    if args.timing:
+        print(f"{args.command} took {time.perf_counter() - STARTED:.3f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+'''
+Compact, array-backed storage for birth year ==> names data
+
+get_firstnames_with_birthyear keeps every person as a separate string in a per-year list, so memory grows with the number of
+people rather than the number of distinct names. YearNameTable instead interns every distinct name once in a vocabulary and keeps
+one (year, name id) pair of integers per person in two NumPy arrays. Decade merges and per-period counts then become vectorised
+group-bys over those arrays instead of list appends and dictionary loops:
+    table = YearNameTable.from_year_names(get_firstnames_with_birthyear(page, True, True))
+    table.counts(period=10)         ==> same as recomp_dict(merge_years_into_decade(...))
+    table.top_n(period=10, n=3)     ==> {1830: [('Mary', 120), ('John', 98), ('William', 71)], ...}
+'''
+from array import array
+from typing import List
+import numpy as np
+
+class YearNameTable:
+    def __init__(self):
+        self.vocabulary = []    # name id ==> name
+        self.name_ids = {}      # name ==> name id
+        self.year_buffer = array('i')   # people added since the arrays were last built
+        self.name_buffer = array('i')
+        self.years = np.zeros(0, dtype=np.int32)
+        self.names = np.zeros(0, dtype=np.int32)
+
+    def intern(self, name: str):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.vocabulary)
+            self.name_ids[name] = name_id
+            self.vocabulary.append(name)
+        return name_id
+
+    def add(self, year: int, name: str, count: int = 1):
+        name_id = self.intern(name)
+        for i in range(0, count):
+            self.year_buffer.append(year)
+            self.name_buffer.append(name_id)
+
+    @classmethod
+    def from_year_names(cls, year_names: dict):
+        '''
+        Builds a table from the output of get_firstnames_with_birthyear with format_circa=True (integer years)
+        '''
+        table = cls()
+        for year, names in year_names.items():
+            for name in names:
+                table.add(year, name)
+        return table
+
+    @classmethod
+    def from_records(cls, records, exclude_middle_names: bool = True):
+        '''
+        Builds a table from PersonRecords (see records.py), skipping anyone without a known birth year
+        '''
+        table = cls()
+        for record in records:
+            if record.birth_year is not None:
+                table.add(record.birth_year, record.first_name if exclude_middle_names else record.given_names)
+        return table
+
+    def arrays(self):
+        '''
+        Returns the (years, name ids) arrays, one entry per person
+        '''
+        if len(self.year_buffer):   # move the buffered people into the arrays so each person is only held once
+            self.years = np.concatenate((self.years, np.frombuffer(self.year_buffer, dtype=np.int32)))
+            self.names = np.concatenate((self.names, np.frombuffer(self.name_buffer, dtype=np.int32)))
+            self.year_buffer = array('i')
+            self.name_buffer = array('i')
+        return self.years, self.names
+
+    def __len__(self):
+        return len(self.years) + len(self.year_buffer)
+
+    def memory_bytes(self):
+        '''
+        Approximate memory held by the table: the integer arrays plus the distinct name strings
+        '''
+        return len(self) * 8 + sum(len(name) + 49 for name in self.vocabulary)
+
+    def grouped(self, period: int = 1):
+        '''
+        Returns (periods, name ids, counts) arrays with one entry for every period and name which occur together
+        = period: 1 groups by year, 10 by decade, 100 by century and so on; a period's key is its first year, i.e. 1830 for 1830-1839
+        '''
+        years, names = self.arrays()
+        if len(years) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        periods = (years // period) * period
+        base = periods.min()
+        keys = (periods.astype(np.int64) - base) * len(self.vocabulary) + names
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        return unique_keys // len(self.vocabulary) + base, unique_keys % len(self.vocabulary), counts
+
+    def counts(self, period: int = 1):
+        '''
+        Returns a dictionary of period ==> {name: count}, the same structure as recomp_dict (or recomp_dict(merge_years_into_decade(...)) for period=10)
+        '''
+        result = {}
+        for p, name_id, count in zip(*(column.tolist() for column in self.grouped(period))):
+            result.setdefault(p, {})[self.vocabulary[name_id]] = count
+        return result
+
+    def year_names(self, period: int = 1):
+        '''
+        Returns a dictionary of period ==> list of names, the same structure as get_firstnames_with_birthyear (or merge_years_into_decade for period=10)
+        '''
+        years, names = self.arrays()
+        periods = (years // period) * period
+        result = {}
+        for p, name_id in zip(periods.tolist(), names.tolist()):
+            result.setdefault(p, []).append(self.vocabulary[name_id])
+        return result
+
+    def top_n(self, period: int = 10, n: int = 1, include_ties: bool = True):
+        '''
+        Returns a dictionary of period ==> list of (name, count) for the n most common names in that period, most common first
+        - include_ties: also include names tied on the count of the nth name, as the decade plot does for the top name
+        - n of 0 or less gives an empty dictionary
+        '''
+        if n <= 0:
+            return {}
+        periods, name_ids, counts = self.grouped(period)
+        order = np.lexsort((name_ids, -counts, periods))    # by period, then count descending, then name id
+        periods, name_ids, counts = periods[order], name_ids[order], counts[order]
+        boundaries = np.flatnonzero(np.diff(periods)) + 1
+        result = {}
+        for start, end in zip(np.concatenate(([0], boundaries)).tolist(), np.concatenate((boundaries, [len(periods)])).tolist()):
+            if start == end:
+                continue
+            stop = min(start + n, end)
+            if include_ties:
+                while stop < end and counts[stop] == counts[stop - 1]:
+                    stop += 1
+            result[int(periods[start])] = [(self.vocabulary[name_id], count) for name_id, count in zip(name_ids[start:stop].tolist(), counts[start:stop].tolist())]
+        return result
+
+    def name_totals(self, names: List[str] = None):
+        '''
+        Returns a dictionary of name ==> number of people, optionally only for the given names
+        '''
+        years, name_ids = self.arrays()
+        totals = np.bincount(name_ids, minlength=len(self.vocabulary))
+        if names is None:
+            return {name: int(total) for name, total in zip(self.vocabulary, totals.tolist()) if total}
+        return {name: int(totals[self.name_ids[name]]) if name in self.name_ids else 0 for name in names}
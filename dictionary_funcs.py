@@ -1,3 +1,5 @@
+from aggregation import merge_into
+import heapq
 import re
 
 def sort_dict_by_values_desc(data):
@@ -72,24 +74,28 @@ def trim_sorted_dictionary(dic, top_n_percent=0.1):
     n = round(len(dic) * top_n_percent)
     return dict(list(dic.items())[:n])
 
+def top_n_by_value(data, n, *conditions):
+    '''
+    Returns a dictionary of the n items with the highest values, highest first, keeping only items which pass all the conditions
+    - the same as trim_sorted_dictionary(filter_dict(sort_dict_by_values_desc(data), *conditions)) with a count rather than a percentage,
+        but with a heap of n items rather than sorting and copying the whole dictionary; ties keep their order in data
+    EXAMPLE:
+        top_n_by_value(name_counts, 3, condition_filter_out_specific_names) ==> {'Mary': 692, 'Harriet': 389, 'Jakob': 375}
+    '''
+    items = ((key, value) for key, value in data.items() if all(condition(key, value) for condition in conditions))
+    return dict(heapq.nlargest(n, items, key=lambda item: item[1]))
+
 def combine_dicts(dict1: dict, dict2: dict):
     '''
     Combines two dictionaries by summing the counts of their common keys while simply concatenating key-value pairs which are unique to each other
+    - lists under a common key are joined and nested dictionaries are combined the same way, see merge_into in aggregation.py
+    - neither input is changed; to add pages into a running total use merge_into or Accumulator instead, which don't copy the total every time
     EXAMPLE:
         DICT1 = {'a': 3, 'b': 5, 'c' : 7 }
         DICT2 = {'b' : 1, 'c': 3, 'd': 3}
         combine_dicts(DICT1, DICT2) = {'a': 3, 'b': 6, 'c': 10, 'd': 3}
     '''
-    new_dict = {}
-    for key, value in dict1.items():
-        if key in dict2:
-            new_dict[key] = value + dict2[key]
-        else:
-            new_dict[key] = value
-    for key, value in dict2.items():
-        if key not in dict1:
-            new_dict[key] = value
-    return new_dict
+    return merge_into(merge_into({}, dict1), dict2)
 
 def merge_years_into_decade(dict_to_recomp: dict):
     '''
@@ -100,10 +106,9 @@ def merge_years_into_decade(dict_to_recomp: dict):
     for key, value in dict_to_recomp.items():
         decade = int(key/10) * 10
         if decade in new_dict:
-            for name in value:
-                new_dict[decade].append(name)
+            new_dict[decade].extend(value)
         else:
-            new_dict[decade] = value
+            new_dict[decade] = list(value) # copy, otherwise extending it would also change the list in dict_to_recomp
     return new_dict
 
 def recomp_dict(dict_to_recomp: dict):
@@ -115,18 +120,10 @@ def recomp_dict(dict_to_recomp: dict):
     '''
     new_dict = {}
     for key, value in dict_to_recomp.items():
-        if key in new_dict:
-            for name in value:
-                if name in new_dict[key]:
-                    new_dict[key] += 1
-                else:
-                    new_dict[key] = 0
-        else:
-            value_dict = {}
-            for name in value:
-                if name in value_dict:
-                    value_dict[name] += 1
-                else:
-                    value_dict[name] = 1
-            new_dict[key] = value_dict
+        value_dict = new_dict.setdefault(key, {})
+        for name in value:
+            if name in value_dict:
+                value_dict[name] += 1
+            else:
+                value_dict[name] = 1
     return new_dict
\ No newline at end of file
@@ -0,0 +1,145 @@
+'''
+Local HTTP stand-in for wiltshirefamilyhistory.org which serves saved copies of the pages from a directory
+- lets the scraper be run and benchmarked without touching the real site
+- latency adds a fixed delay (in seconds) before every response to imitate a real round trip, and jitter a further random
+  delay of up to that many seconds on top
+- faults makes a share of the responses go wrong, to check the fetch layer copes (see resilient_fetch.py):
+  {'error_rate': 0.1} answers 10% of requests with a 503 (with a Retry-After of 'retry_after' seconds if given), 'hang_rate' stalls
+  requests for 'hang_seconds' before answering, and 'garbage_rate' serves an error page with a 200; 'seed' makes it repeatable,
+  each request's fault depending only on the seed, its path and how many times that path has been asked for, so the threads
+  answering requests in parallel can't change which ones fail
+- record_fixtures saves the pages from the real site into a directory once, so everything after that works offline
+Usage:
+    python fixture_server.py record <directory>
+    python fixture_server.py serve <directory> [port] [latency] [jitter]
+'''
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+import os
+import random
+import sys
+import threading
+import time
+
+BASE_URL = "https://www.wiltshirefamilyhistory.org"
+
+def record_fixtures(directory: str, pages=range(1, 80), extra_pages=("master_index.htm",), base_url: str = BASE_URL, overwrite: bool = False):
+    '''
+    Downloads i{n}.htm for every n in pages, plus extra_pages, into directory; pages already there are kept unless overwrite
+    - returns the names of the files written
+    '''
+    import requests
+    os.makedirs(directory, exist_ok=True)
+    session = requests.Session()
+    written = []
+    for filename in [f"i{index}.htm" for index in pages] + list(extra_pages):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path) and not overwrite:
+            continue
+        page = session.get(f"{base_url}/{filename}", timeout=30)
+        page.raise_for_status()
+        with open(path, "wb") as f:
+            f.write(page.content)
+        written.append(filename)
+    return written
+
+FAULTS = {'error_rate': 0.0, 'retry_after': None, 'hang_rate': 0.0, 'hang_seconds': 10.0, 'garbage_rate': 0.0, 'seed': None}
+GARBAGE_PAGE = b"<html><body><h1>Service temporarily unavailable</h1></body></html>"
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    faults = FAULTS
+    attempts = {}   # path ==> number of requests for it so far, for seeding its faults
+    lock = threading.Lock()
+
+    def do_GET(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        roll = self.fault_roll()
+        if roll < self.faults['error_rate']:
+            self.send_response(503)
+            if self.faults['retry_after'] is not None:
+                self.send_header("Retry-After", str(self.faults['retry_after']))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        roll -= self.faults['error_rate']
+        if roll < self.faults['hang_rate']:
+            time.sleep(self.faults['hang_seconds'])
+        elif roll - self.faults['hang_rate'] < self.faults['garbage_rate']:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(GARBAGE_PAGE)))
+            self.end_headers()
+            self.wfile.write(GARBAGE_PAGE)
+            return
+        try:
+            super().do_GET()
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # the client gave up waiting, i.e. timed out on a stalled request
+
+    def fault_roll(self):
+        '''
+        Returns a number from 0 to 1 deciding this request's fault, the same on every run for the same seed
+        '''
+        if self.faults['seed'] is None:
+            return random.random()
+        with self.lock:
+            attempt = self.attempts[self.path] = self.attempts.get(self.path, 0) + 1
+        return random.Random(f"{self.faults['seed']}:{self.path}:{attempt}").random()
+
+    def log_message(self, format, *args):
+        pass    # keep benchmark output readable
+
+class FixtureServer:
+    '''
+    Serves the files in directory on localhost from a background thread
+    = faults: share of requests to answer badly, see FAULTS for the keys
+    EXAMPLE:
+        with FixtureServer('fixtures', latency=0.05) as server:
+            scrape_index_pages(get_firstnames, base_url=server.base_url)
+        with FixtureServer('fixtures', faults={'error_rate': 0.2, 'garbage_rate': 0.05, 'seed': 1}) as server:
+            ...
+    '''
+    def __init__(self, directory: str, port: int = 0, latency: float = 0.0, jitter: float = 0.0, faults: dict = None):
+        faults = dict(FAULTS, **(faults or {}))
+        handler = type('Handler', (FixtureRequestHandler,), {'latency': latency, 'jitter': jitter, 'faults': faults,
+                                                             'attempts': {}, 'lock': threading.Lock()})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), partial(handler, directory=directory))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == "__main__":
+    if sys.argv[1] == "record":
+        print(f"{len(record_fixtures(sys.argv[2]))} pages saved to {sys.argv[2]}")
+    elif sys.argv[1] == "serve":
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8000
+        latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+        jitter = float(sys.argv[5]) if len(sys.argv) > 5 else 0.0
+        server = FixtureServer(sys.argv[2], port, latency, jitter).start()
+        print(f"serving {sys.argv[2]} at {server.base_url}, Ctrl+C to stop")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            server.stop()
@@ -0,0 +1,155 @@
+'''
+Incremental re-scraping: only pages whose content changed since the last run are parsed again, and the totals are updated in place
+
+For every index page the state file keeps the SHA-256 of its bytes plus that page's own contribution to the totals
+(name counts, and birth year ==> name counts). On a refresh every page is fetched (through a PageCache this is just a 304 for
+unchanged pages), and for each page whose hash differs its old contribution is subtracted from the totals and the new one added;
+a page the site no longer has (a 404) has its contribution subtracted and is forgotten.
+So refreshing after a handful of pages change costs parsing a handful of pages rather than all 79.
+When a RecordStore is kept in step, the state also records the hash of the page each store last had written, so a page is only
+written again when its bytes differ from that (or the state was kept for a different store), empty pages included.
+
+EXAMPLE:
+    scraper = IncrementalScraper("incremental_state.json")
+    changed = scraper.refresh(cache=PageCache("page_cache"))   ==> [12, 40]
+    scraper.name_counts()           ==> same shape as get_firstnames
+    scraper.firstnames_by_year()    ==> same shape as get_firstnames_with_birthyear with format_circa=True
+'''
+from async_scraper import AsyncIndexCrawler
+from parser_backends import get_backend
+from pipeline import page_aggregates
+from records import RecordStore
+import hashlib
+import json
+import os
+
+def add_counts(totals: dict, counts: dict, sign: int = 1):
+    '''
+    Adds (or with sign=-1 subtracts) counts into totals in place, dropping names whose count reaches 0
+    '''
+    for name, count in counts.items():
+        total = totals.get(name, 0) + sign * count
+        if total:
+            totals[name] = total
+        else:
+            totals.pop(name, None)
+
+class IncrementalScraper:
+    '''
+    = state_path: JSON file holding the page hashes, per-page contributions and totals between runs
+    = exclude_middle_names: count only the first given name, i.e. Mary Lucy ==> Mary
+    = backend: parser backend used to turn changed pages into records, see parser_backends.py
+    '''
+    def __init__(self, state_path: str = "incremental_state.json", exclude_middle_names: bool = True, backend: str = "html.parser"):
+        self.state_path = state_path
+        self.exclude_middle_names = exclude_middle_names
+        self.backend = get_backend(backend)
+        self.pages = {}     # page index ==> {'sha256': ..., 'names': {name: count}, 'years': {year: {name: count}}, 'stored': sha256 in the store}
+        self.store_path = None  # absolute path of the RecordStore the 'stored' hashes are for
+        self.names = {}     # name ==> count over every page
+        self.years = {}     # birth year ==> {name: count} over every page
+        self.failed_pages = []
+        if os.path.exists(state_path):
+            self.load()
+
+    def load(self):
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state['exclude_middle_names'] != self.exclude_middle_names:
+            return  # counted differently, so start again from scratch
+        self.pages = {int(index): {'sha256': page['sha256'], 'names': page['names'], 'years': {int(year): names for year, names in page['years'].items()},
+                                   'stored': page.get('stored')}
+                      for index, page in state['pages'].items()}
+        self.store_path = state.get('store_path')
+        self.names = state['names']
+        self.years = {int(year): names for year, names in state['years'].items()}
+
+    def save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'exclude_middle_names': self.exclude_middle_names, 'store_path': self.store_path, 'pages': self.pages, 'names': self.names,
+                       'years': self.years}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def apply(self, contribution: dict, sign: int):
+        add_counts(self.names, contribution['names'], sign)
+        for year, counts in contribution['years'].items():
+            totals = self.years.setdefault(year, {})
+            add_counts(totals, counts, sign)
+            if not totals:
+                del self.years[year]
+
+    def update_page(self, index: int, content: bytes, store: RecordStore = None, force: bool = False):
+        '''
+        Updates the totals for one page's bytes, returning True if the page was reprocessed: because it changed since it was last
+        seen, or store was last given a different version of it
+        = force: reprocess the page even if neither is the case
+        '''
+        digest = hashlib.sha256(content).hexdigest()
+        old = self.pages.get(index)
+        unstored = store is not None and (old is None or old.get('stored') != digest)
+        if old is not None and old['sha256'] == digest and not unstored and not force:
+            return False
+        records = self.backend.parse(content, index)
+        names, years = page_aggregates(records, self.exclude_middle_names)
+        if old is not None:
+            self.apply(old, -1)
+        self.pages[index] = {'sha256': digest, 'names': names, 'years': years, 'stored': old.get('stored') if old is not None else None}
+        self.apply(self.pages[index], 1)
+        if store is not None:
+            store.replace_page(index, records)
+            self.pages[index]['stored'] = digest
+        return True
+
+    def remove_page(self, index: int, store: RecordStore = None):
+        '''
+        Takes a page which no longer exists out of the totals (and store), returning True if it was there to take out
+        '''
+        old = self.pages.pop(index, None)
+        if old is not None:
+            self.apply(old, -1)
+        if store is not None:
+            store.replace_page(index, [])
+        return old is not None
+
+    def use_store(self, store: RecordStore):
+        '''
+        Forgets which pages were written to the store if the state was kept for a different one, so they are all written to it
+        '''
+        path = os.path.abspath(store.path) if store.path != ":memory:" else None
+        if path is None or path != self.store_path:
+            for page in self.pages.values():
+                page['stored'] = None
+        self.store_path = path
+
+    def refresh(self, pages=range(1, 80), store: RecordStore = None, **crawler_options):
+        '''
+        Fetches the pages, reprocesses the ones that changed and saves the state; returns the indices of the changed pages, including
+        those which disappeared
+        = store: optional RecordStore to keep in step, only the pages whose bytes differ from the version last written to it are
+            replaced in it
+        - crawler_options are passed on to AsyncIndexCrawler, i.e. cache=PageCache("page_cache")
+        - pages which fail to download keep their previous contribution and are listed in self.failed_pages, unless the site says
+          they are gone (see AsyncIndexCrawler.missing_pages)
+        '''
+        crawler = AsyncIndexCrawler(html_parser=None, **crawler_options)
+        contents = crawler.run_per_page(lambda content: content, pages=pages)
+        self.failed_pages = crawler.failed_pages
+        if store is not None:
+            self.use_store(store)
+        changed = [index for index in sorted(contents) if self.update_page(index, contents[index], store)]
+        changed += [index for index in crawler.missing_pages if self.remove_page(index, store)]
+        self.save()
+        return sorted(changed)
+
+    def name_counts(self):
+        '''
+        Returns dictionary of firstnames and their occurrences over every page, the same shape as get_firstnames
+        '''
+        return dict(self.names)
+
+    def firstnames_by_year(self):
+        '''
+        Returns a dictionary of birthyear mapped to a list of names for that year, the same shape as get_firstnames_with_birthyear
+        '''
+        return {year: [name for name, count in names.items() for i in range(0, count)] for year, names in self.years.items()}
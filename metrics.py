@@ -0,0 +1,185 @@
+'''
+Run instrumentation: per-stage timers, counters and latency histograms, reported as one structured JSON document
+
+Nothing is measured unless a RunMetrics is handed in, i.e. AsyncIndexCrawler(metrics=...), ParsingPipeline(metrics=...),
+instantiate_threads(metrics=...), render_charts(metrics=...) or cli.py --report report.json, so the hot paths cost nothing extra
+otherwise. What gets recorded:
+- stages: total seconds and calls per stage, i.e. 'rate_limit' (the time spent waiting for the rate limiter), 'fetch' (the
+  requests themselves, from when the rate limiter let them through), 'soup', 'parse' (in the workers, or the target function of
+  the page threads), 'merge', 'store', 'aggregates' (loading the name counts), 'render' (drawing and saving a chart), or the
+  whole of a cli.py command
+- counters: 'pages_fetched' (every page, wherever it came from), 'bytes_fetched' (only the bodies downloaded in full, not those
+  served by the page cache), 'retries', 'failed_pages', 'pages_parsed', 'records', 'charts'
+- histograms: 'fetch_latency', seconds per request sent to the site (including 304 revalidations, not pages served from disk
+  alone), rate limiting left out
+- caches: the hit rate only counts pages served from disk alone, revalidations are reported on their own
+EXAMPLE:
+    metrics = RunMetrics()
+    ParsingPipeline(mode="process", metrics=metrics, cache=cache).run()
+    metrics.save("run_report.json", caches={'pages': cache})
+    ==> {"wall_seconds": 4.2, "stages": {"fetch": {"seconds": 31.5, "calls": 79}, ...}, "records_per_second": 2410.3, ...}
+profiled() wraps a block in cProfile or pyinstrument (if installed) for a closer look at where the time inside a stage goes.
+'''
+from contextlib import contextmanager
+import json
+import os
+import sys
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # upper bounds in seconds
+
+class Histogram:
+    '''
+    Counts of observations falling into fixed buckets, plus their count, total, min and max
+    '''
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)  # the last bucket is everything above the last bound
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        for bucket, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            bucket = len(self.bounds)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float):
+        '''
+        Returns the upper bound of the bucket the given fraction of observations falls within, i.e. 0.95 ==> roughly the p95
+        - never more than the largest observation, which is a tighter bound whenever it is below the bucket's
+        '''
+        if self.count == 0:
+            return None
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return min(self.bounds[bucket], self.max) if bucket < len(self.bounds) else self.max
+        return self.max
+
+    def report(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {'count': self.count, 'mean': self.total / self.count if self.count else None, 'min': self.min, 'max': self.max,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95), 'buckets': dict(zip(labels, self.buckets))}
+
+class RunMetrics:
+    '''
+    Collects the timings and counts of one run; safe to update from the fetch and parse stages' threads at once
+    '''
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}        # stage ==> [seconds, calls]
+        self.counters = {}      # counter ==> total
+        self.histograms = {}    # name ==> Histogram
+        self.lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        with self.lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += calls
+
+    @contextmanager
+    def timer(self, stage: str):
+        '''
+        Adds the time spent inside the with block to stage
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def count(self, counter: str, amount: int = 1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def observe(self, name: str, value: float, bounds=LATENCY_BUCKETS):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(bounds)
+            self.histograms[name].observe(value)
+
+    def report(self, caches: dict = None):
+        '''
+        Returns the run report as a dictionary ready for json.dump
+        = caches: name ==> cache with hits and misses (and optionally revalidated) counters, i.e. {'pages': PageCache(...)},
+            reported with their hit rates; a cache with a stats method (SimilarityCache, BirthDateNormaliser) is reported as is
+        '''
+        wall = time.perf_counter() - self.started
+        with self.lock:
+            report = {'wall_seconds': wall,
+                      'stages': {stage: {'seconds': seconds, 'calls': calls} for stage, (seconds, calls) in self.stages.items()},
+                      'counters': dict(self.counters),
+                      'histograms': {name: histogram.report() for name, histogram in self.histograms.items()}}
+        records = report['counters'].get('records', 0)
+        report['records_per_second'] = records / wall if wall else None
+        if 'parse' in report['stages'] and report['stages']['parse']['seconds']:
+            report['records_per_parse_second'] = records / report['stages']['parse']['seconds']
+        report['caches'] = {}
+        for name, cache in (caches or {}).items():
+            if hasattr(cache, 'stats'):
+                report['caches'][name] = cache.stats()
+                continue
+            revalidated = getattr(cache, 'revalidated', 0)
+            lookups = cache.hits + revalidated + cache.misses
+            report['caches'][name] = {'hits': cache.hits, 'revalidated': revalidated, 'misses': cache.misses,
+                                      'hit_rate': cache.hits / lookups if lookups else None,
+                                      'revalidation_rate': revalidated / lookups if lookups else None}
+        return report
+
+    def save(self, path: str, caches: dict = None):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(caches), f, indent=1)
+        os.replace(tmp_path, path)
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+@contextmanager
+def profiled(profiler: str = None, output: str = None):
+    '''
+    Profiles the with block with cProfile or pyinstrument, doing nothing when profiler is None
+    = output: file to write the profile to (.prof for cProfile, .html or text for pyinstrument), otherwise a summary goes to stderr
+    '''
+    if profiler is None:
+        yield
+        return
+    if profiler == "cprofile":
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if output:
+                profile.dump_stats(output)
+            else:
+                pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    elif profiler == "pyinstrument":
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            if output is None:
+                print(profile.output_text(), file=sys.stderr)
+            else:
+                with open(output, "w", encoding="utf-8") as f:
+                    f.write(profile.output_html() if output.endswith(".html") else profile.output_text())
+    else:
+        raise ValueError(f"profiler must be one of {', '.join(PROFILERS)}, not {profiler!r}")
@@ -0,0 +1,122 @@
+'''
+Groups every first name in the vocabulary into clusters of variants, i.e. Mary == Marie == Maria, rather than searching one name at a time
+
+Comparing every pair of names is O(n^2) Jaro-Winkler calls, so candidate pairs are narrowed down by blocking first:
+- names are put into blocks by a shared prefix (first two letters) and by Soundex code, and only names sharing a block are compared
+- inside a block, only names whose lengths are within length_band of each other are compared
+- pairs which are already in the same cluster aren't compared again
+Pairs scoring above the threshold are merged with a union-find, so variants chain together: if Mary ~ Marie and Marie ~ Maria
+then all three end up in one cluster even if Mary and Maria alone score below the threshold.
+
+EXAMPLE:
+    cluster_names({'Mary': 120, 'Marie': 14, 'Maria': 9, 'John': 200})
+    ==> [NameCluster(canonical='John', members=['John'], count=200), NameCluster(canonical='Mary', members=['Mary', 'Marie', 'Maria'], count=143)]
+'''
+from namesnlp import EncodedNames, jaro_winkler_batch, np
+from phonetics import soundex
+from typing import List, NamedTuple
+
+class NameCluster(NamedTuple):
+    canonical: str          # the most common name in the cluster
+    members: List[str]      # every name in the cluster, most common first
+    count: int              # total occurrences of all the names in the cluster
+
+class UnionFind:
+    '''
+    Disjoint sets over the integers 0 to size-1, with path compression and union by size
+    '''
+    def __init__(self, size: int):
+        self.parent = list(range(0, size))
+        self.size = [1] * size
+
+    def find(self, x: int):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x: int, y: int):
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return False
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        return True
+
+class NameClusterer:
+    '''
+    = threshold: two names are variants of each other when their Jaro-Winkler distance is above this
+    = prefix_length: names sharing this many leading letters are compared, 0 to switch prefix blocking off
+    = length_band: only names whose lengths differ by at most this much are compared
+    = phonetic: also compare names sharing a Soundex code, which catches variants whose second letters differ, i.e. Ewan / Euan
+    After cluster has run, comparisons holds how many pairs were actually scored
+    '''
+    def __init__(self, threshold: float = 0.84, prefix_length: int = 2, length_band: int = 2, phonetic: bool = True):
+        self.threshold = threshold
+        self.prefix_length = prefix_length
+        self.length_band = length_band
+        self.phonetic = phonetic
+        self.comparisons = 0
+
+    def blocks(self, names: List[str]):
+        '''
+        Returns the lists of name indices which share a blocking key
+        '''
+        blocks = {}
+        for i, name in enumerate(names):
+            keys = []
+            if self.prefix_length:
+                keys.append(('prefix', name[:self.prefix_length].upper()))
+            if self.phonetic:
+                code = soundex(name)
+                if code:
+                    keys.append(('soundex', code))
+            for key in keys:
+                blocks.setdefault(key, []).append(i)
+        return [block for block in blocks.values() if len(block) > 1]
+
+    def cluster(self, name_counts: dict):
+        '''
+        Returns a list of NameCluster covering every name in name_counts (the output of get_firstnames), largest total count first
+        '''
+        names = list(name_counts.keys())
+        clusters = UnionFind(len(names))
+        self.comparisons = 0
+        for block in self.blocks(names):
+            block.sort(key=lambda i: len(names[i]))
+            encoded = EncodedNames([names[i] for i in block]) if np is not None else None
+            for position, i in enumerate(block[:-1]):
+                end = position + 1
+                while end < len(block) and len(names[block[end]]) - len(names[i]) <= self.length_band:
+                    end += 1
+                candidates = [p for p in range(position + 1, end) if clusters.find(block[p]) != clusters.find(i)]
+                if not candidates:
+                    continue
+                self.comparisons += len(candidates)
+                if encoded is not None and len(candidates) == end - position - 1:
+                    distances = jaro_winkler_batch(names[i], encoded.slice(position + 1, end))
+                else:
+                    distances = jaro_winkler_batch(names[i], [names[block[p]] for p in candidates])
+                for p, distance in zip(candidates, distances):
+                    if distance > self.threshold:
+                        clusters.union(i, block[p])
+
+        groups = {}
+        for i, name in enumerate(names):
+            groups.setdefault(clusters.find(i), []).append(name)
+        result = []
+        for members in groups.values():
+            members.sort(key=lambda name: (-name_counts[name], name))
+            result.append(NameCluster(members[0], members, sum(name_counts[name] for name in members)))
+        result.sort(key=lambda cluster: (-cluster.count, cluster.canonical))
+        return result
+
+def cluster_names(name_counts: dict, threshold: float = 0.84, **clusterer_options):
+    '''
+    Convenience wrapper around NameClusterer, see above
+    '''
+    return NameClusterer(threshold, **clusterer_options).cluster(name_counts)
@@ -0,0 +1,160 @@
+'''
+Top-k nearest-name search over the name vocabulary, ranked by Jaro-Winkler score
+
+find_variations_in_name can only say which names are above a threshold. NameSearchIndex instead returns the k best scoring names,
+and avoids scoring most of the vocabulary by putting cheap upper bounds on the score first:
+- length: a letter of the query at position i can only match in a name of length n if i < n - 1 + max(len, n) / 2, so the
+  number of matching characters is capped by the name's length alone
+- letters: only the query letters which appear in the name at all can match, which caps the matching characters again
+- prefix: the Winkler bonus can only come from the letters the name actually shares with the start of the query
+The names of each length are held as one bitset per letter (bit i set when the i-th name of that length has the letter), so
+how many query letters every name has is worked out for the whole group at once by adding the bitsets bit-sliced, rather than
+name by name. Names are then taken in groups of equal (length, letters in common, prefix), best bound first, and the search stops
+at the first group whose bound can't beat the k-th best score so far; only the names before that get jaro_winkler_features.
+Results are exactly those of scoring every name.
+EXAMPLE:
+    index = NameSearchIndex(get_firstnames(...).keys())
+    index.top_k_variants("Mary", 3)    ==> [('Mary', 1.0), ('Marry', 0.924...), ('Marie', 0.848...)]
+'''
+from namesnlp import jaro_winkler_features, name_features
+from typing import List
+import heapq
+import math
+
+def add_bitset(planes: List[int], bitset: int):
+    '''
+    Adds one to the bit-sliced counter planes (planes[n] holds bit n of every count) for every bit set in bitset, in place
+    '''
+    carry = bitset
+    for n, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[n], carry = plane ^ carry, plane & carry
+    if carry:
+        planes.append(carry)
+
+def count_equal_to(planes: List[int], value: int, everything: int):
+    '''
+    Returns the bitset of the counts in planes which equal value, everything being the bitset with every name's bit set
+    '''
+    if value >> len(planes):
+        return 0
+    bitset = everything
+    for n, plane in enumerate(planes):
+        bitset &= plane if value >> n & 1 else ~plane
+    return bitset
+
+def to_bitset(bits: List[int], size: int):
+    '''
+    Returns the bitset with the given bits set, built as bytes so it doesn't copy a growing integer for every bit
+    '''
+    data = bytearray((size + 7) // 8)
+    for bit in bits:
+        data[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(data, 'little')
+
+class NameSearchIndex:
+    '''
+    = names: the vocabulary to search, i.e. the keys of get_firstnames
+    = winkler_on, scaling_factor: as for jaro_winkler_distance
+    '''
+    def __init__(self, names: List[str], winkler_on: bool = True, scaling_factor: float = 0.1):
+        self.names = list(names)
+        self.winkler_on = winkler_on
+        self.scaling_factor = scaling_factor
+        self.features = [name_features(name) for name in self.names]
+        self.by_length = {}     # length ==> positions in names of the names of that length, bit i of that length's bitsets is the i-th
+        self.letter_sets = {}   # length ==> letter ==> bitset of the names of that length with the letter
+        self.by_prefix = {}     # first 1 to 4 letters ==> (length, bit) of the names starting with them
+        letter_bits = {}        # length ==> letter ==> bits of the names with the letter, made into bitsets at the end
+        for position, features in enumerate(self.features):
+            positions = self.by_length.setdefault(features.length, [])
+            bit = len(positions)
+            positions.append(position)
+            for letter in features.positions:
+                letter_bits.setdefault(features.length, {}).setdefault(letter, []).append(bit)
+            for length in range(1, min(4, features.length) + 1):
+                self.by_prefix.setdefault(features.upper[:length], []).append((features.length, bit))
+        for length, letters in letter_bits.items():
+            self.letter_sets[length] = {letter: to_bitset(bits, len(self.by_length[length])) for letter, bits in letters.items()}
+        self.scored = 0         # names fully scored by the last search
+        self.pruned = 0         # names ruled out by a bound in the last search
+
+    def upper_bound(self, matches: int, query_length: int, length: int, prefix: int):
+        '''
+        Highest score a name of length could get with at most matches matching characters, no transpositions and prefix letters
+        in common at the start
+        '''
+        if matches == 0:
+            return 0
+        jaro = 1/3 * (matches / query_length + matches / length + 1)
+        if self.winkler_on:
+            jaro = jaro + self.scaling_factor * prefix * (1 - jaro)
+        return jaro + 1e-12     # rounding must never take the bound below the real score
+
+    def letter_counts(self, length: int, letters: str):
+        '''
+        Returns the bit-sliced counts of how many of letters (repeats included) each name of length has
+        '''
+        letter_sets = self.letter_sets[length]
+        planes = []
+        for letter in letters:
+            if letter in letter_sets:
+                add_bitset(planes, letter_sets[letter])
+        return planes
+
+    def top_k_variants(self, name: str, k: int = 10, min_score: float = 0.0):
+        '''
+        Returns a list of (name, score) for the k names scoring highest against name, best first, only including scores above min_score
+        - names with the same score keep their order in the vocabulary
+        '''
+        query = name_features(name)
+        self.scored = 0
+        self.pruned = len(self.names)
+        if k <= 0 or query.length == 0:
+            return []
+        prefixes = {length: [0] * 5 for length in self.by_length}  # length ==> bitsets of the names sharing 0 to 4 letters at the start
+        for prefix in range(1, min(4, query.length) + 1):
+            for length, bit in self.by_prefix.get(query.upper[:prefix], ()):
+                prefixes[length][prefix - 1] &= ~(1 << bit)
+                prefixes[length][prefix] |= 1 << bit
+        groups = []
+        for length, positions in self.by_length.items():
+            shared = prefixes[length]
+            shared[0] = ((1 << len(positions)) - 1) & ~(shared[1] | shared[2] | shared[3] | shared[4])
+            reachable = min(query.length, math.ceil(length - 1 + max(query.length, length) / 2))
+            for matches in range(1, reachable + 1):
+                for prefix in range(0, 5):
+                    if shared[prefix]:
+                        groups.append((self.upper_bound(matches, query.length, length, prefix), length, matches, prefix, reachable))
+        groups.sort(key=lambda group: group[0], reverse=True)
+
+        counts = {}     # length ==> bit-sliced letter counts, only worked out for the lengths the search gets to
+        best = []       # min-heap of (score, -position) holding the k best so far
+        for bound, length, matches, prefix, reachable in groups:
+            if bound <= min_score or (len(best) == k and bound < best[0][0]):
+                break
+            positions = self.by_length[length]
+            if length not in counts:
+                counts[length] = self.letter_counts(length, query.upper[:reachable])
+            bitset = count_equal_to(counts[length], matches, (1 << len(positions)) - 1) & prefixes[length][prefix]
+            while bitset:
+                lowest = bitset & -bitset
+                bitset ^= lowest
+                position = positions[lowest.bit_length() - 1]
+                self.scored += 1
+                score = jaro_winkler_features(query, self.features[position], self.winkler_on, self.scaling_factor)
+                if score <= min_score:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (score, -position))
+                elif (score, -position) > best[0]:
+                    heapq.heapreplace(best, (score, -position))
+        self.pruned -= self.scored
+        return [(self.names[-negated_position], score) for score, negated_position in sorted(best, reverse=True)]
+
+def top_k_variants(name: str, all_names: List[str], k: int = 10, min_score: float = 0.0):
+    '''
+    One-off version of NameSearchIndex.top_k_variants; build a NameSearchIndex instead when searching the same names repeatedly
+    '''
+    return NameSearchIndex(all_names).top_k_variants(name, k, min_score)
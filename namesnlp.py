@@ -5,9 +5,14 @@ General outline:
 - search for vowel/vowel sound substrings in a name and find possible variants of the name by replacing the sound, as with mary and marie
 - search for consonant substitutions such as jacob and jakob where the vowel succeeding c determines whether it sounds like k or s and thus whether the name has variations
 '''
-from typing import List
+from typing import List, NamedTuple
 import re
 
+try:
+    import numpy as np
+except ImportError:     # jaro_winkler_batch falls back to pure Python without NumPy
+    np = None
+
 def replace_strings(strings_replacements: dict):
     '''
     Replace letters with other corresponding letters by feeding in a one-to-one dictionary of strings to strings, specifying what to replace
@@ -54,14 +59,13 @@ def matching_characters(x: str, y: str):
     y = y.upper()
     matches = 0
     for i in range(0, len(x)):
-        check_next_letter = False
+        check_next_letter = len(y) == 0
         j = 0
         while not check_next_letter:
-            if x[i] == y[j]:
-                if abs(i - j) < max(len(x), len(y)) / 2:
-                    matches += 1
-                    check_next_letter = True
-            else:
+            if x[i] == y[j] and abs(i - j) < max(len(x), len(y)) / 2:
+                matches += 1
+                check_next_letter = True
+            else:   # keep looking further along y, including when the same letter was found but too far away
                 j += 1
                 if j == len(y):
                     check_next_letter = True
@@ -77,7 +81,7 @@ def length_of_common_prefix(x: str, y: str):
     chars_to_check = min(len(x),len(y))
     terminate = False
     while not terminate:
-        if x[length] == y[length]:
+        if length < chars_to_check and x[length] == y[length]:
             length += 1
         else:
             terminate = True
@@ -95,14 +99,13 @@ def transpositions(x: str, y: str):
     y = y.upper()
     count = 0
     for i in range(0, len(x)):
-        check_next_letter = False
+        check_next_letter = len(y) == 0
         j = 0
         while not check_next_letter:
-            if x[i] == y[j]:
-                if abs(i - j) < max(len(x), len(y)) / 2:
-                    if i != j:
-                        count += 1
-                    check_next_letter = True
+            if x[i] == y[j] and abs(i - j) < max(len(x), len(y)) / 2:
+                if i != j:
+                    count += 1
+                check_next_letter = True
             else:
                 j += 1
                 if j == len(y):
@@ -137,6 +140,113 @@ def jaro_winkler_distance(x: str, y: str, winkler_on: bool = True, scaling_facto
         else:
             return jaro
 
+class NameFeatures(NamedTuple):
+    upper: str
+    length: int
+    positions: dict     # letter ==> every position it appears at in upper, in order
+
+def name_features(name: str):
+    '''
+    Works out everything jaro_winkler_features needs to know about a name once, so it can be reused for every pair the name is in
+    '''
+    upper = name.upper()
+    positions = {}
+    for i, letter in enumerate(upper):
+        positions.setdefault(letter, []).append(i)
+    return NameFeatures(upper, len(upper), positions)
+
+def jaro_winkler_features(x: NameFeatures, y: NameFeatures, winkler_on: bool = True, scaling_factor: int = 0.1):
+    '''
+    jaro_winkler_distance on the precomputed features of two names, giving exactly the same numbers
+    - the matching characters and transpositions are counted in one pass, only looking at the positions of each letter of x in y
+    '''
+    window = max(x.length, y.length) / 2
+    m = 0
+    out_of_place = 0
+    for i, letter in enumerate(x.upper):
+        for j in y.positions.get(letter, ()):
+            if abs(i - j) < window:     # the first close enough occurrence, as in matching_characters
+                m += 1
+                if i != j:
+                    out_of_place += 1
+                break
+    if m == 0:
+        return 0
+    t = out_of_place / 2.0
+    jaro = 1/3 * (m / x.length + m / y.length + (m-t)/m)
+    if not winkler_on:
+        return jaro
+    prefix = 0
+    for a, b in zip(x.upper[:4], y.upper[:4]):
+        if a != b:
+            break
+        prefix += 1
+    return jaro + scaling_factor * prefix * (1 - jaro)
+
+class EncodedNames:
+    '''
+    A list of names encoded once as a NumPy matrix of upper-case character codes, one row per name padded with -1,
+    so jaro_winkler_batch can score a query against every name at once. Encode the vocabulary once and reuse it across queries.
+    '''
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        upper = [name.upper() for name in self.names]
+        self.lengths = np.array([len(name) for name in upper], dtype=np.int64)
+        width = max(int(self.lengths.max()) if len(upper) else 0, 1)
+        self.codes = np.full((len(upper), width), -1, dtype=np.int32)
+        for row, name in enumerate(upper):
+            self.codes[row, :len(name)] = [ord(c) for c in name]
+
+    def __len__(self):
+        return len(self.names)
+
+    def slice(self, start: int, end: int):
+        '''
+        Returns the names from start to end as an EncodedNames sharing this one's arrays, without encoding them again
+        '''
+        part = EncodedNames.__new__(EncodedNames)
+        part.names = self.names[start:end]
+        part.lengths = self.lengths[start:end]
+        part.codes = self.codes[start:end]
+        return part
+
+def jaro_winkler_batch(x: str, all_names, winkler_on: bool = True, scaling_factor: int = 0.1):
+    '''
+    Scores x against every name in all_names in a single call, returning a list of distances in the same order
+    - gives exactly the same numbers as calling jaro_winkler_distance(x, name) for each name
+    - all_names can be a list of names or an EncodedNames; pass an EncodedNames when querying the same vocabulary repeatedly
+    - without NumPy installed it simply loops over jaro_winkler_distance
+    '''
+    if np is None:
+        names = all_names.names if isinstance(all_names, EncodedNames) else all_names
+        return [jaro_winkler_distance(x, name, winkler_on, scaling_factor) for name in names]
+    if not isinstance(all_names, EncodedNames):
+        all_names = EncodedNames(all_names)
+    if len(all_names) == 0:
+        return []
+    x = x.upper()
+    codes, lengths = all_names.codes, all_names.lengths
+    window = np.maximum(len(x), lengths)[:, None] / 2
+    positions = np.arange(codes.shape[1])[None, :]
+    m = np.zeros(len(lengths), dtype=np.int64)
+    out_of_place = np.zeros(len(lengths), dtype=np.int64)
+    for i in range(0, len(x)):
+        # a letter of x matches the first equal letter of y close enough to it, as in matching_characters
+        candidates = (codes == ord(x[i])) & (np.abs(i - positions) < window)
+        found = candidates.any(axis=1)
+        m += found
+        out_of_place += found & (candidates.argmax(axis=1) != i)
+    t = out_of_place / 2.0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jaro = 1/3 * (m / len(x) + m / lengths + (m-t)/m)
+    jaro = np.where(m == 0, 0.0, jaro)
+    if winkler_on:
+        prefix_width = min(4, len(x), codes.shape[1])
+        prefix = np.cumprod(codes[:, :prefix_width] == np.array([ord(c) for c in x[:prefix_width]], dtype=np.int32), axis=1).sum(axis=1)
+        jaro = np.where(m == 0, 0.0, jaro + scaling_factor * prefix * (1 - jaro))
+    return [float(distance) if distance != 0 else 0 for distance in jaro]
+
 #print(stemmatization("marrianna", ['a','e','i','o','u','y'], True))
 #print(jaro_winkler_distance("Marie", "Eerie"))
 
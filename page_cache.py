@@ -0,0 +1,147 @@
+'''
+Persistent on-disk cache for the pages downloaded from the genealogy site
+
+The site very rarely changes, so rather than downloading every page again on every run the raw bytes of each page are kept on disk:
+- page bodies are stored content-addressed, i.e. under the SHA-256 of their bytes, so identical pages are only stored once
+- index.json maps each URL to the hash of its body along with the ETag and Last-Modified headers it was served with
+- cached pages are revalidated with If-None-Match / If-Modified-Since, so an unchanged page costs a 304 rather than a full download
+- max_age skips revalidation entirely for pages fetched less than max_age seconds ago
+- offline mode never touches the network and only serves what is already cached
+- index.json is rewritten every save_every changes rather than on each one, and by flush, which whoever uses the cache calls at the
+  end of a run (AsyncIndexCrawler and the scraper threads do); the page bodies themselves are always written straight away
+
+Layout of the cache directory:
+    index.json
+    objects/3f/3fa2...    (raw page bytes, named by their SHA-256)
+'''
+import hashlib
+import json
+import os
+import threading
+import time
+
+class PageNotCachedException(Exception):
+    def __init__(self, url: str, message="The page requested is not in the cache and the cache is in offline mode"):
+        self.message = f"{message}: {url}"
+        super().__init__(self.message)
+
+class PageCache:
+    '''
+    = directory: where the cache is kept, created if it doesn't exist
+    = offline: if True, pages are only ever read from the cache and PageNotCachedException is raised for anything missing
+    = max_age: number of seconds a cached page is trusted without revalidating, None always revalidates
+    = save_every: number of changes to the index between writes of index.json, see flush
+    '''
+    def __init__(self, directory: str = "page_cache", offline: bool = False, max_age: float = None, save_every: int = 50):
+        self.directory = directory
+        self.offline = offline
+        self.max_age = max_age
+        self.save_every = save_every
+        self.unsaved = 0    # changes to the index since index.json was last written
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def object_path(self, digest: str):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def read_object(self, digest: str):
+        with open(self.object_path(digest), "rb") as f:
+            return f.read()
+
+    def write_object(self, content: bytes):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+        self.unsaved = 0
+
+    def changed(self):
+        '''
+        Counts a change to the index, writing index.json once save_every have built up; called with the lock held
+        '''
+        self.unsaved += 1
+        if self.unsaved >= self.save_every:
+            self.save_index()
+
+    def flush(self):
+        '''
+        Writes index.json if anything changed since it was last written
+        '''
+        with self.lock:
+            if self.unsaved:
+                self.save_index()
+
+    def cached(self, url: str):
+        '''
+        Returns the cached bytes for url without any network access, or None if it isn't cached
+        '''
+        entry = self.index.get(url)
+        if entry is None or not os.path.exists(self.object_path(entry['sha256'])):
+            return None
+        return self.read_object(entry['sha256'])
+
+    def store(self, url: str, content: bytes, etag: str = None, last_modified: str = None):
+        digest = self.write_object(content)
+        with self.lock:
+            self.index[url] = {'sha256': digest, 'etag': etag, 'last_modified': last_modified, 'fetched': time.time()}
+            self.changed()
+        return digest
+
+    def get(self, session, url: str, timeout=None):
+        '''
+        Returns the raw bytes of the page at url, going to the network only when the cached copy needs revalidating
+        = session: requests.Session (or anything with a compatible get method) used for network access
+        = timeout: passed on to session.get, None leaves it to the session, i.e. ResilientSession's (connect, read) timeouts
+        '''
+        return self.fetch(session, url, timeout)[0]
+
+    def fetch(self, session, url: str, timeout=None):
+        '''
+        get, returning (content, source) where source is 'hit' for a page served from disk alone, 'revalidated' for one the site
+        answered with a 304 and 'miss' for one downloaded in full
+        '''
+        entry = self.index.get(url)
+        content = self.cached(url)
+        if content is not None and (self.offline or (self.max_age is not None and time.time() - entry['fetched'] < self.max_age)):
+            self.hits += 1
+            return content, 'hit'
+        if self.offline:
+            raise PageNotCachedException(url)
+
+        headers = {}
+        if content is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        page = session.get(url, headers=headers, **({} if timeout is None else {'timeout': timeout}))
+        if page.status_code == 304 and content is not None:
+            self.revalidated += 1
+            with self.lock:
+                entry['fetched'] = time.time()
+                self.changed()
+            return content, 'revalidated'
+        page.raise_for_status()
+        self.misses += 1
+        self.store(url, page.content, page.headers.get('ETag'), page.headers.get('Last-Modified'))
+        return page.content, 'miss'
@@ -0,0 +1,102 @@
+'''
+Dynamic scheduling of the index pages over worker threads
+
+instantiate_threads used to give each thread a fixed chunk of round(total_pages / thread_count) pages, so the last thread got
+whatever was left (79 - 3 x 20 = 19 pages with 4 threads, far more lopsided with others), and since some surname letters have much
+longer pages than others the run always waited on the slowest chunk. PageScheduler is instead one shared queue the threads pull
+their next page from as soon as they are free:
+- pages are handed out largest first, by their size in bytes on the previous run (saved to sizes_path), so a big page is never
+  the last one started; pages without a known size go first
+- every worker's pages and busy time are recorded, and utilisation() shows how much of the run each one spent working
+EXAMPLE:
+    threads = instantiate_threads(4, 79, get_firstnames)    # see scraper.py
+    ...start and join them...
+    threads[0].scheduler.utilisation()  ==> {'worker-0': {'pages': 21, 'busy_seconds': 3.9, 'utilisation': 0.97}, ...}
+'''
+from collections import deque
+import json
+import os
+import threading
+import time
+
+class PageScheduler:
+    '''
+    = pages: the page indexes to hand out
+    = sizes_path: JSON file of page index ==> size in bytes, read to order the pages and written once every worker is done,
+        None to keep the sizes in memory only
+    '''
+    def __init__(self, pages=range(1, 80), sizes_path: str = None):
+        self.sizes_path = sizes_path
+        self.sizes = {}     # page index ==> size in bytes
+        if sizes_path is not None and os.path.exists(sizes_path):
+            with open(sizes_path, "r", encoding="utf-8") as f:
+                self.sizes = {int(index): size for index, size in json.load(f).items()}
+        unknown = float('inf')
+        self.queue = deque(sorted(pages, key=lambda index: -self.sizes.get(index, unknown)))   # sorted is stable, so ties keep page order
+        self.lock = threading.Lock()
+        self.workers = {}   # worker name ==> {'pages': ..., 'busy_seconds': ...}
+        self.active = 0
+        self.started = None
+        self.finished = None
+
+    def __len__(self):
+        return len(self.queue)
+
+    def register(self, worker: str):
+        with self.lock:
+            self.workers[worker] = {'pages': 0, 'busy_seconds': 0.0}
+            self.active += 1
+
+    def next_page(self):
+        '''
+        Returns the next page index to scrape, None once every page has been handed out
+        '''
+        with self.lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            return self.queue.popleft() if self.queue else None
+
+    def record(self, worker: str, index: int, seconds: float, size: int = None):
+        '''
+        Records that worker spent seconds on page index, which was size bytes
+        '''
+        with self.lock:
+            self.workers[worker]['pages'] += 1
+            self.workers[worker]['busy_seconds'] += seconds
+            if size is not None:
+                self.sizes[index] = size
+
+    def done(self, worker: str):
+        '''
+        Called by each worker once next_page has run out; the sizes are saved when the last one finishes
+        '''
+        with self.lock:
+            self.active -= 1
+            if self.active:
+                return
+            self.finished = time.perf_counter()
+        self.save()
+
+    def wall_seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def utilisation(self):
+        '''
+        Returns a dictionary of worker ==> {'pages', 'busy_seconds', 'utilisation'}, utilisation being the share of the run's wall
+        clock time the worker spent on pages; close to 1 for every worker means no thread sat idle waiting on another
+        '''
+        wall = self.wall_seconds()
+        with self.lock:
+            return {worker: dict(stats, utilisation=stats['busy_seconds'] / wall if wall else None) for worker, stats in self.workers.items()}
+
+    def save(self):
+        if self.sizes_path is None:
+            return
+        if os.path.dirname(self.sizes_path):
+            os.makedirs(os.path.dirname(self.sizes_path), exist_ok=True)
+        tmp_path = f"{self.sizes_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({str(index): size for index, size in sorted(self.sizes.items())}, f, indent=1)
+        os.replace(tmp_path, self.sizes_path)
@@ -0,0 +1,174 @@
+'''
+Interchangeable HTML parser backends for turning the raw bytes of an index page into PersonRecords
+
+Building a full BeautifulSoup tree with "html.parser" is the slowest option available, and the records only need the <dl>, <dt>,
+<dd>, <a> and <br> elements, so the same extraction is implemented on top of three parsers:
+- "html.parser": BeautifulSoup with Python's built-in parser, always available
+- "lxml": lxml.html, a C parser, needs the lxml package
+- "selectolax": selectolax's Lexbor parser (or Modest on older versions), needs the selectolax package
+
+Each backend only has to yield (surname, link_text, text) for every line of every <dd>, link_text holding the text of the line's
+first <a> only; make_record in records.py does the rest, so all backends produce identical records.
+EXAMPLE:
+    get_backend("lxml").parse(page_bytes, source_page=12) ==> [PersonRecord(surname='Smith', given_names='Mary', ...), ...]
+'''
+from records import make_record, soup_entries
+
+class ParserBackendNotAvailableException(Exception):
+    def __init__(self, name: str, message="The parser backend requested isn't available, check its package is installed"):
+        self.message = f"{message}: {name}"
+        super().__init__(self.message)
+
+class ParserBackend:
+    '''
+    Base class for the parser backends, subclasses implement entries
+    '''
+    name = None
+
+    def entries(self, content: bytes):
+        '''
+        Yields (surname, link_text, text) for every line of every <dd> of the page, where link_text and text are lists of strings
+        '''
+        raise NotImplementedError
+
+    def parse(self, content: bytes, source_page: int = None):
+        '''
+        Returns a list of PersonRecord for every person listed on the page, in the order they appear
+        '''
+        records = []
+        for surname, link_text, text in self.entries(content):
+            record = make_record(surname, link_text, text, source_page)
+            if record is not None:
+                records.append(record)
+        return records
+
+class HtmlParserBackend(ParserBackend):
+    name = "html.parser"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.BeautifulSoup = BeautifulSoup
+
+    def entries(self, content: bytes):
+        return soup_entries(self.BeautifulSoup(content, "html.parser"))
+
+class LxmlBackend(ParserBackend):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        self.lxml_html = lxml.html
+
+    def entries(self, content: bytes):
+        root = self.lxml_html.fromstring(content)
+        for dl in root.iter('dl'):
+            surname = None
+            for child in dl:
+                if child.tag == 'dt':
+                    surname = " ".join("".join(child.itertext()).split())
+                elif child.tag == 'dd':
+                    line = ([], [], [])
+                    for link_text, text in self.walk(child, line, None):
+                        yield surname, link_text, text
+                    yield surname, list(line[0]), list(line[1])
+
+    def walk(self, element, line: tuple, link):
+        '''
+        Adds the text of element and its children to line, yielding a copy of line each time a <br> ends it
+        = line: (link_text, text, first_link), first_link holding the line's first <a> once one has been seen
+        = link: the <a> element is inside of, None if it isn't in one
+        - lxml keeps the text after a child as that child's tail, which belongs to element rather than the child
+        '''
+        link_text, text, first_link = line
+        if element.text:
+            self.add(line, element.text, link)
+        for child in element:
+            if child.tag == 'br':
+                yield list(link_text), list(text)
+                link_text.clear()
+                text.clear()
+                first_link.clear()
+            elif isinstance(child.tag, str):    # comments and processing instructions have a function as their tag
+                yield from self.walk(child, line, child if link is None and child.tag == 'a' else link)
+            if child.tail:
+                self.add(line, child.tail, link)
+
+    def add(self, line: tuple, piece: str, link):
+        link_text, text, first_link = line
+        text.append(piece)
+        if link is not None:
+            if not first_link:
+                first_link.append(link)
+            if first_link[0] is link:
+                link_text.append(piece)
+
+class SelectolaxBackend(ParserBackend):
+    name = "selectolax"
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:    # selectolax < 0.3.13 only has the Modest parser
+            from selectolax.parser import HTMLParser
+        self.HTMLParser = HTMLParser
+
+    def entries(self, content: bytes):
+        tree = self.HTMLParser(content)
+        for dl in tree.css('dl'):
+            surname = None
+            for child in dl.iter():
+                if child.tag == 'dt':
+                    surname = " ".join(child.text(deep=True).split())
+                elif child.tag == 'dd':
+                    link_text, text, first_link = [], [], None
+                    for node in child.traverse(include_text=True):
+                        if node.tag == 'br':
+                            yield surname, link_text, text
+                            link_text, text, first_link = [], [], None
+                        elif node.tag == '-text':
+                            piece = node.text_content
+                            text.append(piece)
+                            link = self.enclosing_link(node, child.mem_id)
+                            if link is not None and (first_link is None or link == first_link):
+                                first_link = link
+                                link_text.append(piece)
+                    yield surname, link_text, text
+
+    def enclosing_link(self, node, container_id: int):
+        '''
+        Returns the mem_id of the <a> node is inside of, None if it isn't in one
+        - nodes are compared by mem_id, the address of the parser's node: == on selectolax nodes compares their serialised HTML,
+          which is slow on a long <dd> and can't tell two identical links apart
+        '''
+        parent = node.parent
+        while parent is not None and parent.mem_id != container_id:
+            if parent.tag == 'a':
+                return parent.mem_id
+            parent = parent.parent
+        return None
+
+BACKENDS = {backend.name: backend for backend in (HtmlParserBackend, LxmlBackend, SelectolaxBackend)}
+
+def get_backend(name: str = "html.parser"):
+    '''
+    Returns an instance of the named backend, raising ParserBackendNotAvailableException if its package isn't installed
+    '''
+    if name not in BACKENDS:
+        raise ParserBackendNotAvailableException(name, "There is no parser backend with this name")
+    try:
+        return BACKENDS[name]()
+    except ImportError:
+        raise ParserBackendNotAvailableException(name)
+
+def available_backends():
+    '''
+    Returns the names of the backends whose packages are installed
+    '''
+    names = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+            names.append(name)
+        except ParserBackendNotAvailableException:
+            pass
+    return names
@@ -0,0 +1,104 @@
+'''
+Precomputed phonetic-key index over the name vocabulary, so that finding the spellings of a name is a hash lookup rather than a
+Jaro-Winkler sweep over every name
+
+Every name is encoded once with each encoder in phonetics.py and filed under its codes along with its count:
+    {'double_metaphone': {'JKP': {'Jacob': 41, 'Jakob': 3, 'Jacobb': 1}, 'AKP': {...}}, 'soundex': {'J210': {...}}, ...}
+A query is encoded the same way and the names under its codes are returned. The index is built once per scrape (see
+records.refresh_aggregates) and persisted in the record store's phonetic_codes table, which is emptied whenever records change,
+so queries only load it; it can also be saved to and loaded from JSON on its own.
+EXAMPLE:
+    PhoneticIndex.from_store(RecordStore("records.sqlite")).lookup("Jacob") ==> {'Jacob': 41, 'Jakob': 3, 'Jacobb': 1}
+    index = PhoneticIndex.from_counts(get_firstnames(...))
+    index.save("phonetic_index.json")
+    PhoneticIndex.load("phonetic_index.json").lookup("Jacob") ==> {'Jacob': 41, 'Jakob': 3, 'Jacobb': 1}
+'''
+from phonetics import ENCODERS
+from typing import List
+import json
+import os
+
+class PhoneticIndex:
+    '''
+    = encoders: names of the encoders in phonetics.ENCODERS to index by
+    '''
+    def __init__(self, encoders: List[str] = ('double_metaphone', 'nysiis', 'soundex')):
+        self.encoders = list(encoders)
+        self.index = {encoder: {} for encoder in self.encoders}
+
+    @classmethod
+    def from_counts(cls, name_counts: dict, encoders: List[str] = ('double_metaphone', 'nysiis', 'soundex')):
+        '''
+        Builds an index from a dictionary of names and their occurrences, i.e. the output of get_firstnames
+        '''
+        index = cls(encoders)
+        for name, count in name_counts.items():
+            index.add(name, count)
+        return index
+
+    @classmethod
+    def from_store(cls, store: 'RecordStore', exclude_middle_names: bool = True):
+        '''
+        Loads the index persisted in a RecordStore, building it from the stored names (and persisting it) if it isn't there yet
+        = exclude_middle_names: index only the first given name of each person, i.e. Mary Lucy ==> Mary
+        '''
+        full_names = int(not exclude_middle_names)
+        rows = store.connection.execute("SELECT encoder, code, name, count FROM phonetic_codes WHERE full_names = ? ORDER BY rowid", (full_names,)).fetchall()
+        if rows:
+            index = cls(list(dict.fromkeys(encoder for encoder, code, name, count in rows)))
+            for encoder, code, name, count in rows:
+                index.index[encoder].setdefault(code, {})[name] = count
+            return index
+        index = cls.from_counts(store.firstname_counts(exclude_middle_names))
+        index.save_to_store(store, exclude_middle_names)
+        return index
+
+    def save_to_store(self, store: 'RecordStore', exclude_middle_names: bool = True):
+        '''
+        Persists the index in the store, replacing any already there for the same exclude_middle_names
+        '''
+        full_names = int(not exclude_middle_names)
+        rows = ((full_names, encoder, code, name, count) for encoder in self.encoders for code, names in self.index[encoder].items()
+                for name, count in names.items())
+        with store.connection:
+            store.connection.execute("DELETE FROM phonetic_codes WHERE full_names = ?", (full_names,))
+            store.connection.executemany("INSERT INTO phonetic_codes VALUES (?, ?, ?, ?, ?)", rows)
+
+    def add(self, name: str, count: int = 1):
+        for encoder in self.encoders:
+            for code in ENCODERS[encoder](name):
+                if code:
+                    names = self.index[encoder].setdefault(code, {})
+                    names[name] = names.get(name, 0) + count
+
+    def lookup(self, name: str, encoder: str = 'double_metaphone'):
+        '''
+        Returns a dictionary of every indexed name sharing a code with name under the given encoder, mapped to its count and sorted
+        by count from highest to lowest; name itself is included if it has been indexed
+        - for double_metaphone both the primary and alternate codes of name are looked up
+        '''
+        matches = {}
+        for code in ENCODERS[encoder](name):
+            for match, count in self.index[encoder].get(code, {}).items():
+                matches[match] = count
+        return dict(sorted(matches.items(), key=lambda item: (-item[1], item[0])))
+
+    def codes(self, encoder: str = 'double_metaphone'):
+        '''
+        Returns the codes indexed by an encoder, mapped to how many distinct names share each one
+        '''
+        return {code: len(names) for code, names in self.index[encoder].items()}
+
+    def save(self, path: str = "phonetic_index.json"):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'encoders': self.encoders, 'index': self.index}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = "phonetic_index.json"):
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        index = cls(saved['encoders'])
+        index.index = saved['index']
+        return index
@@ -0,0 +1,406 @@
+'''
+Phonetic encoders for names: names which sound alike get the same code, however they happen to be spelt
+- soundex: Mary ==> M600, Marie ==> M600
+- nysiis: Jacob ==> JACAB, Jakob ==> JACAB
+- double_metaphone: returns a (primary, alternate) pair of codes, Jacob ==> ('JKP', 'AKP'), Smith ==> ('SM0', 'XMT')
+
+ENCODERS maps the encoder names used by phonetic_index.py to functions returning a list of codes for a name, so that
+double_metaphone's alternate code is indexed alongside its primary one.
+'''
+import re
+
+SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(['AEIOUYHW', 'BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R']) for letter in letters}
+
+def soundex(x: str):
+    '''
+    Returns the American Soundex code of a name, i.e. Robert ==> R163, Rupert ==> R163, Mary ==> M600, Marie ==> M600
+    - the first letter is kept and the rest become digits for groups of similar sounding consonants, vowels are dropped
+    - consonants with the same digit either side of an H or W count once, ones either side of a vowel count twice
+    - anything which isn't a letter is ignored; returns an empty string if there are no letters at all
+    '''
+    letters = [c for c in x.upper() if c in SOUNDEX_CODES]
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = SOUNDEX_CODES[letters[0]]
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES[letter]
+        if digit != '0' and digit != previous:
+            code += digit
+        if letter not in 'HW':
+            previous = digit
+    return (code + '000')[:4]
+
+NYSIIS_PREFIXES = [('MAC', 'MCC'), ('KN', 'NN'), ('K', 'C'), ('PH', 'FF'), ('PF', 'FF'), ('SCH', 'SSS')]
+NYSIIS_SUFFIXES = [('EE', 'Y'), ('IE', 'Y'), ('DT', 'D'), ('RT', 'D'), ('RD', 'D'), ('NT', 'D'), ('ND', 'D')]
+
+def nysiis(x: str, max_length: int = 6):
+    '''
+    Returns the NYSIIS (New York State Identification and Intelligence System) code of a name, i.e. Jacob ==> JACAB, Jakob ==> JACAB
+    - more discriminating than Soundex as it keeps vowels' positions (as A) and handles common letter groups such as PH, SCH and KN
+    - max_length truncates the code as in the original algorithm, None keeps the full code
+    '''
+    name = re.sub(r'[^A-Z]', '', x.upper())
+    if not name:
+        return ""
+    for prefix, replacement in NYSIIS_PREFIXES:
+        if name.startswith(prefix):
+            name = replacement + name[len(prefix):]
+            break
+    for suffix, replacement in NYSIIS_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)] + replacement
+            break
+
+    key = name[0]
+    name = list(name)
+    i = 1
+    while i < len(name):
+        ch = name[i]
+        following = "".join(name[i:i+3])
+        if following.startswith('EV'):
+            name[i:i+2] = ['A', 'F']
+        elif ch in 'AEIOU':
+            name[i] = 'A'
+        elif ch == 'Q':
+            name[i] = 'G'
+        elif ch == 'Z':
+            name[i] = 'S'
+        elif ch == 'M':
+            name[i] = 'N'
+        elif following.startswith('KN'):
+            name[i] = 'N'
+        elif ch == 'K':
+            name[i] = 'C'
+        elif following == 'SCH':
+            name[i:i+3] = ['S', 'S', 'S']
+        elif following.startswith('PH'):
+            name[i:i+2] = ['F', 'F']
+        elif ch == 'H' and (name[i-1] not in 'AEIOU' or (i + 1 < len(name) and name[i+1] not in 'AEIOU')):
+            name[i] = name[i-1]
+        elif ch == 'W' and name[i-1] in 'AEIOU':
+            name[i] = name[i-1]
+        if name[i] != key[-1]:
+            key += name[i]
+        i += 1
+
+    if len(key) > 1 and key.endswith('S'):
+        key = key[:-1]
+    if key.endswith('AY'):
+        key = key[:-2] + 'Y'
+    if len(key) > 1 and key.endswith('A'):
+        key = key[:-1]
+    return key[:max_length] if max_length else key
+
+def double_metaphone(x: str, max_length: int = 4):
+    '''
+    Returns the (primary, alternate) Double Metaphone codes of a name, following Lawrence Philips' rules
+    - the alternate code covers another plausible pronunciation, often from a different language of origin, i.e. Smith ==> ('SM0', 'XMT')
+    - both codes are the same when there is no alternative, i.e. Thomas ==> ('TMS', 'TMS'); '0' stands for 'th' and 'X' for 'sh'
+    '''
+    st = re.sub(r'[^A-ZÇÑ]', '', x.upper())
+    length = len(st)
+    if length == 0:
+        return ("", "")
+    padded = st + '     '   # lets the rules look ahead without running off the end
+    vowels = 'AEIOUY'
+    slavo_germanic = any(s in st for s in ('W', 'K', 'CZ', 'WITZ'))
+    primary, secondary = [], []
+
+    def at(start: int, *options):
+        if start < 0:
+            return False
+        return any(padded[start:start + len(option)] == option for option in options)
+
+    def is_vowel(position: int):
+        return 0 <= position < length and st[position] in vowels
+
+    def add(main: str, alternate: str = None):
+        primary.append(main)
+        secondary.append(main if alternate is None else alternate)
+
+    pos = 0
+    if at(0, 'GN', 'KN', 'PN', 'WR', 'PS'):
+        pos = 1
+    if st[0] == 'X':    # Xavier, Xerxes
+        add('S')
+        pos = 1
+
+    while pos < length:
+        ch = st[pos]
+        if ch in vowels:
+            if pos == 0:
+                add('A')
+            pos += 1
+        elif ch == 'B':
+            add('P')
+            pos += 2 if at(pos + 1, 'B') else 1
+        elif ch == 'Ç':
+            add('S')
+            pos += 1
+        elif ch == 'C':
+            if pos > 1 and not is_vowel(pos - 2) and at(pos - 1, 'ACH') and not at(pos + 2, 'I') and (not at(pos + 2, 'E') or at(pos - 2, 'BACHER', 'MACHER')):
+                add('K')
+                pos += 2
+            elif pos == 0 and at(pos, 'CAESAR'):
+                add('S')
+                pos += 2
+            elif at(pos, 'CHIA'):
+                add('K')
+                pos += 2
+            elif at(pos, 'CH'):
+                if pos > 0 and at(pos, 'CHAE'):
+                    add('K', 'X')
+                elif pos == 0 and (at(pos + 1, 'HARAC', 'HARIS') or at(pos + 1, 'HOR', 'HYM', 'HIA', 'HEM')) and not at(0, 'CHORE'):
+                    add('K')
+                elif at(0, 'VAN ', 'VON ', 'SCH') or at(pos - 2, 'ORCHES', 'ARCHIT', 'ORCHID') or at(pos + 2, 'T', 'S') \
+                        or ((at(pos - 1, 'A', 'O', 'U', 'E') or pos == 0) and at(pos + 2, 'L', 'R', 'N', 'M', 'B', 'H', 'F', 'V', 'W', ' ')):
+                    add('K')
+                elif pos > 0:
+                    add('K', 'K') if at(0, 'MC') else add('X', 'K')
+                else:
+                    add('X')
+                pos += 2
+            elif at(pos, 'CZ') and not at(pos - 2, 'WICZ'):
+                add('S', 'X')
+                pos += 2
+            elif at(pos + 1, 'CIA'):
+                add('X')
+                pos += 3
+            elif at(pos, 'CC') and not (pos == 1 and st[0] == 'M'):
+                if at(pos + 2, 'I', 'E', 'H') and not at(pos + 2, 'HU'):
+                    if (pos == 1 and st[0] == 'A') or at(pos - 1, 'UCCEE', 'UCCES'):
+                        add('KS')
+                    else:
+                        add('X')
+                    pos += 3
+                else:
+                    add('K')
+                    pos += 2
+            elif at(pos, 'CK', 'CG', 'CQ'):
+                add('K')
+                pos += 2
+            elif at(pos, 'CI', 'CE', 'CY'):
+                add('S', 'X') if at(pos, 'CIO', 'CIE', 'CIA') else add('S')
+                pos += 2
+            else:
+                add('K')
+                if at(pos + 1, ' C', ' Q', ' G'):
+                    pos += 3
+                elif at(pos + 1, 'C', 'K', 'Q') and not at(pos + 1, 'CE', 'CI'):
+                    pos += 2
+                else:
+                    pos += 1
+        elif ch == 'D':
+            if at(pos, 'DG'):
+                if at(pos + 2, 'I', 'E', 'Y'):
+                    add('J')
+                    pos += 3
+                else:
+                    add('TK')
+                    pos += 2
+            else:
+                add('T')
+                pos += 2 if at(pos, 'DT', 'DD') else 1
+        elif ch == 'F':
+            add('F')
+            pos += 2 if at(pos + 1, 'F') else 1
+        elif ch == 'G':
+            if at(pos + 1, 'H'):
+                if pos > 0 and not is_vowel(pos - 1):
+                    add('K')
+                    pos += 2
+                elif pos == 0:
+                    add('J') if at(pos + 2, 'I') else add('K')
+                    pos += 2
+                elif (pos > 1 and at(pos - 2, 'B', 'H', 'D')) or (pos > 2 and at(pos - 3, 'B', 'H', 'D')) or (pos > 3 and at(pos - 4, 'B', 'H')):
+                    pos += 2    # Hugh, bough, broughton
+                else:
+                    if pos > 2 and at(pos - 1, 'U') and at(pos - 3, 'C', 'G', 'L', 'R', 'T'):
+                        add('F')    # laugh, McLaughlin, cough, gough, rough, tough
+                    elif pos > 0 and not at(pos - 1, 'I'):
+                        add('K')
+                    pos += 2
+            elif at(pos + 1, 'N'):
+                if pos == 1 and is_vowel(0) and not slavo_germanic:
+                    add('KN', 'N')
+                elif not at(pos + 2, 'EY') and not at(pos + 1, 'Y') and not slavo_germanic:
+                    add('N', 'KN')
+                else:
+                    add('KN')
+                pos += 2
+            elif at(pos + 1, 'LI') and not slavo_germanic:
+                add('KL', 'L')
+                pos += 2
+            elif pos == 0 and (at(pos + 1, 'Y') or at(pos + 1, 'ES', 'EP', 'EB', 'EL', 'EY', 'IB', 'IL', 'IN', 'IE', 'EI', 'ER')):
+                add('K', 'J')
+                pos += 2
+            elif (at(pos + 1, 'ER') or at(pos + 1, 'Y')) and not at(0, 'DANGER', 'RANGER', 'MANGER') and not at(pos - 1, 'E', 'I') and not at(pos - 1, 'RGY', 'OGY'):
+                add('K', 'J')
+                pos += 2
+            elif at(pos + 1, 'E', 'I', 'Y') or at(pos - 1, 'AGGI', 'OGGI'):
+                if at(0, 'VAN ', 'VON ', 'SCH') or at(pos + 1, 'ET'):
+                    add('K')
+                elif at(pos + 1, 'IER '):
+                    add('J')
+                else:
+                    add('J', 'K')
+                pos += 2
+            else:
+                add('K')
+                pos += 2 if at(pos + 1, 'G') else 1
+        elif ch == 'H':
+            if (pos == 0 or is_vowel(pos - 1)) and is_vowel(pos + 1):
+                add('H')
+                pos += 2
+            else:
+                pos += 1
+        elif ch == 'J':
+            if at(pos, 'JOSE') or at(0, 'SAN '):
+                if (pos == 0 and at(pos + 4, ' ')) or at(0, 'SAN '):
+                    add('H')
+                else:
+                    add('J', 'H')
+            elif pos == 0 and not at(pos, 'JOSE'):
+                add('J', 'A')   # Yankelovich / Jankelowicz
+            elif is_vowel(pos - 1) and not slavo_germanic and at(pos + 1, 'A', 'O'):
+                add('J', 'H')
+            elif pos == length - 1:
+                add('J', '')
+            elif not at(pos + 1, 'L', 'T', 'K', 'S', 'N', 'M', 'B', 'Z') and not at(pos - 1, 'S', 'K', 'L'):
+                add('J')
+            pos += 2 if at(pos + 1, 'J') else 1
+        elif ch == 'K':
+            add('K')
+            pos += 2 if at(pos + 1, 'K') else 1
+        elif ch == 'L':
+            if at(pos + 1, 'L'):
+                if (pos == length - 3 and at(pos - 1, 'ILLO', 'ILLA', 'ALLE')) or \
+                        ((at(length - 2, 'AS', 'OS') or at(length - 1, 'A', 'O')) and at(pos - 1, 'ALLE')):
+                    add('L', '')    # Spanish, i.e. cabrillo, gallegos
+                else:
+                    add('L')
+                pos += 2
+            else:
+                add('L')
+                pos += 1
+        elif ch == 'M':
+            add('M')
+            if (at(pos - 1, 'UMB') and (pos + 1 == length - 1 or at(pos + 2, 'ER'))) or at(pos + 1, 'M'):
+                pos += 2
+            else:
+                pos += 1
+        elif ch == 'N':
+            add('N')
+            pos += 2 if at(pos + 1, 'N') else 1
+        elif ch == 'Ñ':
+            add('N')
+            pos += 1
+        elif ch == 'P':
+            if at(pos + 1, 'H'):
+                add('F')
+                pos += 2
+            else:
+                add('P')
+                pos += 2 if at(pos + 1, 'P', 'B') else 1
+        elif ch == 'Q':
+            add('K')
+            pos += 2 if at(pos + 1, 'Q') else 1
+        elif ch == 'R':
+            if pos == length - 1 and not slavo_germanic and at(pos - 2, 'IE') and not at(pos - 4, 'ME', 'MA'):
+                add('', 'R')    # French, i.e. Rogier
+            else:
+                add('R')
+            pos += 2 if at(pos + 1, 'R') else 1
+        elif ch == 'S':
+            if at(pos - 1, 'ISL', 'YSL'):
+                pos += 1    # island, carlisle
+            elif pos == 0 and at(pos, 'SUGAR'):
+                add('X', 'S')
+                pos += 1
+            elif at(pos, 'SH'):
+                add('S') if at(pos + 1, 'HEIM', 'HOEK', 'HOLM', 'HOLZ') else add('X')
+                pos += 2
+            elif at(pos, 'SIO', 'SIA') or at(pos, 'SIAN'):
+                add('S') if slavo_germanic else add('S', 'X')
+                pos += 3
+            elif (pos == 0 and at(pos + 1, 'M', 'N', 'L', 'W')) or at(pos + 1, 'Z'):
+                add('S', 'X')   # Smith / Schmidt
+                pos += 2 if at(pos + 1, 'Z') else 1
+            elif at(pos, 'SC'):
+                if at(pos + 2, 'H'):
+                    if at(pos + 3, 'OO', 'ER', 'EN', 'UY', 'ED', 'EM'):
+                        add('X', 'SK') if at(pos + 3, 'ER', 'EN') else add('SK')
+                    elif pos == 0 and not is_vowel(3) and not at(3, 'W'):
+                        add('X', 'S')
+                    else:
+                        add('X')
+                elif at(pos + 2, 'I', 'E', 'Y'):
+                    add('S')
+                else:
+                    add('SK')
+                pos += 3
+            else:
+                if pos == length - 1 and at(pos - 2, 'AI', 'OI'):
+                    add('', 'S')    # French, i.e. resnais, artois
+                else:
+                    add('S')
+                pos += 2 if at(pos + 1, 'S', 'Z') else 1
+        elif ch == 'T':
+            if at(pos, 'TION') or at(pos, 'TIA', 'TCH'):
+                add('X')
+                pos += 3
+            elif at(pos, 'TH') or at(pos, 'TTH'):
+                if at(pos + 2, 'OM', 'AM') or at(0, 'VAN ', 'VON ', 'SCH'):
+                    add('T')
+                else:
+                    add('0', 'T')
+                pos += 2
+            else:
+                add('T')
+                pos += 2 if at(pos + 1, 'T', 'D') else 1
+        elif ch == 'V':
+            add('F')
+            pos += 2 if at(pos + 1, 'V') else 1
+        elif ch == 'W':
+            if at(pos, 'WR'):
+                add('R')
+                pos += 2
+            else:
+                if pos == 0 and (is_vowel(pos + 1) or at(pos, 'WH')):
+                    add('A', 'F') if is_vowel(pos + 1) else add('A')    # Wasserman / Vasserman
+                if (pos == length - 1 and is_vowel(pos - 1)) or at(pos - 1, 'EWSKI', 'EWSKY', 'OWSKI', 'OWSKY') or at(0, 'SCH'):
+                    add('', 'F')
+                    pos += 1
+                elif at(pos, 'WICZ', 'WITZ'):
+                    add('TS', 'FX')
+                    pos += 4
+                else:
+                    pos += 1
+        elif ch == 'X':
+            if not (pos == length - 1 and (at(pos - 3, 'IAU', 'EAU') or at(pos - 2, 'AU', 'OU'))):
+                add('KS')
+            pos += 2 if at(pos + 1, 'C', 'X') else 1
+        elif ch == 'Z':
+            if at(pos + 1, 'H'):
+                add('J')
+                pos += 2
+            else:
+                if at(pos + 1, 'ZO', 'ZI', 'ZA') or (slavo_germanic and pos > 0 and not at(pos - 1, 'T')):
+                    add('S', 'TS')
+                else:
+                    add('S')
+                pos += 2 if at(pos + 1, 'Z') else 1
+        else:
+            pos += 1
+
+    primary, secondary = "".join(primary), "".join(secondary)
+    if max_length:
+        primary, secondary = primary[:max_length], secondary[:max_length]
+    return primary, secondary
+
+ENCODERS = {
+    'soundex': lambda name: [soundex(name)],
+    'nysiis': lambda name: [nysiis(name)],
+    'double_metaphone': lambda name: list(dict.fromkeys(double_metaphone(name))),
+}
@@ -0,0 +1,184 @@
+'''
+Two-stage scraping pipeline: network I/O in one stage, parsing in a pool of worker processes in the other
+
+PageWorkerThread fetches and parses in the same thread, so however many threads there are, parsing (the CPU heavy part) only ever
+uses one core because of the GIL. Here the stages are decoupled:
+- I/O stage: AsyncIndexCrawler fetches the raw page bytes (with its rate limiting, retries and page cache) and puts them on a
+  bounded queue, so fetching pauses when parsing falls behind rather than holding every page in memory
+- parse stage: the pages on the queue are handed to parser workers, which turn them into PersonRecords plus that page's partial
+  aggregates (name counts, birth year ==> name counts), which are then merged in page order
+
+mode picks how the parse stage runs, so the same code can be compared on one machine:
+- "serial": parsed one after the other in the main thread
+- "thread": a ThreadPoolExecutor, only helps where the parser releases the GIL
+- "process": a ProcessPoolExecutor, one parser per core
+EXAMPLE:
+    result = ParsingPipeline(mode="process", backend="lxml", cache=PageCache("page_cache")).run()
+    result.names    ==> {'Mary': 692, 'John': 511, ...}
+    result.years    ==> {1850: {'Mary': 12, ...}, ...}
+'''
+from aggregation import merge_into
+from async_scraper import AsyncIndexCrawler
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from parser_backends import get_backend
+from records import PersonRecord
+from typing import Dict, List, NamedTuple
+import asyncio
+import os
+import queue
+import threading
+import time
+
+MODES = ("serial", "thread", "process")
+
+class PipelineResult(NamedTuple):
+    records: Dict[int, List[PersonRecord]]  # page index ==> records on that page
+    names: dict                             # name ==> count over every page
+    years: dict                             # birth year ==> {name: count} over every page
+
+def page_aggregates(records: List[PersonRecord], exclude_middle_names: bool = True):
+    '''
+    Returns (name ==> count, birth year ==> {name: count}) for one page's records
+    '''
+    names, years = {}, {}
+    for record in records:
+        name = record.first_name if exclude_middle_names else record.given_names
+        names[name] = names.get(name, 0) + 1
+        if record.birth_year is not None:
+            year = years.setdefault(record.birth_year, {})
+            year[name] = year.get(name, 0) + 1
+    return names, years
+
+def parse_page(content: bytes, index: int, backend: str = "html.parser", exclude_middle_names: bool = True):
+    '''
+    Parser worker: returns (index, records, names, years) for one page; module level so it can be sent to worker processes
+    '''
+    records = get_backend(backend).parse(content, index)
+    return (index, records) + page_aggregates(records, exclude_middle_names)
+
+def timed_parse_page(content: bytes, index: int, backend: str = "html.parser", exclude_middle_names: bool = True):
+    '''
+    parse_page, also returning how long it took in the worker, for RunMetrics
+    '''
+    start = time.perf_counter()
+    parsed = parse_page(content, index, backend, exclude_middle_names)
+    return parsed, time.perf_counter() - start
+
+class ParsingPipeline:
+    '''
+    = mode: "serial", "thread" or "process", see above
+    = workers: number of parser workers, defaults to the number of cores
+    = queue_size: how many fetched pages can wait for a parser before fetching pauses
+    = backend: parser backend name, see parser_backends.py
+    = exclude_middle_names: count only the first given name, i.e. Mary Lucy ==> Mary
+    = metrics: optional RunMetrics, given the fetch timings by the crawler plus parse and merge times and record counts
+    - crawler_options are passed on to AsyncIndexCrawler, i.e. concurrency=8, base_url=..., cache=PageCache("page_cache")
+    '''
+    def __init__(self, mode: str = "process", workers: int = None, queue_size: int = 16, backend: str = "html.parser",
+                 exclude_middle_names: bool = True, metrics: 'RunMetrics' = None, **crawler_options):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}, not {mode!r}")
+        get_backend(backend)    # fail here rather than in every worker if it isn't installed
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.backend = backend
+        self.exclude_middle_names = exclude_middle_names
+        self.metrics = metrics
+        self.crawler = AsyncIndexCrawler(html_parser=None, metrics=metrics, **crawler_options)
+        self.failed_pages = []
+
+    def fetch_stage(self, pages, page_queue: queue.Queue, stop: threading.Event):
+        async def put(content, index):
+            if not stop.is_set():   # the consumer has stopped, the crawl is winding down so don't queue any more pages
+                await asyncio.to_thread(page_queue.put, (index, content))   # waits for room without holding up the other fetches
+        try:
+            self.crawler.run_per_page(put, pages=pages, pass_index=True, stop=stop)
+        finally:
+            page_queue.put(None)
+
+    def executor(self):
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers)
+        return None
+
+    def parsed_pages(self, pages=range(1, 80)):
+        '''
+        Generator yielding (index, records, names, years) for every page as soon as it has been parsed, so in the order parsing
+        finishes rather than page order; only the pages on the queue and in the workers are held in memory at any one time.
+        Closing it early stops the crawl too, so pages which haven't been fetched yet never are.
+        Once it is exhausted (or closed), pages which failed to download or parse are listed in self.failed_pages
+        '''
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self.fetch_stage, args=(pages, page_queue, stop), daemon=True)
+        fetcher.start()
+        parse_errors = []
+        fetched_all = False
+        parse = parse_page if self.metrics is None else timed_parse_page
+
+        def measured(parsed):
+            if self.metrics is None:
+                return parsed
+            parsed, seconds = parsed
+            self.metrics.add_time('parse', seconds)
+            self.metrics.count('pages_parsed')
+            self.metrics.count('records', len(parsed[1]))
+            return parsed
+
+        def results(futures: dict):
+            for future in futures:
+                try:
+                    yield measured(future.result())
+                except Exception as e:
+                    parse_errors.append((futures[future], repr(e)))
+
+        executor = self.executor()
+        try:
+            pending = {}    # future ==> page index
+            while True:
+                item = page_queue.get()
+                if item is None:
+                    fetched_all = True
+                    break
+                index, content = item
+                if executor is None:
+                    try:
+                        parsed = measured(parse(content, index, self.backend, self.exclude_middle_names))
+                    except Exception as e:
+                        parse_errors.append((index, repr(e)))
+                        continue
+                    yield parsed
+                    continue
+                if len(pending) >= self.workers * 2:    # keep the workers busy without queueing every page in the executor
+                    done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from results({future: pending[future] for future in done})
+                    pending = {future: pending[future] for future in not_done}
+                pending[executor.submit(parse, content, index, self.backend, self.exclude_middle_names)] = index
+            yield from results(pending)
+        finally:
+            stop.set()
+            while not fetched_all and page_queue.get() is not None:
+                pass    # unblock the fetch stage if it is waiting on a full queue
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            fetcher.join()
+            self.failed_pages = self.crawler.failed_pages + parse_errors
+
+    def run(self, pages=range(1, 80)):
+        '''
+        Fetches and parses the pages, returning a PipelineResult; pages which failed to download or parse are listed in self.failed_pages
+        '''
+        parsed = {index: (records, names, years) for index, records, names, years in self.parsed_pages(pages)}
+        start = time.perf_counter()
+        result = PipelineResult({}, {}, {})
+        for index in sorted(parsed):
+            records, names, years = parsed[index]
+            result.records[index] = records
+            merge_into(result.names, names, copy=False)
+            merge_into(result.years, years, copy=False)
+        if self.metrics is not None:
+            self.metrics.add_time('merge', time.perf_counter() - start)
+        return result
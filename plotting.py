@@ -0,0 +1,206 @@
+'''
+Bar charts of the scraped first names; matplotlib is only imported when a chart is actually drawn
+- output_path: if given, the chart is saved to that file (png, svg, pdf...) without opening a window, otherwise it is shown
+- render_charts draws a whole set of charts from the precomputed NameAggregates (see aggregates.py) straight to files
+'''
+from aggregates import NameAggregates
+from dictionary_funcs import condition_filter_out_specific_names, sort_dict_by_keys_desc
+import os
+
+def get_pyplot(output_path: str = None):
+    import matplotlib
+    if output_path is not None:
+        matplotlib.use("Agg") # render straight to file, works without a display
+    import matplotlib.pyplot as plt
+    return plt
+
+def finish_plot(plt, output_path: str = None):
+    if output_path is None:
+        plt.show()
+    else:
+        plt.savefig(output_path, bbox_inches='tight')
+        plt.close()
+
+def format_plot_for_getFirstNamesWithBirthYearAsInt(data: dict, number_of_names_to_plot: int = 1, output_path: str = None):
+    '''
+    Call this function if your dictionary was created using the function get_firstnames_with_birthyear
+    where the birthyear was inserted as an integer --> i.e. years with circa or a full birth day must be formatted to a single year
+    - dictionary should be of the form key : val ==> int : List[string]
+        where the key is a year and the val is the list of names in that year
+    - alternatively pass a YearNameTable (see compact_years.py), i.e. YearNameTable.from_year_names(data), which works out the decades itself,
+        or a NameAggregates (see aggregates.py), whose per-decade top names are already worked out
+    = number_of_names_to_plot: 1 plots the top name of each decade, with tied names sharing the bar; more plots that many bars side
+        by side in each decade, most common on the left
+
+    Aim of plot is to have decades on the x-axis in chronological order, number of name occurrences on the y-axis; three bars will be allocated on each decade, representing the 
+        top three most common given first names in that decade, with the names written at the top of the bars
+
+    = First, we need to sort the dictionary by keys from lowest to highest for the years/decades to be in chronological order
+    = Next, we need to sort the values' dictionaries from highest to lowest by values - these dictionaries have names for keys and number of uses for values
+    = We then need to label on the x-axis: the keys representing decades; the y-axis: number of occurrences for names; and the bars: most common names each decade
+    https://matplotlib.org/3.1.1/gallery/lines_bars_and_markers/barchart.html#sphx-glr-gallery-lines-bars-and-markers-barchart-py
+    '''
+    from compact_years import YearNameTable  # numpy, which matplotlib needs anyway
+    plt = get_pyplot(output_path)
+    # Set default font sizes
+    plt.rcParams['font.size'] = 14               # Default font size for all text
+    plt.rcParams['axes.titlesize'] = 16          # Size for axes titles
+    plt.rcParams['axes.labelsize'] = 14          # Size for axes labels
+    plt.rcParams['xtick.labelsize'] = 12         # Size for x-tick labels
+    plt.rcParams['ytick.labelsize'] = 12         # Size for y-tick labels
+    plt.title('Most popular first names recorded at birth per decade in Stourton, Mere, Kilmington and Wiltshire 17-19th Centuries')
+
+    if number_of_names_to_plot > 1:
+        plot_top_names_per_decade(plt, data, number_of_names_to_plot)
+        finish_plot(plt, output_path)
+        return
+    if isinstance(data, (NameAggregates, YearNameTable)): # the per-decade top names are looked up or come from a vectorised group-by
+        chronological = sort_dict_by_keys_desc(data.top_n(period=10, n=1, include_ties=True))
+        decades = list(chronological.keys())
+        top_names = [', '.join(name for name, count in tops) for tops in chronological.values()]
+        respective_counts = [tops[0][1] for tops in chronological.values()]
+    else:
+        chronological = sort_dict_by_keys_desc(data)
+        decades = list(chronological.keys())
+        top_names = []
+        respective_counts = []     
+        for key, name_dict in chronological.items():
+            max_val = max(name_dict.values())
+            top_names.append(f"{', '.join(name for name, count in name_dict.items() if count == max_val)}")
+            respective_counts.append(max_val)
+    '''
+    OLD METHOD, SEE ABOVE FOR NEW METHOD
+    for key, name_dict in chronological.items():
+        # now we need to get the values sorted by value in descending order
+        name_dict_sorted = sort_dict_by_values_desc(name_dict)
+        top_names.append(list(name_dict_sorted.keys())[0])
+        respective_counts.append(list(name_dict_sorted.values())[0])   
+        # these lines can be used to double check extracted values for debugging purposes -> i.e. seeing what happens if two names have the same count
+        #top_name = list(name_dict_sorted.keys())[0]
+        #top_names.append(top_name)
+        #count = list(name_dict_sorted.values())[0]
+        #respective_counts.append(count)
+        #print(f"{name_dict_sorted} \n{top_name} \n{count}\n\n")
+    '''
+    
+    # plot just the top name for now, add functionality for choosing top three or five or however many later on
+    bar_width = 3
+    bars = plt.bar(decades, respective_counts, color='purple', width=bar_width)
+
+    for i in range(0,len(bars)):
+        height = bars[i].get_height()
+        plt.annotate(f'{top_names[i]}\n{height}',
+                    xy=(bars[i].get_x() + bars[i].get_width() / 2, height),
+                    xytext=(0, 1),  # 3 points vertical offset
+                    textcoords="offset points",
+                    ha='center', va='bottom',
+                    rotation=90,
+                    fontsize=8)
+
+    plt.xlabel('Decade')
+    plt.ylabel('Total occurrences of most popular name')
+    plt.xticks(rotation=90)
+    #plt.ylim(0, max(respective_counts) + 5)
+    #plt.grid(True)
+
+    finish_plot(plt, output_path)
+
+def plot_top_names_per_decade(plt, data, n: int):
+    '''
+    Draws n bars per decade, one for each of the decade's n most common names, for format_plot_for_getFirstNamesWithBirthYearAsInt
+    '''
+    if not hasattr(data, 'top_n'):
+        data = NameAggregates(data)     # decade ==> {name: count}, the decades are the keys already
+        tops = data.top_n(period=1, n=n, include_ties=False)
+    else:
+        tops = data.top_n(period=10, n=n, include_ties=False)
+    chronological = sort_dict_by_keys_desc(tops)
+    bar_width = 8 / n   # decades are 10 apart, leave a gap between them
+    for rank in range(0, n):
+        decades = [decade for decade, names in chronological.items() if len(names) > rank]
+        ranked = [chronological[decade][rank] for decade in decades]
+        bars = plt.bar([decade - 4 + bar_width * (rank + 0.5) for decade in decades], [count for name, count in ranked], width=bar_width,
+                       label=f"#{rank + 1}")
+        for bar, (name, count) in zip(bars, ranked):
+            plt.annotate(f'{name} {count}',
+                        xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                        xytext=(0, 1),
+                        textcoords="offset points",
+                        ha='center', va='bottom',
+                        rotation=90,
+                        fontsize=6)
+    plt.xlabel('Decade')
+    plt.ylabel(f'Occurrences of the {n} most popular names')
+    plt.xticks(list(chronological.keys()), rotation=90)
+    plt.legend()
+
+def format_plot_for_getFirstNames(data: dict, output_path: str = None):
+    '''
+    Call this function if your dictionary was created using the function get_firstnames
+    - dictionary should be of the form key : val ==> string : int
+        where the key is a name and the val is the count for that name
+    '''
+    # data = trim_sorted_dictionary(filter_dict(sort_dict_by_values_desc(complete_dictionary), condition_filter_out_specific_names))
+    # data = filter_dict(sort_dict_by_values_asc(complete_dictionary), condition_starts_with_one_of_letter)
+    # any of the conditions can be applied in the filter_dict function to customize the plot
+
+    plt = get_pyplot(output_path)
+    keys = list(data.keys())
+    values = list(data.values())
+
+    plt.bar(keys, values, color='purple')
+
+    # Set default font sizes
+    plt.rcParams['font.size'] = 14               # Default font size for all text
+    plt.rcParams['axes.titlesize'] = 16          # Size for axes titles
+    plt.rcParams['axes.labelsize'] = 14          # Size for axes labels
+    plt.rcParams['xtick.labelsize'] = 12         # Size for x-tick labels
+    plt.rcParams['ytick.labelsize'] = 12         # Size for y-tick labels
+
+    plt.title('First Names recorded at birth in Stourton, Mere, Kilmington and Wiltshire 17-19th Centuries')
+
+    # Add exact numbers above the bars
+    for i, value in enumerate(values):
+        plt.text(i, 
+                value + 0.5, 
+                str(value), 
+                ha='center', 
+                va='bottom',
+                rotation=45,  
+                fontsize=8)
+
+    plt.xlabel('Names')
+    plt.ylabel('Total')
+    plt.xticks(rotation=90)
+    #plt.grid(True)
+
+    finish_plot(plt, output_path)
+
+def render_charts(aggregates: NameAggregates, output_dir: str, top_per_decade=(1, 3, 5), top_names: int = 50, extension: str = "png",
+                  metrics: 'RunMetrics' = None):
+    '''
+    Saves a set of charts to output_dir without opening any windows, every one drawn from lookups into aggregates:
+    - names_top{top_names}: the most common names overall, as the plot names command draws
+    - decades_top{n}: the n most common names of each decade, for every n in top_per_decade
+    = metrics: optional RunMetrics, given the time each chart took to draw and save ('render') and the number of charts
+    Returns the list of files written
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    charts = [(os.path.join(output_dir, f"names_top{top_names}.{extension}"),
+               lambda path: format_plot_for_getFirstNames(aggregates.top_names(top_names, condition_filter_out_specific_names), output_path=path))]
+    for n in top_per_decade:
+        charts.append((os.path.join(output_dir, f"decades_top{n}.{extension}"),
+                       lambda path, n=n: format_plot_for_getFirstNamesWithBirthYearAsInt(aggregates, number_of_names_to_plot=n, output_path=path)))
+    for path, draw in charts:
+        render(draw, path, metrics)
+    return [path for path, draw in charts]
+
+def render(draw, output_path: str = None, metrics: 'RunMetrics' = None):
+    '''
+    Calls draw(output_path), recording how long it took in metrics if there is one
+    '''
+    if metrics is None:
+        return draw(output_path)
+    with metrics.timer('render'):
+        draw(output_path)
+    metrics.count('charts')
@@ -0,0 +1,209 @@
+'''
+Inverted index over the scraped person records: surname ==> records, first name ==> records, birth year ==> records
+
+Each index page groups its people under surnames, so every PersonRecord already knows its surname. RecordIndex files the position
+of every record under its surname, first name, full given names and birth year once, and a query then intersects those postings
+rather than scanning the records (or the pages) again. Names are matched case-insensitively; a name can also be widened to its
+spellings, by Jaro-Winkler score (through a SimilarityCache) or by phonetic code (through a PhoneticIndex), both only worked out
+over the distinct first names.
+Building a RecordIndex reads every record, which only pays off over many queries; for a single one (i.e. cli.py search),
+query_store answers it straight from the RecordStore's SQL indexes, widening names over the name counts and phonetic index
+persisted next to the records.
+EXAMPLE:
+    index = RecordIndex.from_store(RecordStore("records.sqlite"))
+    index.query(surname="Smith", born=(1820, 1840), name="Mary", variants=True)   ==> every Smith born 1820-1840 named Mary, Maria, Marie...
+    index.query(name="Jacob", phonetic="double_metaphone")                        ==> every Jacob, Jakob, Jacobb...
+    index.surname_counts()                                                         ==> {'Smith': 420, 'Jones': 211, ...}
+    index.surname_aggregates().top_n(period=10, n=3)                               ==> the most common surnames of each decade
+    query_store(RecordStore("records.sqlite"), surname="Smith", name="Mary", variants=True)    ==> the same as index.query
+'''
+from aggregates import NameAggregates
+from array import array
+from records import PersonRecord
+import bisect
+
+class RecordIndex:
+    def __init__(self):
+        self.records = []       # record id ==> PersonRecord, in the order they were scraped
+        self.surnames = {}      # upper-case surname ==> array of record ids
+        self.first_names = {}   # upper-case first name ==> array of record ids
+        self.given_names = {}   # upper-case given names ==> array of record ids
+        self.years = {}         # birth year ==> array of record ids
+        self.sorted_years = []  # distinct birth years, lowest first, for range queries
+        self.similarity = None  # SimilarityCache for the variants, made on first use
+        self.phonetic_indexes = {}  # full_names ==> PhoneticIndex over the first names or the given names, made (or loaded) on first use
+        self.store = None       # RecordStore the records came from, whose persisted PhoneticIndex is loaded rather than rebuilt
+
+    def add(self, record: PersonRecord):
+        record_id = len(self.records)
+        self.records.append(record)
+        for postings, key in ((self.surnames, (record.surname or "").upper()), (self.first_names, record.first_name.upper()),
+                              (self.given_names, record.given_names.upper())):
+            ids = postings.get(key)
+            if ids is None:
+                ids = postings[key] = array('i')
+            ids.append(record_id)
+        if record.birth_year is not None:
+            if record.birth_year not in self.years:
+                self.years[record.birth_year] = array('i')
+                bisect.insort(self.sorted_years, record.birth_year)
+            self.years[record.birth_year].append(record_id)
+        self.phonetic_indexes = {}
+        self.store = None       # the records no longer match the store's
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for record in records:
+            index.add(record)
+        return index
+
+    @classmethod
+    def from_store(cls, store: 'RecordStore'):
+        '''
+        Builds the index from the records of a RecordStore, one pass over the table
+        '''
+        index = cls.from_records(store.iter_records())
+        index.store = store
+        return index
+
+    def __len__(self):
+        return len(self.records)
+
+    def surname_ids(self, *surnames: str):
+        return self.union(self.surnames, surnames)
+
+    def name_ids(self, *names: str, full_names: bool = False):
+        '''
+        Returns the ids of the records with any of names as their first name, or as their given names with full_names=True
+        '''
+        return self.union(self.given_names if full_names else self.first_names, names)
+
+    def born_between_ids(self, start: int = None, end: int = None):
+        '''
+        Returns the ids of the records with a birth year from start to end inclusive, either end left open if None
+        '''
+        low = 0 if start is None else bisect.bisect_left(self.sorted_years, start)
+        high = len(self.sorted_years) if end is None else bisect.bisect_right(self.sorted_years, end)
+        return self.union(self.years, self.sorted_years[low:high], upper=False)
+
+    def union(self, postings: dict, keys, upper: bool = True):
+        ids = set()
+        for key in keys:
+            ids.update(postings.get(key.upper() if upper else key, ()))
+        return ids
+
+    def variants(self, name: str, threshold: float = 0.75, phonetic: str = None, full_names: bool = False):
+        '''
+        Returns the indexed first names which are spellings of name: scoring above threshold by Jaro-Winkler, or sharing a code
+        under the phonetic encoder if one is given (see phonetics.ENCODERS); name itself is included if it is indexed
+        = full_names: the indexed given names instead, i.e. Mary Ann for Marie Ann
+        '''
+        if phonetic is not None:
+            phonetic_index = self.phonetic_indexes.get(full_names)
+            if phonetic_index is None:
+                from phonetic_index import PhoneticIndex
+                if self.store is not None:
+                    phonetic_index = PhoneticIndex.from_store(self.store, exclude_middle_names=not full_names)
+                else:
+                    phonetic_index = PhoneticIndex.from_counts(self.name_counts(full_names))
+                self.phonetic_indexes[full_names] = phonetic_index
+            return list(phonetic_index.lookup(name, phonetic))
+        if self.similarity is None:
+            from similarity_cache import SimilarityCache
+            self.similarity = SimilarityCache()
+        return list(self.similarity.scores_above(name, list(self.name_counts(full_names)), threshold))
+
+    def name_counts(self, full_names: bool = False):
+        '''
+        Returns a dictionary of first name, or given names with full_names=True, ==> number of records
+        '''
+        postings = self.given_names if full_names else self.first_names
+        return {(self.records[ids[0]].given_names if full_names else self.records[ids[0]].first_name): len(ids) for ids in postings.values()}
+
+    def query_ids(self, surname=None, name=None, born: tuple = None, variants: bool = False, threshold: float = 0.75,
+                  phonetic: str = None, full_names: bool = False):
+        '''
+        Returns the sorted ids of the records matching every given condition, see query
+        '''
+        conditions = []
+        if surname is not None:
+            conditions.append(self.surname_ids(*([surname] if isinstance(surname, str) else surname)))
+        if name is not None:
+            names = [name] if isinstance(name, str) else list(name)
+            if variants or phonetic is not None:
+                names = [variant for n in names for variant in self.variants(n, threshold, phonetic, full_names)]
+            conditions.append(self.name_ids(*names, full_names=full_names))
+        if born is not None:
+            conditions.append(self.born_between_ids(*born))
+        if not conditions:
+            return list(range(0, len(self.records)))
+        conditions.sort(key=len)
+        ids = conditions[0]
+        for other in conditions[1:]:
+            ids = ids.intersection(other)
+        return sorted(ids)
+
+    def query(self, surname=None, name=None, born: tuple = None, variants: bool = False, threshold: float = 0.75,
+              phonetic: str = None, full_names: bool = False):
+        '''
+        Returns the records matching every given condition, in the order they were scraped
+        = surname: a surname or a list of them
+        = name: a first name or a list of them, matched against the given names instead with full_names=True
+        = born: (start, end) birth years inclusive, either can be None for an open range; records without a year never match
+        = variants: also match the first names scoring above threshold against name, or sharing a phonetic code with it when
+            phonetic names an encoder, i.e. phonetic='double_metaphone'; with full_names, the given names are widened instead
+        '''
+        return [self.records[record_id] for record_id in self.query_ids(surname, name, born, variants, threshold, phonetic, full_names)]
+
+    def surname_counts(self):
+        '''
+        Returns a dictionary of surname ==> number of people, most common first
+        '''
+        counts = {self.records[ids[0]].surname: len(ids) for key, ids in self.surnames.items() if key}
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def surname_aggregates(self):
+        '''
+        Returns a NameAggregates of surname x birth year, i.e. .top_n(period=10, n=3) for the most common surnames of each decade
+        '''
+        aggregates = NameAggregates()
+        for record in self.records:
+            if record.surname is not None:
+                aggregates.add(record.birth_year, record.surname)
+        return aggregates
+
+def query_store(store: 'RecordStore', surname=None, name=None, born: tuple = None, variants: bool = False, threshold: float = 0.75,
+                phonetic: str = None, full_names: bool = False):
+    '''
+    Returns the records of store matching every given condition, in the order they were scraped, as RecordIndex.query would
+    - the conditions go to SQLite, which looks them up in the store's indexes rather than reading every record
+    - variants are widened over the persisted NameAggregates and PhoneticIndex of the store (see refresh_aggregates)
+    - names are compared with SQLite's NOCASE, which only folds the case of ASCII letters
+    '''
+    conditions, params = [], []
+    if surname is not None:
+        surnames = [surname] if isinstance(surname, str) else list(surname)
+        conditions.append(f"surname COLLATE NOCASE IN ({', '.join('?' * len(surnames))})")
+        params += surnames
+    if name is not None:
+        names = [name] if isinstance(name, str) else list(name)
+        if phonetic is not None:
+            from phonetic_index import PhoneticIndex
+            phonetic_index = PhoneticIndex.from_store(store, exclude_middle_names=not full_names)
+            names = [variant for n in names for variant in phonetic_index.lookup(n, phonetic)]
+        elif variants:
+            from similarity_cache import SimilarityCache
+            vocabulary = list(NameAggregates.from_store(store, exclude_middle_names=not full_names).totals())
+            similarity = SimilarityCache()
+            names = [variant for n in names for variant in similarity.scores_above(n, vocabulary, threshold)]
+        if not names:
+            return []
+        conditions.append(f"{'given_names' if full_names else 'first_name'} COLLATE NOCASE IN ({', '.join('?' * len(names))})")
+        params += names
+    if born is not None:
+        start, end = born
+        conditions.append("birth_year BETWEEN ? AND ?" if start is not None and end is not None else
+                          "birth_year >= ?" if start is not None else "birth_year <= ?" if end is not None else "birth_year IS NOT NULL")
+        params += [year for year in (start, end) if year is not None]
+    return store.records(" AND ".join(conditions), tuple(params))
@@ -0,0 +1,272 @@
+'''
+Single-pass parsing of the surname index pages into person records, and a SQLite store for them
+
+Each i{n}.htm page is a <dl> where every <dt> is a surname and the <dd> after it lists the people with that surname, one per line:
+    <dt>Smith</dt>
+    <dd><a href="...">Mary Lucy</a> b. c 1830, d. 1901<br/><a href="...">John</a> b. 12 Mar 1852<br/>...</dd>
+parse_index_page walks that tree once and turns every line into a PersonRecord, rather than splitting the <dd> markup on <br/>
+and building a new BeautifulSoup for every fragment.
+
+RecordStore keeps the records in SQLite so the counts and year breakdowns become queries over already parsed data:
+    store = RecordStore("records.sqlite")
+    store.firstname_counts(exclude_middle_names=True)  ==> same shape as get_firstnames
+    store.firstnames_by_year(format_circa=True)        ==> same shape as get_firstnames_with_birthyear
+'''
+from typing import List, NamedTuple
+import birth_dates
+import re
+import sqlite3
+import time
+
+BIRTH_PATTERN = re.compile(r'\bb\.\s*([^,]*)')
+
+class PersonRecord(NamedTuple):
+    surname: str
+    given_names: str
+    birth_raw: str      # birth as written on the page, i.e. 'c 1830' or '12 Mar 1852', None if no birth is given
+    birth_year: int     # year of birth as a number, None if it couldn't be worked out
+    circa: bool         # True when the birth year is only approximate
+    source_page: int
+
+    @property
+    def first_name(self):
+        return self.given_names.split(" ")[0]
+
+def normalise_birth_year(birth_raw: str):
+    '''
+    Returns (year, circa) for a raw birth string, i.e. 'c 1830' ==> (1830, True), '12 Mar 1852' ==> (1852, False)
+    - the last four digit number in the string is taken as the year, None if there isn't one
+    - each distinct string is only parsed once, see birth_dates.py for the full date with its precision and range
+    '''
+    if birth_raw is None:
+        return None, False
+    date = birth_dates.normaliser.normalise(birth_raw)
+    return date.year, date.circa
+
+def make_record(surname: str, link_text: List[str], text: List[str], source_page: int):
+    '''
+    Builds a PersonRecord from the pieces of text making up one line of a <dd>
+    = link_text: the pieces of text inside the line's first <a> tag, which hold the given names; any later links on the line
+        (i.e. to a spouse) are only part of text
+    = text: every piece of text on the line, including the link text
+    '''
+    entry = " ".join("".join(text).split())
+    if not entry:
+        return None
+    birth = BIRTH_PATTERN.search(entry)
+    birth_raw = birth.group(1).strip() if birth else None
+    if link_text:
+        given_names = " ".join("".join(link_text).split())
+    else:
+        given_names = entry[:birth.start()].strip() if birth else entry
+    birth_year, circa = normalise_birth_year(birth_raw)
+    return PersonRecord(surname, given_names, birth_raw, birth_year, circa, source_page)
+
+def enclosing_link(node: 'NavigableString', container: 'Tag'):
+    '''
+    Returns the <a> tag node is inside of, None if it isn't in one
+    '''
+    for parent in node.parents:
+        if parent is container:
+            return None
+        if parent.name == 'a':
+            return parent
+    return None
+
+def soup_entries(page: 'BeautifulSoup'):
+    '''
+    Walks a parsed index page once, yielding (surname, link_text, text) for every line of every <dd>
+    - this is the shape every parser backend produces (see parser_backends.py), which make_record turns into a PersonRecord
+    '''
+    from bs4 import Comment, NavigableString, Tag    # only needed once there is a page to parse, keeps importing this module cheap
+    for dl in page.find_all('dl'):
+        surname = None
+        for child in dl.children:
+            if not isinstance(child, Tag):
+                continue
+            if child.name == 'dt':
+                surname = " ".join(child.get_text().split())
+            elif child.name == 'dd':
+                link_text, text, first_link = [], [], None
+                for node in child.descendants:
+                    if isinstance(node, Tag):
+                        if node.name == 'br':
+                            yield surname, link_text, text
+                            link_text, text, first_link = [], [], None
+                    elif isinstance(node, NavigableString) and not isinstance(node, Comment):
+                        text.append(node)
+                        link = enclosing_link(node, child)
+                        if link is not None and (first_link is None or link is first_link):
+                            first_link = link
+                            link_text.append(node)
+                yield surname, link_text, text
+
+def parse_index_page(page: 'BeautifulSoup', source_page: int = None):
+    '''
+    Returns a list of PersonRecord for every person listed on an index page, in the order they appear
+    = page: parsed index page, i.e. the output of get_surname_index_page
+    = source_page: the index of the page (the n in i{n}.htm), stored on every record
+    '''
+    records = []
+    for surname, link_text, text in soup_entries(page):
+        record = make_record(surname, link_text, text, source_page)
+        if record is not None:
+            records.append(record)
+    return records
+
+class RecordStore:
+    '''
+    SQLite backed store of PersonRecords, one row per person, indexed on first name, surname and birth year, and case-insensitively
+    on first name, given names and surname for query_store (see record_index.py)
+    - name_year_counts holds the counts behind NameAggregates (see aggregates.py) and phonetic_codes the PhoneticIndex of the names
+      (see phonetic_index.py), both emptied whenever records change
+    = path: database file, ':memory:' keeps it in memory only
+    '''
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS persons (
+                surname TEXT,
+                given_names TEXT NOT NULL,
+                first_name TEXT NOT NULL,
+                birth_raw TEXT,
+                birth_year INTEGER,
+                circa INTEGER NOT NULL,
+                source_page INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS persons_first_name ON persons (first_name);
+            CREATE INDEX IF NOT EXISTS persons_surname ON persons (surname);
+            CREATE INDEX IF NOT EXISTS persons_birth_year ON persons (birth_year);
+            CREATE INDEX IF NOT EXISTS persons_source_page ON persons (source_page);
+            CREATE INDEX IF NOT EXISTS persons_first_name_nocase ON persons (first_name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS persons_given_names_nocase ON persons (given_names COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS persons_surname_nocase ON persons (surname COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS name_year_counts (
+                full_names INTEGER NOT NULL,
+                birth_year INTEGER,
+                name TEXT NOT NULL,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS phonetic_codes (
+                full_names INTEGER NOT NULL,
+                encoder TEXT NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                count INTEGER NOT NULL
+            );
+        ''')
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM persons").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def add_records(self, records: List[PersonRecord]):
+        with self.connection:
+            self.insert_records(records)
+            self.clear_derived()
+
+    def insert_records(self, records: List[PersonRecord]):
+        '''
+        Inserts records without committing, for add_records and replace_page to do inside their own transaction
+        '''
+        self.connection.executemany("INSERT INTO persons VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((r.surname, r.given_names, r.first_name, r.birth_raw, r.birth_year, int(r.circa), r.source_page) for r in records))
+
+    def replace_page(self, source_page: int, records: List[PersonRecord]):
+        '''
+        Swaps out every record from one page for a freshly parsed set, i.e. after the page has been re-scraped
+        '''
+        with self.connection:   # one transaction, so the page is never left half replaced
+            self.connection.execute("DELETE FROM persons WHERE source_page = ?", (source_page,))
+            self.insert_records(records)
+            self.clear_derived()
+
+    def clear_derived(self):
+        '''
+        Empties the tables worked out from the records, for when the records change
+        '''
+        self.connection.execute("DELETE FROM name_year_counts")
+        self.connection.execute("DELETE FROM phonetic_codes")
+
+    def pages(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT source_page FROM persons ORDER BY source_page")]
+
+    def iter_records(self, where: str = "", params: tuple = ()):
+        '''
+        Yields the stored records one at a time in the order they were scraped, optionally filtered by an SQL where clause
+        '''
+        query = "SELECT surname, given_names, birth_raw, birth_year, circa, source_page FROM persons"
+        if where:
+            query += f" WHERE {where}"
+        for s, g, b, y, c, p in self.connection.execute(query + " ORDER BY rowid", params):
+            yield PersonRecord(s, g, b, y, bool(c), p)
+
+    def records(self, where: str = "", params: tuple = ()):
+        '''
+        Returns the stored records in the order they were scraped, optionally filtered by an SQL where clause
+        EXAMPLE:
+            store.records("surname = ? AND birth_year BETWEEN ? AND ?", ('Smith', 1820, 1840))
+        '''
+        return list(self.iter_records(where, params))
+
+    def firstname_counts(self, exclude_middle_names: bool = False):
+        '''
+        Returns dictionary of firstnames and their occurrences, the same shape as get_firstnames
+        '''
+        column = "first_name" if exclude_middle_names else "given_names"
+        rows = self.connection.execute(f"SELECT {column}, COUNT(*) FROM persons GROUP BY {column} ORDER BY MIN(rowid)")
+        return dict(rows)
+
+    def firstnames_by_year(self, exclude_middle_names: bool = False, format_circa: bool = False):
+        '''
+        Returns a dictionary of birthyear mapped to a list of names for that respective year, the same shape as get_firstnames_with_birthyear
+        - format_circa=False keys the dictionary by the birth as written on the page, True keys it by the year as an integer
+        '''
+        column = "first_name" if exclude_middle_names else "given_names"
+        key = "birth_year" if format_circa else "birth_raw"
+        dict_to_insert_into = {}
+        for year, name in self.connection.execute(f"SELECT {key}, {column} FROM persons WHERE {key} IS NOT NULL ORDER BY rowid"):
+            if year in dict_to_insert_into:
+                dict_to_insert_into[year].append(name)
+            else:
+                dict_to_insert_into[year] = [name]
+        return dict_to_insert_into
+
+def build_record_store(path: str = "records.sqlite", backend: str = "html.parser", mode: str = "serial", workers: int = None, pages=range(1, 80),
+                       **crawler_options):
+    '''
+    Scrapes every index page once and stores the parsed records at path, along with the name counts the charts are drawn from and
+    the phonetic index of the names
+    = backend: which parser backend turns the page bytes into records, see parser_backends.py
+    = mode: how pages are parsed while the next ones download, "serial", "thread" or "process" (see pipeline.py)
+    = workers: number of parser threads or processes, defaults to the number of cores
+    = pages: which i{n}.htm pages to scrape, the records of any others already stored are kept
+    - crawler_options are passed on to ParsingPipeline and AsyncIndexCrawler, i.e. cache=PageCache("page_cache", offline=True), metrics=RunMetrics()
+    '''
+    from pipeline import ParsingPipeline
+    store = RecordStore(path)
+    pipeline = ParsingPipeline(mode=mode, workers=workers, backend=backend, **crawler_options)
+    result = pipeline.run(pages)
+    for index, error in pipeline.failed_pages:
+        print(f"Page i{index}.htm failed: {error}")
+    start = time.perf_counter()
+    for index, records in result.records.items():
+        store.replace_page(index, records)
+    refresh_aggregates(store)
+    if pipeline.metrics is not None:
+        pipeline.metrics.add_time('store', time.perf_counter() - start)
+    return store
+
+def refresh_aggregates(store: RecordStore):
+    '''
+    Works out and persists the name x year counts and the phonetic index of the stored records, for first names and for all
+    given names, so queries after a scrape only load them
+    '''
+    from aggregates import NameAggregates
+    from phonetic_index import PhoneticIndex
+    for exclude_middle_names in (True, False):
+        NameAggregates.from_store(store, exclude_middle_names)
+        PhoneticIndex.from_store(store, exclude_middle_names)
@@ -0,0 +1,254 @@
+'''
+Fault tolerance for fetching pages from the site: timeouts, retries with backoff, response validation, a circuit breaker and a
+dead-letter list of the pages which still failed
+
+A hung connection, a 503 or an error page served with a 200 used to stall a thread or end up in page.find_all('dl')[0]. Here:
+- every request has a connect and a read timeout, so nothing waits forever
+- connection errors, timeouts, 429 and 5xx responses and invalid pages are retried with exponential backoff, waiting as long as
+  the site asks in a Retry-After header if it gives one; anything else (i.e. a 404) fails straight away
+- validate_response rejects empty bodies, and index pages (i{n}.htm) without the <dl> every real one has
+- CircuitBreaker stops requests for reset_timeout seconds once failure_threshold requests in a row have failed, so a struggling
+  site isn't hammered with retries, then lets one request through to find out whether it has recovered
+- pages which fail every attempt go into DeadLetters, saved as JSON, to be retried on their own later
+ResilientSession wraps a requests.Session with all of that and can be used anywhere a session is, including PageCache.get;
+AsyncIndexCrawler uses retry_delay, validate_content and CircuitBreaker directly on its own queue of retries.
+EXAMPLE:
+    session = ResilientSession(breaker=CircuitBreaker(), dead_letters=DeadLetters("dead_letters.json"))
+    session.get("https://www.wiltshirefamilyhistory.org/i3.htm").content
+'''
+from email.utils import parsedate_to_datetime
+import json
+import os
+import re
+import requests
+import threading
+import time
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+INDEX_PAGE_URL = re.compile(r'/i\d+\.htm$')
+
+class InvalidPageException(requests.RequestException):
+    '''
+    Raised for a successful response whose body can't be the page asked for, i.e. an empty body or an error page
+    '''
+
+class CircuitOpenException(requests.RequestException):
+    def __init__(self, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"Too many failed requests in a row, not trying again for {retry_in:.1f}s")
+
+def parse_retry_after(value: str):
+    '''
+    Returns the seconds to wait from a Retry-After header, given either as seconds or as an HTTP date, None if there isn't one
+    '''
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, InvalidPageException, CircuitOpenException))
+
+def is_site_failure(error: Exception):
+    '''
+    Returns True if error says the site itself is struggling, i.e. a connection error, a timeout or a 5xx response; anything
+    else (a 404, an invalid page) still means the site answered
+    '''
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+def retry_delay(error: Exception, attempt: int, backoff: float = 0.5, max_backoff: float = 30.0):
+    '''
+    Returns how long to wait before attempt + 1 after error, or None if the error isn't worth retrying
+    - the Retry-After of a 429 or 503 wins over the backoff, as does the time left before an open circuit lets requests through,
+      both capped at max_backoff
+    '''
+    if not is_retryable(error):
+        return None
+    if isinstance(error, CircuitOpenException):
+        return min(error.retry_in, max_backoff)
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, max_backoff)
+    return min(backoff * 2 ** (attempt - 1), max_backoff)
+
+def validate_content(url: str, content: bytes):
+    '''
+    Raises InvalidPageException if content can't be the page at url, returns content otherwise
+    '''
+    if not content:
+        raise InvalidPageException(f"Empty response from {url}")
+    if INDEX_PAGE_URL.search(url.split('?')[0]) and b'<dl' not in content.lower():
+        raise InvalidPageException(f"{url} has no <dl>, so isn't an index page")
+    return content
+
+def validate_response(url: str, response: requests.Response):
+    '''
+    Raises for a non-2xx response (a 304 for a conditional request is fine) or an invalid page, returns the response otherwise
+    '''
+    if response.status_code == 304:
+        return response
+    response.raise_for_status()
+    validate_content(url, response.content)
+    return response
+
+class CircuitBreaker:
+    '''
+    = failure_threshold: failed requests in a row which open the circuit
+    = reset_timeout: seconds the circuit stays open before a single trial request is let through
+    Closed lets everything through, open nothing, half-open the one trial request: its success closes the circuit again and its
+    failure opens it for another reset_timeout. A trial which never reports back (i.e. was cancelled) is given up on after
+    reset_timeout, and another one let through.
+    Every request let through should end in record_outcome, whatever became of it, so a trial can't leave the circuit half-open.
+    '''
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        '''
+        Raises CircuitOpenException if no request should be made now
+        '''
+        with self.lock:
+            if self.state == "closed":
+                return
+            retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if retry_in <= 0:
+                self.state = "half_open"    # this request is the trial
+                self.opened_at = time.monotonic()
+                return
+            raise CircuitOpenException(retry_in)    # open, or waiting on the trial
+
+    def record_outcome(self, error: Exception = None):
+        '''
+        Records how a request let through by before_request went: error is None if the site answered, otherwise whatever the
+        request raised; only is_site_failure errors count as failures, anything else means the site answered
+        '''
+        if error is not None and is_site_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+class DeadLetters:
+    '''
+    Pages which failed every attempt, with the last error, kept until they are fetched successfully
+    = path: JSON file the list is loaded from and saved to on every change, None keeps it in memory only
+    '''
+    def __init__(self, path: str = None):
+        self.path = path
+        self.entries = {}   # page (index or URL) ==> {'error': ..., 'failures': ..., 'failed_at': ...}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = {int(page) if page.isdigit() else page: entry for page, entry in json.load(f).items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, page, error: Exception):
+        with self.lock:
+            entry = self.entries.setdefault(page, {'failures': 0})
+            entry.update(error=repr(error), failures=entry['failures'] + 1, failed_at=time.time())
+            self.save()
+
+    def remove(self, page):
+        with self.lock:
+            if self.entries.pop(page, None) is not None:
+                self.save()
+
+    def pages(self):
+        return sorted(self.entries, key=lambda page: (0, page, "") if isinstance(page, int) else (1, 0, page))
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({str(page): entry for page, entry in self.entries.items()}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+class ResilientSession:
+    '''
+    Drop-in for requests.Session.get with timeouts, retries, validation, circuit breaking and dead letters
+    = session: the requests.Session to send requests with, one is created if None
+    = timeout: (connect, read) seconds, used unless a request passes its own
+    = max_attempts: how many times a request is tried before it is dead-lettered and the last error raised
+    = backoff, max_backoff: delay before the first retry in seconds, doubled for every further attempt up to max_backoff
+    = breaker: optional CircuitBreaker, shared by everything using the session
+    = dead_letters: optional DeadLetters the URLs which failed every attempt are added to
+    '''
+    def __init__(self, session: requests.Session = None, timeout=(5.0, 30.0), max_attempts: int = 4, backoff: float = 0.5,
+                 max_backoff: float = 30.0, breaker: CircuitBreaker = None, dead_letters: DeadLetters = None, validate=validate_response):
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker
+        self.dead_letters = dead_letters
+        self.validate = validate
+        self.retries = 0
+
+    def mount(self, prefix: str, adapter):
+        self.session.mount(prefix, adapter)
+
+    def get(self, url: str, **kwargs):
+        '''
+        - a request turned away by an open circuit is never sent, so waiting for the circuit doesn't use up an attempt
+        '''
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 1
+        while True:
+            try:
+                if self.breaker is not None:
+                    self.breaker.before_request()
+                try:
+                    response = self.validate(url, self.session.get(url, **kwargs))
+                except Exception as e:
+                    if self.breaker is not None:
+                        self.breaker.record_outcome(e)
+                    raise
+                if self.breaker is not None:
+                    self.breaker.record_outcome()
+                if self.dead_letters is not None:
+                    self.dead_letters.remove(url)
+                return response
+            except requests.RequestException as e:
+                rejected = isinstance(e, CircuitOpenException)
+                delay = retry_delay(e, attempt, self.backoff, self.max_backoff) if rejected or attempt < self.max_attempts else None
+                if delay is None:
+                    if self.dead_letters is not None:
+                        self.dead_letters.add(url, e)
+                    raise
+                if not rejected:
+                    self.retries += 1
+                    attempt += 1
+                time.sleep(delay)
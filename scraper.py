@@ -0,0 +1,284 @@
+'''
+https://www.wiltshirefamilyhistory.org
+https://www.wiltshirefamilyhistory.org/master_index.htm
+
+Library functions for scraping the surname index pages (i1.htm - i79.htm) of the genealogy site and extracting first names and surnames from them.
+Importing this module does no scraping and no heavy imports: the requests session and the page cache are only created the first time a
+page is fetched, and bs4 only when a page is parsed. See cli.py for the command line entry point.
+'''
+from aggregation import merge_into
+from page_cache import PageCache
+from page_scheduler import PageScheduler
+from records import parse_index_page, soup_entries
+from typing import List
+import atexit
+import os
+import threading
+import time
+
+BASE_URL = "https://www.wiltshirefamilyhistory.org"
+PAGE_SIZES_PATH = os.path.join("page_cache", "page_sizes.json")   # next to the shared page cache, see get_page_cache
+
+session = None
+page_cache = None
+
+def get_session():
+    '''
+    Returns the shared session, creating it on first use with a connection pool
+    - requests time out, are retried with backoff and validated, and pages failing every attempt are listed in session.dead_letters (see resilient_fetch.py)
+    '''
+    global session
+    if session is None:
+        import requests
+        from resilient_fetch import CircuitBreaker, DeadLetters, ResilientSession
+        session = ResilientSession(requests.Session(), breaker=CircuitBreaker(), dead_letters=DeadLetters()) # Create a session object
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)   # Configure connection pool size
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+def get_page_cache(directory: str = "page_cache", offline: bool = False):
+    '''
+    Returns the shared page cache, creating it on first use; pages are kept on disk and only revalidated, offline=True never touches the network
+    '''
+    global page_cache
+    if page_cache is None or page_cache.directory != directory or page_cache.offline != offline:
+        if page_cache is not None:
+            page_cache.flush()
+        page_cache = PageCache(directory, offline=offline)
+        atexit.register(page_cache.flush)   # single pages fetched outside of the threads
+    return page_cache
+
+def get_surname_index_page_content(index: int, cache: PageCache = None, use_cache: bool = True):
+    '''
+    Returns the raw bytes of the i{index}.htm page, raising PageNumberNotInRangeException for an index the site doesn't have
+    = cache: PageCache to fetch through, by default the shared one from get_page_cache
+    = use_cache: False always downloads the page without caching it
+    '''
+    return fetch_surname_index_page(index, cache, use_cache)[0]
+
+def fetch_surname_index_page(index: int, cache: PageCache = None, use_cache: bool = True):
+    '''
+    get_surname_index_page_content, returning (content, source) where source is where the page came from as for PageCache.fetch
+    '''
+    if not 0 < index < 80:
+        raise PageNumberNotInRangeException(index)
+    URL = f"{BASE_URL}/i{index}.htm"
+    if use_cache:
+        return (cache or get_page_cache()).fetch(get_session(), URL)
+    return get_session().get(URL).content, 'miss' # use session.get to make use of connection pooling, otherwise use page = requests.get(URL)
+
+def get_surname_index_page(index: int, cache: PageCache = None, html_parser: str = "html.parser", use_cache: bool = True):
+    '''
+    Returns the parsed i{index}.htm page
+    = cache: PageCache to fetch through, by default the shared one from get_page_cache
+    = use_cache: False always downloads the page without caching it
+    '''
+    from bs4 import BeautifulSoup
+    content = get_surname_index_page_content(index, cache, use_cache)
+    return BeautifulSoup(content, html_parser) # "lxml" builds the same tree considerably faster if lxml is installed
+
+def get_firstnames(page: 'BeautifulSoup', count_members: bool = True, exclude_middle_names: bool = False, dict_to_insert_into: dict = None):
+    '''
+    Returns dictionary of firstnames and their occurrences
+    = page: page to search for names
+    = count_members: if True, counts how many occurrences of a name else returns a set of the unique first names used
+    = exclude_middle_names: if True, will only take the first name of a person, i.e. Mary Lucy Smith ==> Mary, else takes all first names, i.e. Mary Lucy Smith ==> Mary Lucy
+    = dict_to_insert_into: by default, is None which creates and returns a new dictionary, else will add to an existing one
+    - only the first link of each line is a person, later ones (i.e. to a spouse) are left out as they are from the records (see records.py)
+    '''
+    names = [" ".join("".join(link_text).split()) for surname, link_text, text in soup_entries(page) if link_text]
+    if exclude_middle_names:
+        names = [name.split(" ")[0] for name in names]
+    if count_members:
+        if dict_to_insert_into == None:
+            dict_to_insert_into = {} # Count instances of each name using a dictionary
+        for name in names:
+            if name in dict_to_insert_into:
+                dict_to_insert_into[name] += 1
+            else:
+                dict_to_insert_into[name] = 1
+        return dict_to_insert_into
+    else:
+        return set(names)
+
+def get_firstnames_with_birthyear(page: 'BeautifulSoup', exclude_middle_names: bool = False, format_circa: bool = False, dict_to_insert_into: dict = None):
+    '''
+    Returns a dictionary of birthyear mapped to a list of names for that respective year
+    = page: page to search for names
+    = exclude_middle_names: if True, will only take the first name of a person, i.e. Mary Lucy Smith ==> Mary, else takes all first names, i.e. Mary Lucy Smith ==> Mary Lucy
+    = format_circa: some birth years are rough and not known exactly; for example, c. 1860 could be from 1857-1863 ==> a rough range of birth years around 1860; 
+        format_circa will store this in the dictionary as a key unchanged when set to False or will simply display the rough birth year as a number for the key if True
+        EXAMPLE WHEN FALSE ==> {'c 1830': ['Mary', 'Ann'], 'c 1796': ['Mary Ann', 'Harriet'] }
+        EXAMPLE WHEN TRUE ==> {1830: ['Mary', 'Ann'], 1796: ['Mary Ann', 'Harriet'] }
+    = dict_to_insert_into: by default, is None which creates and returns a new dictionary, else will add to an existing one
+    Example of the shape of the dictionary would be akin to 
+    {
+        1860 : ['Mary', 'Edward'],
+        1899 : ['Mary', 'Stephen']
+    }
+    '''
+    if dict_to_insert_into == None:
+        dict_to_insert_into = {} # map birth years to a list of names registered in that year
+    for record in parse_index_page(page): # single pass over the page, see records.py
+        if record.birth_raw is None:
+            continue
+        name = record.first_name if exclude_middle_names else record.given_names
+        birth_year = record.birth_raw
+        if format_circa:
+            if record.birth_year is None: # no year given, i.e. 'b. abt', so it can't be placed
+                continue
+            birth_year = record.birth_year
+        if birth_year in dict_to_insert_into:
+            dict_to_insert_into[birth_year].append(name)
+        else:
+            dict_to_insert_into[birth_year] = [name]
+    return dict_to_insert_into
+
+def get_surnames(page: 'BeautifulSoup', count_members: bool = True, dict_to_insert_into: dict = None):
+    '''
+    Returns dictionary of surnames and the number of people listed under them
+    = page: page to search for names
+    = count_members: if True, counts how many people have a surname else returns a set of the unique surnames on the page
+    = dict_to_insert_into: by default, is None which creates and returns a new dictionary, else will add to an existing one
+    - see record_index.py for searching the people by surname, first name and birth year together
+    '''
+    surnames = [record.surname for record in parse_index_page(page) if record.surname is not None]
+    if not count_members:
+        return set(surnames)
+    if dict_to_insert_into == None:
+        dict_to_insert_into = {}
+    for surname in surnames:
+        dict_to_insert_into[surname] = dict_to_insert_into.get(surname, 0) + 1
+    return dict_to_insert_into
+
+def find_variations_in_name(name: str, all_names: List[str], distance_threshold: float = 0.75, store_as_dict: bool = False, similarity: 'SimilarityCache' = None):
+    '''
+    Provided a list of names, this function will find all the variations in the name using a distance metric (Jaro-Winkler)
+    and either return a list of variations of the name (i.e. names with a distance above the threshold) or a dictionary where
+    the keys are the names and the values are the distances.
+
+    If you want to apply operations to the names before finding variations, such as stemming, you can apply that to the list of names
+    separately, then turn the list into a set and back into a list.
+
+    Inputs:
+    - name (str) ==> the name you want to find variations for
+    - all_names (List[str]) ==> the list of names to search for variations, or an EncodedNames of them
+    - distance_threshold (float) ==> for a name to be identified as a variation, its distance to the input name must be above the threshold specified
+    - store_as_dict (bool) ==> as described above, either return list of variations or a dictionary of the variations mapped to their respective distances
+        (see name_search.py to rank the closest names instead)
+    - similarity (SimilarityCache) ==> optional cache of scores to look distances up in, for repeated queries or thresholds (see similarity_cache.py)
+    '''
+    from namesnlp import EncodedNames, jaro_winkler_batch
+    collection = {}
+    if similarity is not None:
+        distances = similarity.scores_of(name, all_names)
+    else:
+        distances = jaro_winkler_batch(name, all_names) # scores every name in one call, pass an EncodedNames to reuse the encoding between searches
+    names = all_names.names if isinstance(all_names, EncodedNames) else all_names
+    for x, distance in zip(names, distances):
+        if(distance > distance_threshold):
+            collection[x] = distance
+    if(store_as_dict):
+        return collection
+    else:
+        return collection.keys()
+
+def instantiate_threads(thread_count: int = 4, total_pages: int = 79, target_function = get_firstnames, *args_for_target, sizes_path: str = PAGE_SIZES_PATH,
+                        html_parser: str = "html.parser", metrics: 'RunMetrics' = None):
+    '''
+    Creates threads which share the pages between them as they go: each one takes the next page off a shared queue whenever it is
+    free, largest pages first, so the run ends when the work does rather than when the slowest fixed chunk does (see page_scheduler.py)
+    = target_function: the function for each thread to use
+    = thread_count: how many threads to create
+    = total_pages: number of pages on the genealogy page (79 is the current number but if this changes in future with any updates to the site, it can be updated here easily)
+    = sizes_path: file the page sizes of this run are saved to, for ordering the next one; by default in the page cache directory,
+        None keeps them in memory only
+    = html_parser: the parser BeautifulSoup builds each page with ("html.parser" or the faster "lxml"), None passes the target
+        function the raw page bytes instead, i.e. for ParserBackend.parse (see parser_backends.py)
+    = metrics: optional RunMetrics the threads record their fetch, soup, parse and merge timings and page counts in (see metrics.py)
+    - after joining the threads, threads[0].scheduler.utilisation() shows how busy each one was
+    '''
+    scheduler = PageScheduler(range(1, total_pages + 1), sizes_path)
+    return [PageWorkerThread(scheduler, target_function, *args_for_target, name=f"worker-{i}", html_parser=html_parser, metrics=metrics)
+            for i in range(0, thread_count)]
+
+class PageNumberNotInRangeException(Exception):
+    def __init__(self, index: int = None, message="The index of the page requested is not in the required range (1 - 79)"):
+        self.message = message if index is None else f"{message}: {index}"
+        super().__init__(self.message)
+
+class PageWorkerThread(threading.Thread):
+    '''
+    Scrapes pages from a shared PageScheduler until there are none left, merging the output of the target function into self.dic
+    in place, rather than copying self.dic for every page
+    = html_parser: the parser BeautifulSoup builds each page with, None passes the target function the raw page bytes instead
+    = metrics: optional RunMetrics, see instantiate_threads
+    '''
+    use_cache = True    # fetch through the shared page cache, see get_surname_index_page_content
+
+    def __init__(self, scheduler: PageScheduler, target_function, *args, name: str = None, html_parser: str = "html.parser",
+                 metrics: 'RunMetrics' = None, **kwargs):
+        super(PageWorkerThread, self).__init__(name=name)
+        self.scheduler = scheduler
+        self.html_parser = html_parser
+        self.metrics = metrics
+        self.target = target_function
+        self.args = args
+        self.kwargs = kwargs
+        self.dic = {}
+        self.failed_pages = []  # (index, error) of pages which couldn't be fetched, also in get_session().dead_letters to retry later
+        scheduler.register(self.name)
+
+    def run(self):
+        from requests import RequestException
+        if self.html_parser:
+            from bs4 import BeautifulSoup
+        try:
+            while True:
+                i = self.scheduler.next_page()
+                if i is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    content, source = fetch_surname_index_page(i, use_cache=self.use_cache)
+                except (RequestException, PageNumberNotInRangeException) as e:  # already retried or not on the site, carry on with the next page
+                    self.failed_pages.append((i, repr(e)))
+                    self.scheduler.record(self.name, i, time.perf_counter() - start)
+                    if self.metrics is not None:
+                        self.metrics.count('failed_pages')
+                    continue
+                if self.metrics is None:
+                    page = BeautifulSoup(content, self.html_parser) if self.html_parser else content
+                    merge_into(self.dic, self.target(page, *self.args, **self.kwargs), copy=False)
+                else:
+                    self.measured(start, content, source)
+                self.scheduler.record(self.name, i, time.perf_counter() - start, len(content))
+        finally:
+            self.scheduler.done(self.name)
+            if self.use_cache and page_cache is not None:
+                page_cache.flush()
+
+    def measured(self, start: float, content: bytes, source: str):
+        '''
+        Parses and merges one page the same way run does, recording each step in self.metrics
+        - a page served from the cache alone isn't a request to the site, so only counts towards pages_fetched
+        '''
+        fetched = time.perf_counter()
+        if source != 'hit':
+            self.metrics.add_time('fetch', fetched - start)
+            self.metrics.observe('fetch_latency', fetched - start)
+        self.metrics.count('pages_fetched')
+        if source == 'miss':
+            self.metrics.count('bytes_fetched', len(content))
+        if self.html_parser:
+            from bs4 import BeautifulSoup
+            with self.metrics.timer('soup'):
+                page = BeautifulSoup(content, self.html_parser)
+        else:
+            page = content
+        with self.metrics.timer('parse'):
+            output = self.target(page, *self.args, **self.kwargs)
+        with self.metrics.timer('merge'):
+            merge_into(self.dic, output, copy=False)
+        self.metrics.count('pages_parsed')
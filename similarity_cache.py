@@ -0,0 +1,94 @@
+'''
+Memoised Jaro-Winkler scores for repeated variant queries
+
+find_variations_in_name scores the query against every name from scratch each time, so asking about Mary at 0.75 and then at 0.8,
+or about Mary and then Marie, repeats most of the work. SimilarityCache keeps:
+- the features of the names it has seen (upper-case form, length, where each letter appears, see namesnlp.name_features),
+  evicting the least recently used name once there are more than max_names of them
+- the score of every (query, name) pair it has worked out, keyed on the upper-case names, evicting the least recently used
+  pair once there are more than maxsize of them
+so changing the threshold of a query only looks scores up. Scores are the same numbers as jaro_winkler_distance gives.
+EXAMPLE:
+    similarity = SimilarityCache()
+    similarity.scores_above("Mary", names, 0.75)    ==> {'Marie': 0.848, 'Maria': 0.848, 'Mary': 1.0, ...}
+    similarity.scores_above("Mary", names, 0.85)    ==> every score is a cache hit
+    similarity.stats()                              ==> {'hits': 2134, 'misses': 2134, 'hit_rate': 0.5, 'size': 2134, 'maxsize': 100000,
+                                                         'names': 1067, 'max_names': 10000}
+A SimilarityCache isn't locked, so give each thread its own.
+'''
+from collections import OrderedDict
+from namesnlp import EncodedNames, jaro_winkler_features, name_features
+
+class SimilarityCache:
+    '''
+    = maxsize: the most pair scores kept before the least recently used ones are evicted
+    = max_names: the most name features kept before the least recently used ones are evicted
+    = winkler_on, scaling_factor: as for jaro_winkler_distance
+    '''
+    def __init__(self, maxsize: int = 100_000, winkler_on: bool = True, scaling_factor: float = 0.1, max_names: int = 10_000):
+        self.maxsize = maxsize
+        self.max_names = max_names
+        self.winkler_on = winkler_on
+        self.scaling_factor = scaling_factor
+        self.features = OrderedDict()   # upper-case name ==> NameFeatures, least recently used first
+        self.scores = OrderedDict() # (upper-case query, upper-case name) ==> score, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def features_of(self, name: str):
+        key = name.upper()
+        features = self.features.get(key)
+        if features is not None:
+            self.features.move_to_end(key)
+            return features
+        features = self.features[key] = name_features(name)
+        if len(self.features) > self.max_names:
+            self.features.popitem(last=False)
+        return features
+
+    def score(self, x: str, y: str):
+        '''
+        Returns jaro_winkler_distance(x, y), from the cache if the pair has been scored before
+        '''
+        key = (x.upper(), y.upper())
+        score = self.scores.get(key)
+        if score is not None:
+            self.hits += 1
+            self.scores.move_to_end(key)
+            return score
+        self.misses += 1
+        score = jaro_winkler_features(self.features_of(x), self.features_of(y), self.winkler_on, self.scaling_factor)
+        self.scores[key] = score
+        if len(self.scores) > self.maxsize:
+            self.scores.popitem(last=False)
+        return score
+
+    def scores_of(self, name: str, all_names):
+        '''
+        Returns a list of the scores of name against every name in all_names (a list of names or an EncodedNames), in the same order
+        '''
+        names = all_names.names if isinstance(all_names, EncodedNames) else all_names
+        return [self.score(name, other) for other in names]
+
+    def scores_above(self, name: str, all_names, threshold: float = 0.0):
+        '''
+        Returns a dictionary of every name in all_names scoring above threshold against name ==> its score
+        '''
+        names = all_names.names if isinstance(all_names, EncodedNames) else all_names
+        scores = {}
+        for other in names:
+            score = self.score(name, other)
+            if score > threshold:
+                scores[other] = score
+        return scores
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.scores), 'maxsize': self.maxsize, 'names': len(self.features), 'max_names': self.max_names}
+
+    def clear(self):
+        self.scores.clear()
+        self.features.clear()
+        self.hits = 0
+        self.misses = 0
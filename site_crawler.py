@@ -0,0 +1,248 @@
+'''
+Crawler for the whole site hierarchy, starting from master_index.htm rather than the hard-coded i1.htm - i79.htm range
+
+Pages are discovered instead of being listed up front: every page fetched has its links pulled out, normalised and checked
+against a set of the URLs already seen, and anything new within the site is added to the frontier (a shared asyncio queue which
+the workers pull from, as in async_scraper.py). On top of that:
+- max_depth limits how many links away from the start page the crawl goes, max_pages how many pages it fetches in total
+- politeness comes from AsyncIndexCrawler's per-host rate limiter (requests_per_second), and pages go through the page cache
+- the URLs seen, visited and failed for good are saved to a checkpoint file as the crawl goes, so an interrupted crawl carries on
+  from where it was without fetching the pages it gave up on (404s, or pages out of attempts) again unless retry_failed is set
+- links to the real site's host are rewritten onto base_url, so a local mirror (see fixture_server.py) is crawled the same way
+
+EXAMPLE:
+    crawler = SiteCrawler(base_url="http://127.0.0.1:8000", max_depth=2, checkpoint_path="crawl_checkpoint.json")
+    pages = crawler.run(lambda content, url: len(content))    ==> {'http://127.0.0.1:8000/master_index.htm': 5120, ...}
+    crawler.index_pages()                                     ==> [1, 2, ..., 79]
+'''
+from async_scraper import BASE_URL, AsyncIndexCrawler
+from html.parser import HTMLParser
+from page_cache import PageNotCachedException
+from urllib.parse import urldefrag, urljoin, urlsplit, urlunsplit
+import asyncio
+import json
+import os
+import posixpath
+import re
+import requests
+
+START_PAGE = "master_index.htm"
+INDEX_PAGE_PATTERN = re.compile(r'/i(\d+)\.htm$', re.IGNORECASE)   # links are written as both i12.htm and I12.HTM
+PAGE_EXTENSIONS = ('.htm', '.html')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+class LinkExtractor(HTMLParser):
+    '''
+    Collects the targets of every <a href>, <frame src> and <iframe src> on a page, in the order they appear
+    '''
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attribute = 'href' if tag == 'a' else 'src' if tag in ('frame', 'iframe') else None
+        if attribute is None:
+            return
+        for name, value in attrs:
+            if name == attribute and value:
+                self.links.append(value.strip())
+
+def extract_links(content: bytes):
+    '''
+    Returns the (unnormalised) link targets on a page
+    '''
+    extractor = LinkExtractor()
+    extractor.feed(content.decode('utf-8', errors='replace'))
+    extractor.close()
+    return extractor.links
+
+def normalise_url(url: str, base: str = None):
+    '''
+    Returns url in a canonical form so the same page is only ever seen once
+    - resolved against base, fragment dropped, scheme and host lowercased, default port dropped, '.' and '..' resolved
+    - index pages are lowercased too, since the site links to them as both i12.htm and I12.HTM; other paths keep their case
+    EXAMPLE:
+        normalise_url("../I12.HTM#smith", "HTTPS://www.WiltshireFamilyHistory.org:443/a/b.htm") ==> 'https://www.wiltshirefamilyhistory.org/i12.htm'
+    '''
+    if base is not None:
+        url = urljoin(base, url)
+    url = urldefrag(url)[0]
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path else '/'
+    if parts.path.endswith('/') and path != '/':
+        path += '/'
+    index_page = INDEX_PAGE_PATTERN.search(path)
+    if index_page:
+        path = path[:index_page.start()] + index_page.group(0).lower()
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+class SiteCrawler(AsyncIndexCrawler):
+    '''
+    Crawls every page of the site reachable from start_page, see above
+    = start_page: page the crawl starts from, relative to base_url
+    = max_depth: how many links away from the start page to follow, 0 only fetches the start page, None has no limit
+    = max_pages: stop adding to the frontier once this many pages have been seen, None has no limit
+    = follow: optional function of a normalised URL, returning False for pages within the site which shouldn't be crawled
+    = aliases: other hosts whose links belong to this site, rewritten onto base_url (by default the real site's host)
+    = checkpoint_path: JSON file the crawl state is saved to every checkpoint_every pages and at the end, and resumed from if it exists
+        (links are not followed again from pages already visited, so resume with the same max_depth and follow)
+    = retry_failed: when resuming, fetch the pages the checkpoint gave up on again rather than leaving them out
+    - everything else is passed on to AsyncIndexCrawler, i.e. concurrency=8, requests_per_second=2, cache=PageCache("page_cache")
+    - failed_pages holds (url, error) for pages which still failed after max_attempts in this run, failed every page given up on
+    '''
+    def __init__(self, start_page: str = START_PAGE, max_depth: int = None, max_pages: int = None, follow=None,
+                 aliases=(urlsplit(BASE_URL).netloc,), checkpoint_path: str = None, checkpoint_every: int = 50, retry_failed: bool = False,
+                 **crawler_options):
+        crawler_options.setdefault('html_parser', None)
+        super().__init__(**crawler_options)
+        self.start_url = normalise_url(start_page, self.base_url + '/')
+        site = urlsplit(self.start_url)
+        self.scheme, self.host = site.scheme, site.netloc
+        self.aliases = {host.lower() for host in aliases} - {self.host}
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.follow = follow
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.retry_failed = retry_failed
+        self.depths = {}        # every URL seen ==> its depth, the dedup set
+        self.visited = set()    # URLs fetched successfully
+        self.failed = {}        # URLs given up on ==> the last error, left out of the frontier
+        self.since_checkpoint = 0
+
+    def in_site(self, url: str):
+        '''
+        Returns url normalised and moved onto base_url if it is a page within the site, otherwise None
+        '''
+        parts = urlsplit(url)
+        if parts.scheme not in DEFAULT_PORTS:
+            return None     # mailto:, javascript: and so on
+        if parts.netloc in self.aliases:
+            parts = parts._replace(scheme=self.scheme, netloc=self.host)
+        elif parts.netloc != self.host:
+            return None
+        if not (parts.path.endswith('/') or parts.path.lower().endswith(PAGE_EXTENSIONS)):
+            return None     # images, pdfs and other files which aren't pages
+        return urlunsplit(parts)
+
+    def discover(self, queue: asyncio.Queue, link: str, base: str, depth: int):
+        url = self.in_site(normalise_url(link, base))
+        if url is None or url in self.depths:
+            return
+        if self.max_pages is not None and len(self.depths) >= self.max_pages:
+            return
+        if self.follow is not None and not self.follow(url):
+            return
+        self.depths[url] = depth
+        queue.put_nowait((url, depth, 1))
+
+    def load_checkpoint(self):
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state['start_url'] != self.start_url:
+            return  # a crawl of somewhere else, so start again from scratch
+        self.depths = state['depths']
+        self.visited = set(state['visited'])
+        self.failed = {} if self.retry_failed else state.get('failed', {})
+
+    def save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'start_url': self.start_url, 'depths': self.depths, 'visited': sorted(self.visited), 'failed': self.failed}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self.since_checkpoint = 0
+
+    def frontier(self):
+        '''
+        Returns (url, depth) for every page seen but neither fetched nor given up on yet, shallowest first
+        '''
+        return sorted(((url, depth) for url, depth in self.depths.items() if url not in self.visited and url not in self.failed),
+                      key=lambda item: item[1])
+
+    def record_failure(self, page, error: Exception):
+        super().record_failure(page, error)
+        self.failed[page] = repr(error)
+
+    def record_success(self, page):
+        super().record_success(page)
+        self.failed.pop(page, None)
+
+    async def site_worker(self, queue: asyncio.Queue, results: dict, target_function, args_for_target: tuple):
+        while True:
+            url, depth, attempt = await queue.get()
+            retrying = False
+            try:
+                content = await self.fetch_url(url)
+                if self.max_depth is None or depth < self.max_depth:
+                    for link in extract_links(content):
+                        self.discover(queue, link, url, depth + 1)
+                if target_function is not None:
+                    results[url] = target_function(content, url, *args_for_target)
+                self.visited.add(url)
+                self.record_success(url)
+                self.since_checkpoint += 1
+                if self.checkpoint_path and self.since_checkpoint >= self.checkpoint_every:
+                    self.save_checkpoint()
+            except PageNotCachedException as e:
+                self.record_failure(url, e)    # retrying won't put it in the cache
+            except Exception as e:  # whatever the fetch or the target function raised, the worker carries on
+                retrying = self.retry_later(queue, (url, depth, self.next_attempt(e, attempt)), url, e, attempt)
+            finally:
+                if not retrying:
+                    queue.task_done()
+
+    async def crawl_site(self, target_function=None, *args_for_target):
+        '''
+        Coroutine which returns a dictionary of URL ==> output of target_function(content, url, *args_for_target) for every page
+        fetched in this run; pages already visited in a resumed checkpoint are not fetched again
+        '''
+        self.failed_pages = []
+        self.retries = 0
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            self.load_checkpoint()
+        queue = asyncio.Queue()
+        if not self.depths:
+            self.depths[self.start_url] = 0
+        for url, depth in self.frontier():
+            queue.put_nowait((url, depth, 1))
+        results = {}
+        workers = [asyncio.create_task(self.site_worker(queue, results, target_function, args_for_target)) for i in range(0, self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.checkpoint_path:
+                self.save_checkpoint()
+        return results
+
+    def run(self, target_function=None, *args_for_target):
+        '''
+        Crawls the site and returns the output of target_function for each page fetched, keyed by URL
+        - target_function is given the raw page bytes and the page URL, None only discovers pages (see index_pages)
+        '''
+        return self.run_in_loop(self.crawl_site, target_function, *args_for_target)
+
+    def index_pages(self):
+        '''
+        Returns the n of every i{n}.htm surname index page found so far, in order, i.e. the pages argument for ParsingPipeline.run
+        '''
+        return sorted({int(match.group(1)) for match in map(INDEX_PAGE_PATTERN.search, self.depths) if match})
+
+def discover_index_pages(**crawler_options):
+    '''
+    Returns the n of every surname index page i{n}.htm linked from master_index.htm, only fetching the master index itself
+    EXAMPLE:
+        ParsingPipeline(mode="process").run(pages=discover_index_pages())
+    '''
+    crawler = SiteCrawler(max_depth=0, **crawler_options)
+    pages = crawler.run(lambda content, url: content)
+    if crawler.start_url not in pages:
+        raise requests.ConnectionError(f"Couldn't fetch {crawler.start_url}: {crawler.failed_pages[0][1] if crawler.failed_pages else 'no response'}")
+    links = (crawler.in_site(normalise_url(link, crawler.start_url)) for link in extract_links(pages[crawler.start_url]))
+    return sorted({int(match.group(1)) for match in map(INDEX_PAGE_PATTERN.search, filter(None, links)) if match})
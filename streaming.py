@@ -0,0 +1,137 @@
+'''
+Streaming API over person records: records are yielded page by page as they are parsed instead of being built into dictionaries
+
+The extraction functions in scraper.py each return a fully built dictionary, and filter_dict / sort_dict_by_values_desc /
+trim_sorted_dictionary then copy it again at every step, so memory grows with everything scraped. A RecordStream instead chains
+lazy stages over the records, and nothing is held apart from what the final stage keeps (the name counts, or a heap of n items):
+    stream = RecordStream.scrape(cache=PageCache("page_cache"))    # or RecordStream.from_store(RecordStore("records.sqlite"))
+    stream.filter(born_between(1800, 1850), name_not_in()).first_names().most_common(10)
+    ==> {'Mary': 310, 'William': 250, ...}
+Records come out in the order pages finish parsing, so anything order dependent should sort on source_page.
+'''
+from dictionary_funcs import top_n_by_value
+from pipeline import ParsingPipeline
+from records import PersonRecord, RecordStore
+import heapq
+import itertools
+
+def stream_records(pages=range(1, 80), mode: str = "serial", workers: int = None, backend: str = "html.parser", **crawler_options):
+    '''
+    Generator yielding the PersonRecords of every page, a page at a time as each one is parsed (see pipeline.py for mode and workers)
+    - crawler_options are passed on to AsyncIndexCrawler, i.e. cache=PageCache("page_cache")
+    '''
+    pipeline = ParsingPipeline(mode=mode, workers=workers, backend=backend, **crawler_options)
+    parsed_pages = pipeline.parsed_pages(pages)
+    try:
+        for index, records, names, years in parsed_pages:
+            yield from records
+    finally:
+        parsed_pages.close()    # closed early, i.e. by take, which stops the crawl
+    for index, error in pipeline.failed_pages:
+        print(f"Page i{index}.htm failed: {error}")
+
+class RecordStream:
+    '''
+    Lazily evaluated chain of stages over an iterable, usually of PersonRecords; every stage returns a new RecordStream
+    and nothing is read until a final stage (counts, most_common, top_n, list(...)) consumes it. A stream can only be consumed once.
+    '''
+    def __init__(self, iterable):
+        self.iterable = iterable
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    @classmethod
+    def scrape(cls, pages=range(1, 80), **options):
+        '''
+        Stream of the records scraped from the index pages, options are passed on to stream_records
+        '''
+        return cls(stream_records(pages, **options))
+
+    @classmethod
+    def from_store(cls, store: RecordStore, where: str = "", params: tuple = ()):
+        '''
+        Stream of the records in a RecordStore, optionally filtered in SQL first (see RecordStore.records)
+        '''
+        return cls(store.iter_records(where, params))
+
+    def filter(self, *predicates):
+        '''
+        Keeps only the items for which every predicate returns True
+        '''
+        return RecordStream(item for item in self.iterable if all(predicate(item) for predicate in predicates))
+
+    def map(self, function):
+        return RecordStream(function(item) for item in self.iterable)
+
+    def first_names(self, exclude_middle_names: bool = True):
+        '''
+        Maps records to their name, only the first given name if exclude_middle_names, i.e. Mary Lucy ==> Mary
+        '''
+        return self.map(lambda record: record.first_name if exclude_middle_names else record.given_names)
+
+    def take(self, n: int):
+        '''
+        Keeps only the first n items; once they have been read the stream before it is closed, so a scrape stops fetching pages
+        '''
+        def taken():
+            iterator = iter(self.iterable)
+            try:
+                yield from itertools.islice(iterator, n)
+            finally:
+                if hasattr(iterator, 'close'):
+                    iterator.close()
+        return RecordStream(taken())
+
+    def counts(self):
+        '''
+        Returns a dictionary of item ==> number of occurrences, the same shape as get_firstnames after first_names()
+        '''
+        counts = {}
+        for item in self.iterable:
+            counts[item] = counts.get(item, 0) + 1
+        return counts
+
+    def most_common(self, n: int, *conditions):
+        '''
+        Returns a dictionary of the n most common items and their counts, most common first
+        - conditions are the (key, value) conditions of dictionary_funcs, i.e. condition_greater_than_threshold
+        '''
+        return top_n_by_value(self.counts(), n, *conditions)
+
+    def top_n(self, n: int, key=None):
+        '''
+        Returns a list of the n largest items by key, using a heap of n items rather than sorting everything
+        EXAMPLE:
+            stream.filter(has_birth_year).top_n(5, key=lambda record: -record.birth_year) ==> the five earliest births
+        '''
+        return heapq.nlargest(n, self.iterable, key=key)
+
+# Predicates for RecordStream.filter on PersonRecords, replacing the condition_* helpers which only work on finished dictionaries
+
+def has_birth_year(record: PersonRecord):
+    return record.birth_year is not None
+
+def born_between(start: int, end: int):
+    '''
+    Records with a birth year from start to end inclusive
+    '''
+    return lambda record: record.birth_year is not None and start <= record.birth_year <= end
+
+def name_starts_with(*letters: str):
+    letters = tuple(letter.upper() for letter in letters)
+    return lambda record: record.given_names.upper().startswith(letters)
+
+def name_longer_than(length: int):
+    return lambda record: len(record.first_name) > length
+
+def name_not_in(names=('(?)',)):
+    '''
+    Drops records whose first name is one of names, by default the '(?)' used when a first name isn't known
+    '''
+    names = set(names)
+    return lambda record: record.first_name not in names
+
+def surname_is(*surnames: str):
+    surnames = set(surnames)
+    return lambda record: record.surname in surnames
@@ -0,0 +1,8 @@
+'''
+The modules live at the top of the repository rather than in a package, so put it on the path for the tests
+Run the tests from the top of the repository with: python -m pytest tests
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
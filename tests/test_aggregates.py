@@ -0,0 +1,64 @@
+from aggregates import NameAggregates
+from records import PersonRecord, RecordStore
+import pytest
+import random
+
+NAMES = ["Mary", "John", "William", "Ann", "Elizabeth", "Sarah"]
+
+def random_records(seed: int, count: int = 400):
+    rng = random.Random(seed)
+    return [PersonRecord("Smith", rng.choice(NAMES), None, rng.choice([None] + list(range(1800, 1860))), False, 1) for i in range(0, count)]
+
+def brute_force_decades(records):
+    counts = {}
+    for record in records:
+        if record.birth_year is not None:
+            names = counts.setdefault(record.birth_year // 10 * 10, {})
+            names[record.first_name] = names.get(record.first_name, 0) + 1
+    return counts
+
+def test_counts_match_brute_force():
+    records = random_records(1)
+    aggregates = NameAggregates.from_records(records)
+    assert aggregates.counts(period=10) == brute_force_decades(records)
+    assert sum(aggregates.totals().values()) == len(records)
+
+def test_top_n_with_ties():
+    aggregates = NameAggregates({1830: {'Mary': 3, 'John': 2, 'Ann': 2}, 1841: {'Ann': 5, 'Mary': 5}})
+    assert aggregates.top_n(period=10, n=2) == {1830: [('Mary', 3), ('John', 2), ('Ann', 2)], 1840: [('Mary', 5), ('Ann', 5)]}
+    assert aggregates.top_n(period=10, n=2, include_ties=False) == {1830: [('Mary', 3), ('John', 2)], 1840: [('Mary', 5), ('Ann', 5)]}
+    assert aggregates.ranks(period=10)[1830] == {'Mary': 1, 'John': 2, 'Ann': 2}
+
+@pytest.mark.parametrize("n", [0, -1])
+def test_top_n_of_nothing(n):
+    aggregates = NameAggregates({1830: {'Mary': 3, 'John': 3}, 1841: {'Ann': 5}})
+    assert aggregates.top_n(period=10, n=n) == {}
+    assert aggregates.top_n(period=10, n=n, include_ties=False) == {}
+
+def test_counts_are_copies():
+    aggregates = NameAggregates({1830: {'Mary': 3}})
+    for period in (1, 10):
+        aggregates.counts(period)[1830]['Mary'] = 100
+    assert aggregates.counts(1) == {1830: {'Mary': 3}}
+    assert aggregates.totals() == {'Mary': 3}
+
+def test_persisted_counts_load_the_same():
+    store = RecordStore()
+    records = random_records(2)
+    store.add_records(records)
+    built = NameAggregates.from_store(store)
+    loaded = NameAggregates.from_store(store)
+    assert loaded.year_counts == built.year_counts
+    assert loaded.top_n(period=10, n=3) == built.top_n(period=10, n=3)
+    store.add_records(records[:10])
+    assert NameAggregates.from_store(store).totals() == store.firstname_counts(exclude_middle_names=True)
+
+def test_matches_year_name_table():
+    compact_years = pytest.importorskip("compact_years")
+    records = [record for record in random_records(3) if record.birth_year is not None]
+    table = compact_years.YearNameTable()
+    for record in records:
+        table.add(record.birth_year, record.first_name)
+    aggregates = NameAggregates.from_records(records)
+    for n in (0, 1, 3):
+        assert aggregates.top_n(period=10, n=n) == table.top_n(period=10, n=n)
@@ -0,0 +1,61 @@
+'''
+merge_into and Accumulator checked against combine_dicts, which builds a new dictionary on every merge, on random
+dictionaries of every shape the target functions produce
+'''
+from aggregation import Accumulator, merge_into
+from dictionary_funcs import combine_dicts
+import copy
+import functools
+import random
+
+NAMES = ["Mary", "John", "William", "Ann", "Elizabeth", "Sarah", "James", "Jane", "Thomas", "Harriet"]
+
+def random_counts(rng: random.Random):
+    return {name: rng.randint(1, 20) for name in rng.sample(NAMES, rng.randint(0, len(NAMES)))}
+
+def random_year_names(rng: random.Random):
+    return {year: rng.choices(NAMES, k=rng.randint(1, 5)) for year in rng.sample(range(1780, 1900), rng.randint(0, 8))}
+
+def random_year_counts(rng: random.Random):
+    return {year: random_counts(rng) for year in rng.sample(range(1780, 1900), rng.randint(0, 8))}
+
+SHAPES = (random_counts, random_year_names, random_year_counts)
+
+def random_pages(seed: int):
+    rng = random.Random(seed)
+    shape = SHAPES[seed % len(SHAPES)]
+    return [shape(rng) for i in range(0, rng.randint(0, 12))]
+
+def combined(pages):
+    return functools.reduce(combine_dicts, pages, {})
+
+def test_merge_into_matches_combine_dicts():
+    for seed in range(0, 300):
+        pages = random_pages(seed)
+        expected = combined(pages)
+        originals = copy.deepcopy(pages)
+        total = {}
+        for page in pages:
+            merge_into(total, page)
+        assert total == expected
+        assert pages == originals   # copy=True leaves the pages alone
+
+def test_merge_into_without_copying_matches_combine_dicts():
+    for seed in range(0, 300):
+        pages = random_pages(seed)
+        expected = combined(pages)
+        total = {}
+        for page in copy.deepcopy(pages):
+            merge_into(total, page, copy=False)
+        assert total == expected
+
+def test_merge_keeps_list_order():
+    total = merge_into({1850: ["Mary"]}, {1850: ["John", "Ann"], 1851: ["Jane"]})
+    assert total == {1850: ["Mary", "John", "Ann"], 1851: ["Jane"]}
+
+def test_accumulator():
+    total = Accumulator()
+    total += {'Mary': 2, 'John': 1}
+    total += {'Mary': 1}
+    total.add('Ann')
+    assert total == {'Mary': 3, 'John': 1, 'Ann': 1}
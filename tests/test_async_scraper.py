@@ -0,0 +1,87 @@
+'''
+AsyncIndexCrawler workers against a stub session, so no network is needed
+'''
+import pytest
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("bs4")
+from async_scraper import AsyncIndexCrawler
+import threading
+
+class StubResponse:
+    def __init__(self, content: bytes):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+class StubSession:
+    def get(self, url, **kwargs):
+        return StubResponse(f"<dl><dt>{url}</dt></dl>".encode())
+
+def crawler(**options):
+    return AsyncIndexCrawler(session=StubSession(), requests_per_second=None, html_parser=None, **options)
+
+def test_target_exceptions_fail_their_page_without_stopping_the_crawl():
+    def target(content, index):
+        if index % 2:
+            raise ValueError(f"can't parse {index}")
+        return index
+    run = crawler(concurrency=2)
+    results = run.run_per_page(target, pages=range(1, 9), pass_index=True)
+    assert results == {2: 2, 4: 4, 6: 6, 8: 8}
+    assert sorted(page for page, error in run.failed_pages) == [1, 3, 5, 7]
+
+def test_every_worker_failing_still_returns():
+    run = crawler(concurrency=2)
+    def target(content):
+        raise ValueError("boom")
+    assert run.run_per_page(target, pages=range(1, 5)) == {}
+    assert len(run.failed_pages) == 4
+
+def test_retries_dont_hold_up_other_pages():
+    attempts = {}
+    def target(content, index):
+        attempts[index] = attempts.get(index, 0) + 1
+        if index == 1 and attempts[index] == 1:
+            raise IndexError("first try")
+        return attempts[index]
+    run = crawler(concurrency=1, backoff=0.2, max_attempts=2)
+    results = run.run_per_page(target, pages=range(1, 4), pass_index=True)
+    assert results == {1: 2, 2: 1, 3: 1}
+    assert run.retries == 1 and not run.failed_pages
+
+def test_stop_ends_the_crawl_early():
+    stop = threading.Event()
+    def target(content, index):
+        stop.set()
+        return index
+    run = crawler(concurrency=1)
+    results = run.run_per_page(target, pages=range(1, 80), pass_index=True, stop=stop)
+    assert results == {1: 1}
+
+class EtagSession:
+    def get(self, url, headers=None, **kwargs):
+        response = StubResponse(f"<dl><dt>{url}</dt></dl>".encode())
+        if (headers or {}).get('If-None-Match') == url:
+            response.status_code, response.content = 304, b""
+        response.headers = {'ETag': url}
+        return response
+
+def test_fetch_metrics_leave_out_rate_limiting_and_cached_bytes(tmp_path):
+    from metrics import RunMetrics
+    from page_cache import PageCache
+    cache = PageCache(str(tmp_path / "cache"))
+    first = RunMetrics()
+    run = AsyncIndexCrawler(session=EtagSession(), requests_per_second=20, html_parser=None, concurrency=5, cache=cache, metrics=first)
+    run.run_per_page(len, pages=range(1, 6))
+    assert first.stages['rate_limit'][0] >= 0.15
+    assert first.histograms['fetch_latency'].max < 0.1
+    assert first.counters['bytes_fetched'] == sum(len(f"<dl><dt>{run.page_url(i)}</dt></dl>") for i in range(1, 6))
+    second = RunMetrics()
+    run = AsyncIndexCrawler(session=EtagSession(), requests_per_second=None, html_parser=None, cache=cache, metrics=second)
+    run.run_per_page(len, pages=range(1, 6))
+    assert second.counters['pages_fetched'] == 5 and 'bytes_fetched' not in second.counters
+    assert second.report(caches={'pages': cache})['caches']['pages']['hit_rate'] == 0.0
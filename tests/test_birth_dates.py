@@ -0,0 +1,38 @@
+from birth_dates import UNKNOWN, BirthDate, BirthDateNormaliser, parse_birth_date
+import pytest
+
+@pytest.mark.parametrize("birth_raw, expected", [
+    ("12 Mar 1852", BirthDate(1852, 'day', 1852, 1852)),
+    ("1 March 1852", BirthDate(1852, 'day', 1852, 1852)),
+    ("Mar 1852", BirthDate(1852, 'month', 1852, 1852)),
+    ("1852", BirthDate(1852, 'year', 1852, 1852)),
+    ("c 1830", BirthDate(1830, 'circa', 1827, 1833)),
+    ("abt 1830", BirthDate(1830, 'circa', 1827, 1833)),
+    ("  C   1830 ", BirthDate(1830, 'circa', 1827, 1833)),
+    ("c.1830", BirthDate(1830, 'circa', 1827, 1833)),
+    ("ca 1830", BirthDate(1830, 'circa', 1827, 1833)),
+    ("Christmas 1850", BirthDate(1850, 'other', 1850, 1850)),
+    ("cal 1850", BirthDate(1850, 'other', 1850, 1850)),
+    ("bef 1800", BirthDate(1800, 'before', None, 1800)),
+    ("aft 1790", BirthDate(1790, 'after', 1790, None)),
+    ("bet 1825 and 1820", BirthDate(1820, 'between', 1820, 1825)),
+    ("1850/51", BirthDate(1850, 'other', 1850, 1850)),
+    ("32 Mar 1852", BirthDate(1852, 'other', 1852, 1852)),
+    ("abt", BirthDate(None, 'circa', None, None)),
+    ("?", UNKNOWN),
+    ("", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_parse_birth_date(birth_raw, expected):
+    assert parse_birth_date(birth_raw) == expected
+
+def test_circa():
+    assert parse_birth_date("c 1830").circa
+    assert not parse_birth_date("1830").circa
+
+def test_normaliser_parses_each_string_once():
+    normaliser = BirthDateNormaliser()
+    births = ["c 1830", "12 Mar 1852", "c 1830", "?", "c 1830"]
+    assert normaliser.normalise_all(births) == [parse_birth_date(birth) for birth in births]
+    stats = normaliser.stats()
+    assert stats['misses'] == 3 and stats['hits'] == 2
@@ -0,0 +1,63 @@
+'''
+IncrementalScraper refreshing from a local mirror served by fixture_server.py
+'''
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+from fixture_server import FixtureServer
+from incremental import IncrementalScraper
+from records import RecordStore
+import json
+
+def write_page(directory, index: int, lines):
+    html = "<br>".join(f"<a>{name}</a> b. {year}" for name, year in lines)
+    (directory / f"i{index}.htm").write_text(f"<html><body><dl><dt>Smith</dt><dd>{html}</dd></dl></body></html>")
+
+@pytest.fixture
+def site(tmp_path):
+    directory = tmp_path / "site"
+    directory.mkdir()
+    write_page(directory, 1, [("Mary", 1830), ("John", 1831)])
+    write_page(directory, 2, [("Mary", 1840)])
+    (directory / "i3.htm").write_text("<html><body><dl></dl></body></html>")  # a page with nobody on it
+    with FixtureServer(str(directory)) as server:
+        yield directory, server
+
+def refresh(tmp_path, server, store):
+    scraper = IncrementalScraper(str(tmp_path / "state.json"))
+    changed = scraper.refresh(range(1, 4), store=store, base_url=server.base_url, requests_per_second=None, max_attempts=1)
+    return scraper, changed
+
+def test_second_run_without_changes_reprocesses_nothing(tmp_path, site):
+    directory, server = site
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    scraper, changed = refresh(tmp_path, server, store)
+    assert changed == [1, 2, 3]
+    assert scraper.name_counts() == {'Mary': 2, 'John': 1}
+    state = json.load(open(tmp_path / "state.json"))
+    assert sorted(state['pages']) == ['1', '2', '3'] and all(page['stored'] == page['sha256'] for page in state['pages'].values())
+    scraper, changed = refresh(tmp_path, server, store)
+    assert changed == []    # the empty page included
+    assert scraper.name_counts() == {'Mary': 2, 'John': 1} and len(store) == 3
+
+def test_changed_and_disappeared_pages(tmp_path, site):
+    directory, server = site
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    refresh(tmp_path, server, store)
+    write_page(directory, 1, [("Mary", 1830), ("Ann", 1835)])
+    (directory / "i2.htm").unlink()
+    scraper, changed = refresh(tmp_path, server, store)
+    assert changed == [1, 2]
+    assert scraper.name_counts() == {'Mary': 1, 'Ann': 1}
+    assert scraper.firstnames_by_year() == {1830: ['Mary'], 1835: ['Ann']}
+    assert sorted(scraper.pages) == [1, 3]
+    assert [record.given_names for record in store.iter_records()] == ["Mary", "Ann"]
+
+def test_a_new_store_gets_every_page(tmp_path, site):
+    directory, server = site
+    refresh(tmp_path, server, RecordStore(str(tmp_path / "records.sqlite")))
+    other = RecordStore(str(tmp_path / "other.sqlite"))
+    scraper, changed = refresh(tmp_path, server, other)
+    assert changed == [1, 2, 3] and len(other) == 3
+    assert scraper.name_counts() == {'Mary': 2, 'John': 1}
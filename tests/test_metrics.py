@@ -0,0 +1,27 @@
+from metrics import Histogram, RunMetrics
+
+def test_percentiles_never_exceed_the_largest_observation():
+    histogram = Histogram(bounds=(0.1, 1.0, 5.0))
+    for value in (0.2, 0.5, 0.811):
+        histogram.observe(value)
+    report = histogram.report()
+    assert report['p50'] == report['p95'] == report['max'] == 0.811
+    assert report['buckets'] == {'<=0.1': 0, '<=1.0': 3, '<=5.0': 0, '>5.0': 0}
+
+def test_percentiles_use_the_bucket_bounds():
+    histogram = Histogram(bounds=(0.1, 1.0, 5.0))
+    for value in [0.05] * 90 + [2.0] * 10:
+        histogram.observe(value)
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.95) == 2.0
+    assert Histogram().percentile(0.5) is None
+
+def test_run_metrics_counts_and_stages():
+    metrics = RunMetrics()
+    metrics.count('pages_fetched')
+    metrics.count('pages_fetched', 2)
+    with metrics.timer('parse'):
+        pass
+    metrics.add_time('parse', 0.5)
+    assert metrics.counters == {'pages_fetched': 3}
+    assert metrics.stages['parse'][1] == 2 and metrics.stages['parse'][0] >= 0.5
@@ -0,0 +1,38 @@
+from name_clustering import NameClusterer, UnionFind, cluster_names
+from namesnlp import jaro_winkler_distance
+from phonetics import soundex
+import random
+
+def brute_force(names: list, clusterer: NameClusterer):
+    '''
+    Union-find over every pair the blocking allows, scored one pair at a time
+    - the shorter name is scored against the longer one (the earlier of two the same length first) as the clusterer does,
+      since jaro_winkler_distance isn't symmetric
+    '''
+    clusters = UnionFind(len(names))
+    for i in range(0, len(names)):
+        for j in range(i + 1, len(names)):
+            x, y = (names[i], names[j]) if len(names[i]) <= len(names[j]) else (names[j], names[i])
+            blocked = (clusterer.prefix_length and x[:clusterer.prefix_length].upper() == y[:clusterer.prefix_length].upper()) or \
+                      (clusterer.phonetic and soundex(x) and soundex(x) == soundex(y))
+            if blocked and abs(len(x) - len(y)) <= clusterer.length_band and jaro_winkler_distance(x, y) > clusterer.threshold:
+                clusters.union(i, j)
+    return {frozenset(name for j, name in enumerate(names) if clusters.find(j) == clusters.find(i)) for i in range(0, len(names))}
+
+def test_variants_chain_into_one_cluster():
+    clusters = cluster_names({'Mary': 120, 'Marie': 14, 'Maria': 9, 'John': 200})
+    assert [(cluster.canonical, cluster.members, cluster.count) for cluster in clusters] == \
+           [('John', ['John'], 200), ('Mary', ['Mary', 'Marie', 'Maria'], 143)]
+
+def test_phonetic_blocks_catch_variants_with_different_prefixes():
+    assert len(cluster_names({'Ewan': 3, 'Euan': 2}, threshold=0.8, phonetic=False)) == 2
+    assert len(cluster_names({'Ewan': 3, 'Euan': 2}, threshold=0.8)) == 1
+
+def test_blocking_matches_comparing_every_allowed_pair():
+    rng = random.Random(6)
+    counts = {"".join(rng.choice("AEIMNRSTY") for i in range(0, rng.randint(3, 8))).capitalize(): rng.randint(1, 50) for j in range(0, 300)}
+    clusterer = NameClusterer(threshold=0.86)
+    clusters = clusterer.cluster(counts)
+    assert {frozenset(cluster.members) for cluster in clusters} == brute_force(list(counts), clusterer)
+    assert sum(cluster.count for cluster in clusters) == sum(counts.values())
+    assert clusterer.comparisons < len(counts) * (len(counts) - 1) // 2
@@ -0,0 +1,51 @@
+'''
+NameSearchIndex.top_k_variants prunes most of the vocabulary with upper bounds, so check it against scoring every name
+'''
+from name_search import NameSearchIndex
+from namesnlp import jaro_winkler_distance
+import random
+import string
+
+VOCABULARY = ["Mary", "Marie", "Maria", "Marry", "Mari", "Mariah", "Jacob", "Jakob", "Jacobb", "John", "Jon", "Johann", "Elizabeth",
+              "Elisabeth", "Eliza", "Betsy", "William", "Wiliam", "Ann", "Anne", "Anna", "Hannah", "Harriet", "Harriett", "(?)"]
+
+def brute_force(name: str, names, k: int, min_score: float = 0.0):
+    scored = [(other, jaro_winkler_distance(name, other)) for other in names]
+    ranked = sorted(enumerate(scored), key=lambda item: (-item[1][1], item[0]))   # ties keep vocabulary order
+    return [(other, score) for position, (other, score) in ranked if score > min_score][:k]
+
+def assert_same(result, expected):
+    assert [name for name, score in result] == [name for name, score in expected]
+    for (name, score), (expected_name, expected_score) in zip(result, expected):
+        assert abs(score - expected_score) < 1e-12
+
+def random_name(rng: random.Random):
+    letters = "AEIOUMRNLSTJHBYK" if rng.random() < 0.7 else string.ascii_uppercase
+    return rng.choice(string.ascii_uppercase) + "".join(rng.choice(letters) for i in range(0, rng.randint(0, 9))).lower()
+
+def test_top_k_matches_brute_force_on_names():
+    index = NameSearchIndex(VOCABULARY)
+    for query in ["Mary", "Jacob", "Elizabeth", "Hariet", "Anne", "X", "Jonathan"]:
+        for k in (1, 3, 5, 30):
+            assert_same(index.top_k_variants(query, k), brute_force(query, VOCABULARY, k))
+
+def test_top_k_matches_brute_force_on_random_names():
+    rng = random.Random(7)
+    for trial in range(0, 40):
+        names = list(dict.fromkeys(random_name(rng) for i in range(0, rng.randint(1, 200))))
+        index = NameSearchIndex(names)
+        for query in [random_name(rng) for i in range(0, 5)] + [rng.choice(names)]:
+            k = rng.randint(1, 15)
+            min_score = rng.choice([0.0, 0.5, 0.8])
+            assert_same(index.top_k_variants(query, k, min_score), brute_force(query, names, k, min_score))
+
+def test_top_k_prunes():
+    index = NameSearchIndex(VOCABULARY)
+    index.top_k_variants("Mary", 1)
+    assert index.scored + index.pruned == len(VOCABULARY)
+    assert index.pruned > 0
+
+def test_top_k_of_nothing():
+    index = NameSearchIndex(VOCABULARY)
+    assert index.top_k_variants("Mary", 0) == []
+    assert index.top_k_variants("", 5) == []
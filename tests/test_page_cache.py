@@ -0,0 +1,72 @@
+'''
+PageCache against a stub session which serves each URL with its URL as ETag, so no network is needed
+'''
+from page_cache import PageCache, PageNotCachedException
+import json
+import os
+import pytest
+
+class StubResponse:
+    def __init__(self, status_code: int, content: bytes, etag: str):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'ETag': etag}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+class StubSession:
+    def __init__(self):
+        self.requests = []  # (url, headers, kwargs) of every get
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, headers or {}, kwargs))
+        if (headers or {}).get('If-None-Match') == url:
+            return StubResponse(304, b"", url)
+        return StubResponse(200, f"<p>{url}</p>".encode(), url)
+
+def test_pages_are_stored_then_revalidated(tmp_path):
+    session = StubSession()
+    cache = PageCache(str(tmp_path))
+    assert cache.fetch(session, "http://site/i1.htm") == (b"<p>http://site/i1.htm</p>", 'miss')
+    assert cache.fetch(session, "http://site/i1.htm") == (b"<p>http://site/i1.htm</p>", 'revalidated')
+    assert session.requests[1][1] == {'If-None-Match': "http://site/i1.htm"}
+    assert (cache.misses, cache.revalidated, cache.hits) == (1, 1, 0)
+    cache.flush()
+    reopened = PageCache(str(tmp_path), max_age=60)
+    assert reopened.fetch(session, "http://site/i1.htm") == (b"<p>http://site/i1.htm</p>", 'hit')
+    assert len(session.requests) == 2
+
+def test_offline_only_serves_cached_pages(tmp_path):
+    session = StubSession()
+    online = PageCache(str(tmp_path))
+    online.store("http://site/i1.htm", b"cached", "etag")
+    online.flush()
+    offline = PageCache(str(tmp_path), offline=True)
+    assert offline.get(session, "http://site/i1.htm") == b"cached"
+    with pytest.raises(PageNotCachedException):
+        offline.get(session, "http://site/i2.htm")
+    assert session.requests == []
+
+def test_timeout_is_left_to_the_session_unless_given(tmp_path):
+    session = StubSession()
+    cache = PageCache(str(tmp_path))
+    cache.get(session, "http://site/i1.htm")
+    cache.get(session, "http://site/i2.htm", timeout=(1, 2))
+    assert [kwargs for url, headers, kwargs in session.requests] == [{}, {'timeout': (1, 2)}]
+
+def test_index_is_written_in_batches(tmp_path):
+    session = StubSession()
+    cache = PageCache(str(tmp_path), save_every=3)
+    index_path = os.path.join(str(tmp_path), "index.json")
+    for i in range(1, 3):
+        cache.get(session, f"http://site/i{i}.htm")
+    assert not os.path.exists(index_path)
+    cache.get(session, "http://site/i3.htm")
+    cache.get(session, "http://site/i4.htm")
+    with open(index_path, "r", encoding="utf-8") as f:
+        assert len(json.load(f)) == 3
+    cache.flush()
+    with open(index_path, "r", encoding="utf-8") as f:
+        assert len(json.load(f)) == 4
@@ -0,0 +1,52 @@
+from page_scheduler import PageScheduler
+import json
+import threading
+
+def drain(scheduler: PageScheduler):
+    pages = []
+    while True:
+        page = scheduler.next_page()
+        if page is None:
+            return pages
+        pages.append(page)
+
+def test_pages_in_order_without_sizes():
+    assert drain(PageScheduler(range(1, 6), sizes_path=None)) == [1, 2, 3, 4, 5]
+
+def test_largest_first_unknown_sizes_first_ties_in_page_order(tmp_path):
+    sizes_path = tmp_path / "page_sizes.json"
+    sizes_path.write_text(json.dumps({"1": 100, "2": 500, "3": 100, "5": 900}))
+    assert drain(PageScheduler(range(1, 7), sizes_path=str(sizes_path))) == [4, 6, 5, 2, 1, 3]
+
+def test_sizes_saved_once_the_last_worker_is_done(tmp_path):
+    sizes_path = tmp_path / "page_sizes.json"
+    scheduler = PageScheduler(range(1, 4), sizes_path=str(sizes_path))
+    scheduler.register("a")
+    scheduler.register("b")
+    for page, size in ((1, 10), (2, 30), (3, 20)):
+        assert scheduler.next_page() == page
+        scheduler.record("a", page, 0.1, size)
+    scheduler.done("a")
+    assert not sizes_path.exists()
+    scheduler.done("b")
+    assert json.loads(sizes_path.read_text()) == {"1": 10, "2": 30, "3": 20}
+    assert drain(PageScheduler(range(1, 4), sizes_path=str(sizes_path))) == [2, 3, 1]
+
+def test_every_page_handed_out_once_across_threads():
+    scheduler = PageScheduler(range(1, 200), sizes_path=None)
+    taken = [[] for i in range(0, 8)]
+    threads = [threading.Thread(target=lambda pages: pages.extend(drain(scheduler)), args=(pages,)) for pages in taken]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(page for pages in taken for page in pages) == list(range(1, 200))
+
+def test_utilisation():
+    scheduler = PageScheduler(range(1, 3), sizes_path=None)
+    scheduler.register("a")
+    drain(scheduler)
+    scheduler.record("a", 1, 0.5)
+    scheduler.done("a")
+    stats = scheduler.utilisation()["a"]
+    assert stats['pages'] == 1 and stats['busy_seconds'] == 0.5
@@ -0,0 +1,19 @@
+from parser_backends import available_backends, get_backend
+import pytest
+
+pytest.importorskip("bs4")
+
+# lines whose first and second links have identical markup, as when someone married a namesake
+PAGE = (b"<html><body><dl><dt>Smith</dt><dd>"
+        b"<a href='p1.htm'>Mary</a> b. 1830 m. <a href='p1.htm'>Mary</a><br>"
+        b"<a href='p2.htm'>John</a> b. c 1801 m. <a href='p2.htm'>John</a><!-- note --><br>"
+        b"<a href='p3.htm'>Ann <i>Jane</i></a> b. 12 Mar 1852</dd>"
+        b"<dt>Jones</dt><dd><a href='p4.htm'>William</a> b. 1799<br>Sarah b. 1801</dd></dl></body></html>")
+
+@pytest.mark.parametrize("backend", ["lxml", "selectolax"])
+def test_backend_matches_html_parser_on_duplicate_links(backend):
+    if backend not in available_backends():
+        pytest.skip(f"{backend} isn't installed")
+    expected = get_backend("html.parser").parse(PAGE, source_page=7)
+    assert [record.given_names for record in expected] == ["Mary", "John", "Ann Jane", "William", "Sarah"]
+    assert get_backend(backend).parse(PAGE, source_page=7) == expected
@@ -0,0 +1,33 @@
+from phonetic_index import PhoneticIndex
+from phonetics import double_metaphone, nysiis, soundex
+from records import PersonRecord, RecordStore
+
+def test_soundex_reference_codes():
+    for name, code in [("Robert", "R163"), ("Rupert", "R163"), ("Rubin", "R150"), ("Ashcraft", "A261"), ("Tymczak", "T522"),
+                       ("Pfister", "P236"), ("Honeyman", "H555"), ("Lee", "L000")]:
+        assert soundex(name) == code, name
+
+def test_nysiis_reference_codes():
+    for name, code in [("Jacob", "JACAB"), ("Jakob", "JACAB"), ("Macintosh", "MCANT"), ("Knight", "NAGT"), ("Phillips", "FALAP"),
+                       ("Schmidt", "SNAD"), ("Watkins", "WATCAN"), ("Brown", "BRAN"), ("Wheeler", "WALAR"), ("Bishop", "BASAP")]:
+        assert nysiis(name) == code, name
+
+def test_double_metaphone_reference_codes():
+    for name, codes in [("Smith", ("SM0", "XMT")), ("Schmidt", ("XMT", "SMT")), ("Thomas", ("TMS", "TMS")), ("Jacob", ("JKP", "AKP")),
+                        ("Xavier", ("SF", "SFR")), ("Catherine", ("K0RN", "KTRN")), ("Arnoff", ("ARNF", "ARNF")), ("Gough", ("KF", "KF")),
+                        ("Jose", ("HS", "HS")), ("Cabrillo", ("KPRL", "KPR")), ("Thumb", ("0M", "TM")), ("Schneider", ("XNTR", "SNTR")),
+                        ("Caesar", ("SSR", "SSR"))]:
+        assert double_metaphone(name) == codes, name
+
+def test_index_is_saved_to_and_reloaded_from_the_store(tmp_path):
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    store.add_records([PersonRecord("Smith", given_names, None, None, False, 1) for given_names in ["Jacob", "Jakob", "Jacob", "Mary Ann"]])
+    built = PhoneticIndex.from_store(store)
+    assert built.lookup("Jacob") == {'Jacob': 2, 'Jakob': 1}
+    assert store.connection.execute("SELECT COUNT(*) FROM phonetic_codes").fetchone()[0] > 0
+    reopened = RecordStore(str(tmp_path / "records.sqlite"))
+    loaded = PhoneticIndex.from_store(reopened)
+    assert loaded.index == built.index and loaded.encoders == built.encoders
+    assert PhoneticIndex.from_store(reopened, exclude_middle_names=False).lookup("Mary Ann", "soundex") == {'Mary Ann': 1}
+    reopened.add_records([PersonRecord("Jones", "Jacobb", None, None, False, 2)])
+    assert PhoneticIndex.from_store(reopened).lookup("Jacob") == {'Jacob': 2, 'Jacobb': 1, 'Jakob': 1}
@@ -0,0 +1,38 @@
+from record_index import RecordIndex, query_store
+from records import PersonRecord, RecordStore
+
+RECORDS = [PersonRecord("Smith", given_names, None, year, False, 1) for given_names, year in
+           [("Mary Ann", 1831), ("Marie Ann", 1835), ("Mary", 1840), ("Maria Jane", 1822), ("John", 1831)]]
+
+def test_query_by_name_and_birth_year():
+    index = RecordIndex.from_records(RECORDS)
+    assert index.query(name="mary") == [RECORDS[0], RECORDS[2]]
+    assert index.query(name="Mary", born=(1835, None)) == [RECORDS[2]]
+    assert index.query(name="Mary Ann", full_names=True) == [RECORDS[0]]
+
+def test_full_names_apply_to_variants():
+    index = RecordIndex.from_records(RECORDS)
+    spellings = index.variants("Mary Ann", 0.85, full_names=True)
+    assert "Marie Ann" in spellings and "Maria Jane" not in spellings
+    records = index.query(name="Mary Ann", full_names=True, variants=True, threshold=0.85)
+    assert RECORDS[1] in records and [record for record in records if record.given_names not in spellings] == []
+
+def test_full_names_apply_to_phonetic_variants(tmp_path):
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    store.add_records(RECORDS)
+    for index in (RecordIndex.from_records(RECORDS), RecordIndex.from_store(store)):
+        assert index.query(name="Mary Ann", full_names=True, phonetic="soundex") == [RECORDS[0], RECORDS[1]]
+        assert index.query(name="Mary", phonetic="soundex") == RECORDS[:4]
+
+def test_query_store_matches_the_index(tmp_path):
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    store.add_records(RECORDS)
+    index = RecordIndex.from_store(store)
+    for query in [dict(surname="SMITH", name="mary"), dict(name="Mary", born=(1835, None)), dict(born=(None, 1831)),
+                  dict(name=["Mary", "John"], born=(1831, 1840)), dict(name="Mary Ann", full_names=True, variants=True, threshold=0.85),
+                  dict(name="Mary", variants=True), dict(name="Mary", phonetic="soundex"), dict(name="Nobody", variants=True),
+                  dict(surname="Jones")]:
+        assert query_store(store, **query) == index.query(**query), query
+    plan = " ".join(row[-1] for row in store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM persons WHERE surname COLLATE NOCASE IN (?) AND first_name COLLATE NOCASE IN (?)", ("Smith", "Mary")))
+    assert "USING INDEX" in plan
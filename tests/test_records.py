@@ -0,0 +1,35 @@
+from parser_backends import available_backends, get_backend
+from records import PersonRecord, RecordStore, make_record
+import pytest
+
+PAGE = (b"<html><body><dl><dt>Smith</dt><dd><a href='p1.htm'>Mary <b>Ann</b></a> b. c 1830 m. <a href='p2.htm'>John Jones</a><br>"
+        b"<a href='p3.htm'>William</a> b. 12 Mar 1852<br>Sarah b. 1801</dd></dl></body></html>")
+
+@pytest.mark.parametrize("backend", ["html.parser", "lxml", "selectolax"])
+def test_given_names_come_from_the_first_link(backend):
+    pytest.importorskip("bs4")
+    if backend not in available_backends():
+        pytest.skip(f"{backend} isn't installed")
+    records = get_backend(backend).parse(PAGE, source_page=3)
+    assert [(record.given_names, record.birth_year, record.circa) for record in records] == \
+        [("Mary Ann", 1830, True), ("William", 1852, False), ("Sarah", 1801, False)]
+
+def test_firstnames_count_the_first_link_of_each_line_only():
+    bs4 = pytest.importorskip("bs4")
+    from scraper import get_firstnames
+    page = bs4.BeautifulSoup(PAGE, "html.parser")
+    assert get_firstnames(page) == {"Mary Ann": 1, "William": 1}
+    assert get_firstnames(page, exclude_middle_names=True) == {"Mary": 1, "William": 1}
+
+def test_birth_is_only_taken_from_a_b_of_its_own():
+    record = make_record("Smith", [], ["Caleb. b. 1830, of Devizes"], 1)
+    assert (record.given_names, record.birth_raw, record.birth_year) == ("Caleb.", "1830", 1830)
+
+def test_replace_page_is_one_transaction(tmp_path):
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    store.add_records([PersonRecord("Smith", "Mary", None, None, False, 1), PersonRecord("Jones", "John", None, None, False, 2)])
+    with pytest.raises(Exception):
+        store.replace_page(1, [PersonRecord("Smith", "Ann", None, None, False, 1), None])
+    assert [record.given_names for record in store.iter_records()] == ["Mary", "John"]
+    store.replace_page(1, [PersonRecord("Smith", "Ann", None, None, False, 1)])
+    assert [record.given_names for record in store.iter_records()] == ["John", "Ann"]
@@ -0,0 +1,174 @@
+'''
+CircuitBreaker state transitions and ResilientSession retries, on a fake clock and a stub session rather than the network
+'''
+import pytest
+
+requests = pytest.importorskip("requests")
+import resilient_fetch
+from resilient_fetch import CircuitBreaker, CircuitOpenException, DeadLetters, InvalidPageException, ResilientSession, retry_delay
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilient_fetch, "time", clock)
+    return clock
+
+class StubResponse:
+    def __init__(self, status_code: int, content: bytes = b"<dl><dt>Smith</dt></dl>", headers: dict = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+class StubSession:
+    '''
+    Answers with the given status codes in turn, an exception in the list is raised instead
+    '''
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return StubResponse(answer) if isinstance(answer, int) else answer
+
+def http_error(status_code: int):
+    return requests.HTTPError(f"{status_code}", response=StubResponse(status_code))
+
+def open_breaker(breaker: CircuitBreaker):
+    for i in range(0, breaker.failure_threshold):
+        breaker.before_request()
+        breaker.record_outcome(requests.ConnectionError())
+
+def test_opens_after_failure_threshold_in_a_row(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for i in range(0, 2):
+        breaker.before_request()
+        breaker.record_outcome(requests.Timeout())
+    assert breaker.state == "closed"
+    breaker.record_outcome()    # a success resets the count
+    for i in range(0, 2):
+        breaker.record_outcome(http_error(503))
+    assert breaker.state == "closed"
+    breaker.record_outcome(http_error(500))
+    assert breaker.state == "open" and breaker.times_opened == 1
+
+def test_open_rejects_until_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 10
+    with pytest.raises(CircuitOpenException) as rejected:
+        breaker.before_request()
+    assert rejected.value.retry_in == pytest.approx(20)
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_request()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenException):
+        breaker.before_request()    # only the one trial
+    breaker.record_outcome()
+    assert breaker.state == "closed" and breaker.failures == 0
+    breaker.before_request()
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_request()
+    breaker.record_outcome(http_error(503))
+    assert breaker.state == "open" and breaker.times_opened == 2
+    with pytest.raises(CircuitOpenException):
+        breaker.before_request()
+
+@pytest.mark.parametrize("error", [http_error(404), InvalidPageException("no <dl>"), ValueError("parser")])
+def test_half_open_trial_answered_closes(clock, error):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_request()
+    breaker.record_outcome(error)   # the site answered, if not with what was wanted
+    assert breaker.state == "closed"
+    breaker.before_request()
+
+def test_trial_which_never_reports_back_is_given_up_on(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_request()
+    clock.now += 29
+    with pytest.raises(CircuitOpenException):
+        breaker.before_request()
+    clock.now += 1
+    breaker.before_request()
+    assert breaker.state == "half_open"
+
+def test_retry_delay(clock):
+    assert retry_delay(http_error(404), 1) is None
+    assert retry_delay(requests.ConnectionError(), 3, backoff=0.5) == 2.0
+    assert retry_delay(requests.ConnectionError(), 10, backoff=0.5, max_backoff=5) == 5
+    assert retry_delay(requests.HTTPError(response=StubResponse(503, headers={'Retry-After': '7'})), 1) == 7
+    assert retry_delay(CircuitOpenException(120), 1, max_backoff=30) == 30
+
+def test_session_retries_then_succeeds(clock):
+    session = ResilientSession(StubSession(503, requests.ConnectionError(), 200), max_attempts=3, backoff=1)
+    assert session.get("https://example.org/i1.htm").status_code == 200
+    assert session.retries == 2 and clock.slept == [1, 2]
+
+def test_session_fails_fast_and_dead_letters(clock):
+    dead_letters = DeadLetters()
+    stub = StubSession(404)
+    session = ResilientSession(stub, max_attempts=4, dead_letters=dead_letters)
+    with pytest.raises(requests.HTTPError):
+        session.get("https://example.org/i1.htm")
+    assert stub.requests == 1 and dead_letters.pages() == ["https://example.org/i1.htm"]
+
+def test_session_validates_index_pages(clock):
+    stub = StubSession(StubResponse(200, b"<html>Service unavailable</html>"), 200)
+    session = ResilientSession(stub, max_attempts=2, backoff=0.1)
+    assert session.get("https://example.org/i3.htm").status_code == 200
+    assert stub.requests == 2
+
+def test_session_404_on_trial_request_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    session = ResilientSession(StubSession(503, 503, 404, 200), max_attempts=2, backoff=0.1, breaker=breaker)
+    with pytest.raises(requests.HTTPError):
+        session.get("https://example.org/i1.htm")
+    assert breaker.state == "open"
+    clock.now += 30
+    with pytest.raises(requests.HTTPError):
+        session.get("https://example.org/missing.htm")
+    assert breaker.state == "closed"
+    assert session.get("https://example.org/i1.htm").status_code == 200
+
+def test_session_circuit_rejections_dont_use_attempts(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    stub = StubSession(503, 200)
+    session = ResilientSession(stub, max_attempts=2, backoff=0.1, max_backoff=10, breaker=breaker)
+    assert session.get("https://example.org/i1.htm").status_code == 200
+    assert stub.requests == 2 and session.retries == 1
+    assert clock.slept[0] == 0.1 and max(clock.slept[1:]) == 10    # waited out the open circuit in max_backoff steps
+    assert sum(clock.slept) == pytest.approx(30)
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("requests")
+
+import scraper
+
+class FakeCache:
+    def fetch(self, session, url):
+        return b"<dl><dt>Smith</dt><dd><a>Mary</a> b. 1830</dd></dl>", 'hit'
+
+def test_out_of_range_pages_are_skipped_not_parsed(monkeypatch):
+    monkeypatch.setattr(scraper, "get_page_cache", lambda: FakeCache())
+    monkeypatch.setattr(scraper, "get_session", lambda: None)
+    with pytest.raises(scraper.PageNumberNotInRangeException):
+        scraper.get_surname_index_page_content(80)
+    threads = scraper.instantiate_threads(2, 81, lambda content: {'pages': 1}, sizes_path=None, html_parser=None)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(thread.dic.get('pages', 0) for thread in threads) == 79
+    assert sorted(index for thread in threads for index, error in thread.failed_pages) == [80, 81]
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from namesnlp import jaro_winkler_distance
+from similarity_cache import SimilarityCache
+import random
+
+def test_bounded_caches_give_the_same_scores():
+    rng = random.Random(3)
+    names = ["".join(rng.choice("AEIMNRSTY") for i in range(0, rng.randint(2, 8))) for j in range(0, 200)]
+    similarity = SimilarityCache(maxsize=50, max_names=20)
+    for query in rng.sample(names, 10):
+        assert similarity.scores_of(query, names) == [jaro_winkler_distance(query, name) for name in names]
+        assert len(similarity.scores) <= 50 and len(similarity.features) <= 20
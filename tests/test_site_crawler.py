@@ -0,0 +1,68 @@
+'''
+SiteCrawler against a local mirror served by fixture_server.py
+'''
+import pytest
+
+pytest.importorskip("requests")
+from fixture_server import FixtureServer
+from site_crawler import SiteCrawler, normalise_url
+import json
+
+PAGES = {
+    "master_index.htm": '<a href="i1.htm">1</a> <a href="I1.HTM#top">1 again</a> <a href="https://www.wiltshirefamilyhistory.org/i2.htm">2</a>'
+                        ' <a href="sub/page.htm">more</a> <a href="missing.htm">gone</a> <a href="photo.jpg">photo</a>'
+                        ' <a href="mailto:someone@example.org">mail</a> <a href="https://elsewhere.example.org/i4.htm">other site</a>',
+    "i1.htm": "<dl><dt>Smith</dt><dd><a>Mary</a></dd></dl>",
+    "i2.htm": "<dl><dt>Jones</dt><dd><a>John</a></dd></dl>",
+    "i3.htm": "<dl><dt>Brown</dt><dd><a>Ann</a></dd></dl>",
+    "sub/page.htm": '<a href="../i3.htm">3</a>',
+}
+
+@pytest.fixture
+def mirror(tmp_path):
+    for name, html in PAGES.items():
+        path = tmp_path / "site" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"<html><body>{html}</body></html>")
+    with FixtureServer(str(tmp_path / "site")) as server:
+        yield server
+
+def crawler(server, **options):
+    return SiteCrawler(base_url=server.base_url, requests_per_second=None, backoff=0.01, **options)
+
+def test_normalise_url():
+    base = "HTTPS://www.WiltshireFamilyHistory.org:443/a/b.htm"
+    assert normalise_url("../I12.HTM#smith", base) == "https://www.wiltshirefamilyhistory.org/i12.htm"
+    assert normalise_url("./Sub/../Page.htm", base) == "https://www.wiltshirefamilyhistory.org/a/Page.htm"
+    assert normalise_url("http://Example.org:8080/x/?q=1#f") == "http://example.org:8080/x/?q=1"
+    assert normalise_url("http://example.org:80") == "http://example.org/"
+
+def test_crawl_dedups_follows_aliases_and_respects_depth(mirror):
+    run = crawler(mirror, max_depth=1)
+    pages = run.run(lambda content, url: len(content))
+    site = mirror.base_url
+    assert sorted(pages) == sorted(f"{site}/{name}" for name in ("master_index.htm", "i1.htm", "i2.htm", "sub/page.htm"))
+    assert run.index_pages() == [1, 2]
+    assert list(run.failed) == [f"{site}/missing.htm"]
+    assert run.frontier() == []
+
+def test_resume_from_checkpoint_skips_visited_and_failed_pages(mirror, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    site = mirror.base_url
+    first = crawler(mirror, max_depth=1, checkpoint_path=checkpoint)
+    first.run(lambda content, url: url)
+    assert json.load(open(checkpoint))['failed'] == first.failed
+
+    # an interrupted crawl: i3.htm was found but never fetched
+    state = json.load(open(checkpoint))
+    state['depths'][f"{site}/i3.htm"] = 2
+    with open(checkpoint, "w") as f:
+        json.dump(state, f)
+    resumed = crawler(mirror, max_depth=2, checkpoint_path=checkpoint)
+    assert resumed.run(lambda content, url: url) == {f"{site}/i3.htm": f"{site}/i3.htm"}
+    assert resumed.frontier() == [] and list(resumed.failed) == [f"{site}/missing.htm"]
+
+    assert crawler(mirror, max_depth=2, checkpoint_path=checkpoint).run(lambda content, url: url) == {}
+    retried = crawler(mirror, max_depth=2, checkpoint_path=checkpoint, retry_failed=True)
+    assert retried.run(lambda content, url: url) == {}
+    assert [url for url, error in retried.failed_pages] == [f"{site}/missing.htm"]
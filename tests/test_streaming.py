@@ -0,0 +1,47 @@
+from records import PersonRecord, RecordStore
+from streaming import RecordStream, born_between, has_birth_year, name_longer_than, name_not_in, name_starts_with, surname_is
+import random
+
+def records(seed: int = 13, n: int = 500):
+    rng = random.Random(seed)
+    return [PersonRecord(rng.choice(["Smith", "Jones", "Cole"]), rng.choice(["Mary", "Mary Ann", "John", "Jane", "(?)", "Elizabeth"]), None,
+                         rng.choice([None, rng.randint(1750, 1900)]), False, rng.randint(1, 79)) for i in range(0, n)]
+
+def test_filters_keep_only_matching_records():
+    people = records()
+    kept = list(RecordStream(people).filter(born_between(1800, 1850), name_not_in(), surname_is("Smith", "Cole")))
+    assert kept == [record for record in people if record.birth_year is not None and 1800 <= record.birth_year <= 1850
+                    and record.first_name != '(?)' and record.surname in ("Smith", "Cole")]
+    assert list(RecordStream(people).filter(name_starts_with("j", "E"), name_longer_than(4))) == \
+           [record for record in people if record.first_name == "Elizabeth"]
+
+def test_top_n_matches_sorting_everything():
+    people = records()
+    by_year = lambda record: -record.birth_year
+    assert RecordStream(people).filter(has_birth_year).top_n(5, key=by_year) == \
+           sorted((record for record in people if record.birth_year is not None), key=by_year, reverse=True)[:5]
+    assert RecordStream(people).top_n(1000, key=lambda record: record.source_page) == \
+           sorted(people, key=lambda record: record.source_page, reverse=True)
+
+def test_most_common_counts_first_names():
+    people = records()
+    counts = {}
+    for record in people:
+        counts[record.first_name] = counts.get(record.first_name, 0) + 1
+    top = RecordStream(people).first_names().most_common(2)
+    assert list(top.items()) == sorted(counts.items(), key=lambda item: -item[1])[:2]
+    assert RecordStream(people).first_names(exclude_middle_names=False).counts()["Mary Ann"] == \
+           sum(record.given_names == "Mary Ann" for record in people)
+
+def test_take_closes_the_source_and_store_streams_filter_in_sql(tmp_path):
+    closed = []
+    def source():
+        try:
+            yield from records()
+        finally:
+            closed.append(True)
+    assert len(list(RecordStream(source()).take(3))) == 3 and closed == [True]
+    store = RecordStore(str(tmp_path / "records.sqlite"))
+    store.add_records(records())
+    assert list(RecordStream.from_store(store, "surname = ?", ("Jones",)).filter(has_birth_year)) == \
+           [record for record in records() if record.surname == "Jones" and record.birth_year is not None]